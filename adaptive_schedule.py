@@ -0,0 +1,143 @@
+import time
+from collections import deque
+from datetime import datetime
+from spider_logging import get_logger, dump_ring_buffer
+from compact_snapshot import Snapshot, SnapshotHistory
+
+logger = get_logger('adaptive')
+
+# 爬取间隔的上下限（秒）
+MIN_INTERVAL = 30
+MAX_INTERVAL = 30 * 60
+INITIAL_INTERVAL = 10 * 60
+
+# 每次爬取之间的变动幅度希望落在这个区间：高于上限说明采样太稀，低于下限说明在重复爬取同一份榜单
+LOW_CHURN = 0.05
+HIGH_CHURN = 0.20
+
+# 请求预算：滑动窗口内最多的爬取次数
+HOURLY_BUDGET = 60
+DAILY_BUDGET = 600
+
+
+def churn(previous, current):
+    """
+    两次快照之间的变动幅度（0~1）
+
+    新上榜话题的比例占60%，共同话题的平均排名位移（按榜单长度归一化）占40%。
+    previous、current 为热搜列表或紧凑快照。
+    """
+    if not previous or not current:
+        return 1.0
+    previous, current = _titles(previous), _titles(current)
+    prev_ranks = {title: position for position, title in enumerate(previous)}
+    size = max(len(previous), len(current))
+    new_entries = 0
+    displacement = 0
+    for position, title in enumerate(current):
+        prev_position = prev_ranks.get(title)
+        if prev_position is None:
+            new_entries += 1
+        else:
+            displacement += abs(prev_position - position)
+    common = len(current) - new_entries
+    mean_displacement = displacement / common / size if common else 1.0
+    return 0.6 * new_entries / len(current) + 0.4 * min(1.0, mean_displacement)
+
+
+def _titles(board):
+    return board.titles() if isinstance(board, Snapshot) else [item['title'] for item in board]
+
+
+class AdaptiveScheduler:
+    """
+    根据榜单变动幅度自动调整爬取频率
+
+    每次新快照写入时（通过快照存储的写入钩子）计算与上一次的变动幅度并做指数平滑：
+    变动大（突发新闻）时间隔减半，变动小（如深夜）时间隔放大1.5倍，限制在 [min_interval, max_interval]。
+    爬取失败时按倍数退避。每次爬取前检查小时、天两个滑动窗口的请求预算，超出时推迟到预算允许的时刻。
+    """
+
+    def __init__(self, crawl, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL,
+                 initial_interval=INITIAL_INTERVAL, hourly_budget=HOURLY_BUDGET, daily_budget=DAILY_BUDGET,
+                 low_churn=LOW_CHURN, high_churn=HIGH_CHURN, smoothing=0.5, clock=time.time, sleep=time.sleep):
+        self.crawl = crawl
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min(max(initial_interval, min_interval), max_interval)
+        self.budgets = ((3600, hourly_budget), (86400, daily_budget))
+        self.low_churn = low_churn
+        self.high_churn = high_churn
+        self.smoothing = smoothing
+        self.clock = clock
+        self.sleep = sleep
+        self.smoothed_churn = None
+        self._boards = SnapshotHistory(maxlen=1)  # 上一次的榜单（紧凑形式，调度器长期运行）
+        self._observed = False
+        self._history = deque()  # 最近一天内的爬取时间
+
+    def observe(self, snapshot):
+        """快照写入钩子：记录本次爬取结果的变动幅度"""
+        self._observed = True
+        items = snapshot['items']
+        if self._boards:
+            value = churn(self._boards[-1], items)
+            if self.smoothed_churn is None:
+                self.smoothed_churn = value
+            else:
+                self.smoothed_churn = self.smoothing * value + (1 - self.smoothing) * self.smoothed_churn
+            logger.info(f"榜单变动幅度 {value:.3f}（平滑后 {self.smoothed_churn:.3f}）",
+                        extra={'churn': round(value, 4)})
+        self._boards.append(snapshot)
+
+    def _adjust(self, succeeded):
+        old = self.interval
+        if not succeeded:
+            self.interval *= 2
+        elif self.smoothed_churn is None:
+            pass
+        elif self.smoothed_churn >= self.high_churn:
+            self.interval /= 2
+        elif self.smoothed_churn <= self.low_churn:
+            self.interval *= 1.5
+        self.interval = min(max(self.interval, self.min_interval), self.max_interval)
+        if self.interval != old:
+            logger.info(f"爬取间隔调整: {old:.0f}s -> {self.interval:.0f}s",
+                        extra={'interval': round(self.interval)})
+
+    def budget_delay(self, now):
+        """按请求预算还需要等待的秒数（0表示可以立即爬取）"""
+        while self._history and self._history[0] <= now - 86400:
+            self._history.popleft()
+        delay = 0.0
+        for window, limit in self.budgets:
+            in_window = [t for t in self._history if t > now - window]
+            if limit and len(in_window) >= limit:
+                # 等到窗口内最早的一次过期，窗口内的次数就会回到预算以内
+                delay = max(delay, in_window[len(in_window) - limit] + window - now)
+        return delay
+
+    def run_once(self):
+        """执行一次爬取并调整间隔，返回下一次爬取前需要等待的秒数"""
+        self._history.append(self.clock())
+        self._observed = False
+        started = time.perf_counter()
+        try:
+            self.crawl()
+        except Exception as e:
+            logger.exception(f"爬虫运行失败: {e}")
+            dump_ring_buffer('schedule')
+        self._adjust(self._observed)
+        logger.info(f"本次爬取处理完毕 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+                    extra={'elapsed_ms': round((time.perf_counter() - started) * 1000)})
+        return self.interval + self.budget_delay(self.clock() + self.interval)
+
+    def run_forever(self):
+        from snapshot_store import register_ingest_hook
+        register_ingest_hook(self.observe)
+        logger.info(f"自适应定时爬取已启动：间隔 {self.min_interval}~{self.max_interval} 秒，"
+                    f"预算 每小时{self.budgets[0][1]}次 / 每天{self.budgets[1][1]}次")
+        while True:
+            wait = self.run_once()
+            logger.info(f"下次爬取: {datetime.fromtimestamp(self.clock() + wait).strftime('%H:%M:%S')}")
+            self.sleep(wait)
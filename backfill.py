@@ -0,0 +1,196 @@
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+from multiprocessing import Pool
+from spider_logging import get_logger, setup_logging
+
+logger = get_logger('backfill')
+
+CHECKPOINT_NAME = 'backfill_checkpoint.json'
+
+
+def iter_archive_tasks(archive, store=None):
+    """
+    从原始页面归档产出任务：(爬取时间, 'page', 页面哈希, 快照ID, 数据源)
+
+    每次抓取对应当时写入的快照（见 PageArchive.iter_fetches），修正时覆盖这条快照而不是按抓取时间另写一条。
+    """
+    for entry, snapshot_id, crawl_time, source in archive.iter_fetches(store):
+        yield crawl_time, 'page', entry['sha256'], snapshot_id, source
+
+
+def iter_history_tasks(paths):
+    """从历史Excel文件流式产出任务：(爬取时间, 'rows', JSON字符串, None, 'baidu')，只读模式逐行读取"""
+    import openpyxl
+    for path in paths:
+        workbook = openpyxl.load_workbook(path, read_only=True)
+        try:
+            worksheet = workbook.active
+            for row in worksheet.iter_rows(min_row=2, values_only=True):
+                if len(row) >= 2 and row[0] and row[1]:
+                    yield str(row[0]), 'rows', row[1], None, 'baidu'
+        finally:
+            workbook.close()
+
+
+def count_tasks(source, archive=None, paths=None):
+    """统计任务总数用于显示进度；归档只需数索引行数，Excel在只读模式下读取维度信息"""
+    if source == 'archive':
+        if not os.path.exists(archive.index_file):
+            return 0
+        with open(archive.index_file, 'rb') as f:
+            return sum(1 for _ in f)
+    import openpyxl
+    total = 0
+    for path in paths:
+        workbook = openpyxl.load_workbook(path, read_only=True)
+        total += max(0, (workbook.active.max_row or 1) - 1)
+        workbook.close()
+    return total
+
+
+# 进程池中每个工作进程各自持有一个归档实例
+_worker_archive = None
+
+
+def _init_worker(archive_path):
+    global _worker_archive
+    if archive_path:
+        from page_archive import PageArchive
+        _worker_archive = PageArchive(archive_path)
+
+
+def _process_task(task):
+    """在工作进程中用当前解析器处理一个任务，返回规范化后的热搜列表"""
+    from hot_parser import parse_hot_page, normalize_items
+    crawl_time, kind, payload = task[:3]
+    try:
+        if kind == 'page':
+            items = parse_hot_page(_worker_archive.load(payload))
+        else:
+            items = json.loads(payload)
+        return normalize_items(items)
+    except Exception as e:
+        logger.warning(f"处理 {crawl_time} 的数据失败: {e}")
+        return []
+
+
+class Checkpoint:
+    """记录回填进度，中断后可从上次完成的批次继续"""
+
+    def __init__(self, path, job):
+        self.path = path
+        self.job = job
+        self.state = {'job': job, 'position': 0, 'written': 0, 'unchanged': 0, 'empty': 0}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            if saved.get('job') == job:
+                self.state = saved
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def run_backfill(tasks, store, job, total=0, archive_path=None, workers=None, batch_size=500, restart=False):
+    """
+    用进程池对任务流重新解析并幂等写入快照存储
+
+    任务按批读取，内存中最多只有一个批次；每批写入后保存检查点。
+    快照ID沿用任务中的ID（归档页面对应的原快照），没有时由爬取时间决定；内容未变化的快照不会重复写入，
+    因此中断后重跑是安全的。写入不经过写入钩子，完成后需要重建各索引。
+    """
+    checkpoint = Checkpoint(os.path.join(store.path, CHECKPOINT_NAME), job)
+    if restart:
+        checkpoint.clear()
+        checkpoint = Checkpoint(checkpoint.path, job)
+    state = checkpoint.state
+    if state['position']:
+        logger.info(f"从检查点继续，跳过已处理的 {state['position']} 条")
+    tasks = itertools.islice(tasks, state['position'], None)
+
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    done_this_run = 0
+    with Pool(workers, initializer=_init_worker, initargs=(archive_path,)) as pool:
+        while True:
+            batch = list(itertools.islice(tasks, batch_size))
+            if not batch:
+                break
+            chunksize = max(1, len(batch) // (workers * 4))
+            for (crawl_time, _, _, snapshot_id, source), items in zip(
+                    batch, pool.imap(_process_task, batch, chunksize=chunksize)):
+                if not items:
+                    state['empty'] += 1
+                elif store.append(items, crawl_time=crawl_time, source=source, snapshot_id=snapshot_id, replace=True):
+                    state['written'] += 1
+                else:
+                    state['unchanged'] += 1
+            state['position'] += len(batch)
+            done_this_run += len(batch)
+            checkpoint.save()
+
+            elapsed = time.perf_counter() - started
+            rate = done_this_run / elapsed if elapsed else 0
+            progress = f"{state['position']}/{total}" if total else str(state['position'])
+            eta = f"，预计剩余 {(total - state['position']) / rate:.0f} 秒" if total and rate else ""
+            logger.info(f"回填进度 {progress}，{rate:.1f} 条/秒{eta}",
+                        extra={'position': state['position'], 'rate': round(rate, 1)})
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"回填完成: 写入 {state['written']} 条，未变化 {state['unchanged']} 条，无数据 {state['empty']} 条，"
+                f"本次处理 {done_this_run} 条，耗时 {elapsed:.1f} 秒")
+    checkpoint.clear()
+    return dict(state, seconds=elapsed)
+
+
+def main(argv=None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="用当前解析器回填/修正历史快照")
+    parser.add_argument('source', choices=['archive', 'history'], help="数据来源：原始页面归档或历史Excel")
+    parser.add_argument('files', nargs='*', help="历史Excel文件（source=history时使用）")
+    parser.add_argument('--archive', default=None, help="归档目录")
+    parser.add_argument('--store', default=None, help="快照存储目录")
+    parser.add_argument('--workers', type=int, default=None, help="工作进程数（默认CPU核数）")
+    parser.add_argument('--batch-size', type=int, default=500, help="每批处理的条数")
+    parser.add_argument('--restart', action='store_true', help="忽略检查点，从头开始")
+    args = parser.parse_args(argv)
+
+    setup_logging('backfill')
+    from snapshot_store import SnapshotStore, REBUILD_NOTICE
+    store = SnapshotStore(args.store)
+
+    if args.source == 'archive':
+        from page_archive import PageArchive
+        archive = PageArchive(args.archive)
+        tasks = iter_archive_tasks(archive, store)
+        total = count_tasks('archive', archive=archive)
+        job = f"archive:{os.path.abspath(archive.path)}"
+        archive_path = archive.path
+    else:
+        files = args.files or ['baidu_hot_history.xlsx']
+        tasks = iter_history_tasks(files)
+        total = count_tasks('history', paths=files)
+        job = "history:" + "|".join(os.path.abspath(f) for f in files)
+        archive_path = None
+
+    result = run_backfill(tasks, store, job, total=total, archive_path=archive_path,
+                          workers=args.workers, batch_size=args.batch_size, restart=args.restart)
+    print(f"回填完成: 写入 {result['written']} 条，未变化 {result['unchanged']} 条，无数据 {result['empty']} 条")
+    if result['written']:
+        print(REBUILD_NOTICE)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
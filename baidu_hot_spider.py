@@ -1,14 +1,20 @@
-import requests
-from bs4 import BeautifulSoup
 import time
 import os
 import json
 from datetime import datetime
-import openpyxl
+from spider_logging import get_logger, setup_logging
+from hot_parser import BOARD_URL
+from snapshot_store import save_snapshot, LEGACY_EXCEL
+from run_profiler import profiled, profile_run
 
+logger = get_logger('spider')
+
+@profiled('requests')
 def fetch_baidu_hot():
     """爬取百度热搜榜数据"""
-    url = "https://top.baidu.com/board?tab=realtime"
+    import requests
+    from bs4 import BeautifulSoup
+    url = BOARD_URL
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
     }
@@ -81,26 +87,33 @@ def fetch_baidu_hot():
                     'hot_index': hot_index
                 })
         
+        # 固定的类名都失效时，使用自学习的前缀选择器，避免退回浏览器爬取
+        if not results:
+            from selector_learner import extract_self_healing
+            results = extract_self_healing(soup)
+        
         # 打印调试信息，确保简介不重复
         if len(results) > 1:
-            print(f"数据检查: 第一条简介长度={len(results[0]['description'])}, 第二条简介长度={len(results[1]['description'])}")
+            logger.debug(f"数据检查: 第一条简介长度={len(results[0]['description'])}, 第二条简介长度={len(results[1]['description'])}")
             # 比较前两条简介是否相同
             if results[0]['description'] != results[1]['description']:
-                print("✓ 简介匹配正常，无重复")
+                logger.debug("✓ 简介匹配正常，无重复")
             else:
-                print("! 警告：简介可能有重复")
+                logger.warning("! 警告：简介可能有重复")
         
-        print(f"爬取完成，共获取 {len(results)} 条热搜数据")
+        logger.info(f"爬取完成，共获取 {len(results)} 条热搜数据")
         if results:
-            print(f"样例数据: 标题='{results[0]['title']}', 简介前20字='{results[0]['description'][:20]}...', 热搜指数='{results[0]['hot_index']}'")
+            logger.info(f"样例数据: 标题='{results[0]['title']}', 简介前20字='{results[0]['description'][:20]}...', 热搜指数='{results[0]['hot_index']}'")
         
         return results
     except Exception as e:
-        print(f"爬取失败: {e}")
+        logger.error(f"爬取失败: {e}")
         return []
 
+@profiled('excel')
 def save_to_excel(data):
     """将爬取的数据转换为JSON并追加到同一个Excel文件中"""
+    import openpyxl
     filename = "baidu_hot_history.xlsx"
     current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
@@ -130,10 +143,10 @@ def save_to_excel(data):
         
         # 保存文件
         workbook.save(filename)
-        print(f"数据已追加到 {filename} 文件")
+        logger.info(f"数据已追加到 {filename} 文件")
         return filename
     except Exception as e:
-        print(f"保存数据失败: {e}")
+        logger.error(f"保存数据失败: {e}")
         # 创建备份文件作为备选
         backup_filename = f"baidu_hot_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
         workbook = openpyxl.Workbook()
@@ -142,17 +155,23 @@ def save_to_excel(data):
         worksheet.append(["爬取时间", "JSON数据"])
         worksheet.append([current_time, json_data[:32767]])  # 避免Excel单元格长度限制
         workbook.save(backup_filename)
-        print(f"已创建备份文件: {backup_filename}")
+        logger.warning(f"已创建备份文件: {backup_filename}")
         return backup_filename
 
 def main():
     """主函数"""
-    print(f"开始爬取百度热搜榜 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    logger.info(f"开始爬取百度热搜榜 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     data = fetch_baidu_hot()
     if data:
-        save_to_excel(data)
+        # 写入快照存储，并通知查询视图等增量更新
+        snapshot = save_snapshot(data)
+        # 兼容旧流程：继续追加到Excel历史文件（未通过质量检查的结果不写入）
+        if LEGACY_EXCEL and snapshot is not None:
+            save_to_excel(data)
     else:
-        print("没有获取到数据")
+        logger.warning("没有获取到数据")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    setup_logging('spider')
+    with profile_run('spider'):
+        main()
\ No newline at end of file
@@ -1,21 +1,26 @@
 import os
 import time
 import json
-import logging
 import platform
+import threading
 from datetime import datetime
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-import openpyxl
+from spider_logging import get_logger, setup_logging, dump_ring_buffer
+from hot_parser import parse_hot_page, BOARD_URL
+from page_archive import archive_page
+from snapshot_store import save_snapshot, LEGACY_EXCEL
+from run_profiler import profiled, profile_run
+
+logger = get_logger('selenium')
+
+# 正在使用的浏览器实例，定时任务超时时由 abort_browsers 强制关闭
+_active_drivers = set()
+_drivers_lock = threading.Lock()
 
 # 配置Selenium浏览器选项
-def get_chrome_options():
-    """配置Chrome浏览器选项，支持无头Linux环境"""
+def get_chrome_options(lean=False):
+    """配置Chrome浏览器选项，支持无头Linux环境；lean为True时使用精简配置（见 browser_profile）"""
+    from selenium.webdriver.chrome.options import Options
+    from browser_profile import free_port, apply_lean_profile
     chrome_options = Options()
     
     # 检测是否在无头环境运行（无桌面Linux）
@@ -39,9 +44,10 @@ def get_chrome_options():
     
     # 无头模式（自动检测）
     if is_headless:
-        print("检测到无头环境，启用headless模式")
+        logger.info("检测到无头环境，启用headless模式")
         chrome_options.add_argument('--headless')
-        chrome_options.add_argument('--remote-debugging-port=9222')
+        # 随机分配调试端口，多个实例可以同时运行
+        chrome_options.add_argument(f'--remote-debugging-port={free_port()}')
         chrome_options.add_argument('--disable-setuid-sandbox')  # 额外的Linux安全选项
     
     # 禁用沙盒
@@ -56,15 +62,26 @@ def get_chrome_options():
     # 禁用自动化控制提示
     chrome_options.add_experimental_option('excludeSwitches', ['enable-automation'])
     chrome_options.add_experimental_option('useAutomationExtension', False)
-    # 设置窗口大小
-    chrome_options.add_argument('--window-size=1920,1080')
+    if lean:
+        apply_lean_profile(chrome_options)
+    else:
+        # 设置窗口大小
+        chrome_options.add_argument('--window-size=1920,1080')
     # 设置页面加载策略为eager，加快加载速度
     chrome_options.page_load_strategy = 'eager'
     return chrome_options
 
 # 获取WebDriver实例（添加重试机制）
-def get_webdriver(max_retries=3):
-    """获取配置好的WebDriver实例，支持重试机制和Linux环境优化"""
+def get_webdriver(max_retries=3, lean=None):
+    """获取配置好的WebDriver实例，支持重试机制和Linux环境优化；lean默认取 BAIDU_HOT_LEAN_BROWSER"""
+    # selenium和webdriver_manager只在真正需要浏览器时才导入
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from webdriver_manager.chrome import ChromeDriverManager
+    from browser_profile import LEAN_BROWSER, block_resources
+    
+    if lean is None:
+        lean = LEAN_BROWSER
     # Linux环境特定配置
     is_linux = platform.system() == 'Linux'
     
@@ -72,14 +89,11 @@ def get_webdriver(max_retries=3):
     while retries < max_retries:
         try:
             # 记录日志
-            logging.info(f"尝试创建WebDriver实例（尝试 {retries + 1}/{max_retries}）")
+            logger.info(f"尝试创建WebDriver实例（尝试 {retries + 1}/{max_retries}）")
             
-            options = get_chrome_options()
+            options = get_chrome_options(lean)
             # 添加更多的网络和性能优化选项
-            options.add_argument('--disable-gpu')
-            options.add_argument('--disable-extensions')
             options.add_argument('--dns-prefetch-disable')
-            options.add_argument('--disable-features=NetworkService')
             options.add_argument('--ignore-certificate-errors')
             options.add_argument('--allow-insecure-localhost')
             
@@ -93,7 +107,7 @@ def get_webdriver(max_retries=3):
             
             # Linux环境下的特殊配置
             if is_linux:
-                logging.info("检测到Linux环境，应用特定优化")
+                logger.info("检测到Linux环境，应用特定优化")
                 # 添加额外的Linux服务参数
                 service_args.extend([
                     '--log-path=' + log_path
@@ -127,59 +141,75 @@ def get_webdriver(max_retries=3):
                 "userAgent": 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36'
             })
             
-            logging.info(f"成功创建WebDriver实例（尝试 {retries + 1}/{max_retries}）")
-            print(f"成功创建WebDriver实例（尝试 {retries + 1}/{max_retries}）")
+            # 精简模式：在网络层屏蔽图片、字体、样式表和统计脚本
+            if lean:
+                block_resources(driver)
+            
+            logger.info(f"成功创建WebDriver实例（尝试 {retries + 1}/{max_retries}，{'精简' if lean else '完整'}模式）")
             return driver
             
         except Exception as e:
             error_msg = str(e)
-            logging.error(f"创建WebDriver失败（尝试 {retries + 1}/{max_retries}）: {error_msg}")
-            print(f"创建WebDriver失败（尝试 {retries + 1}/{max_retries}）: {error_msg}")
+            logger.error(f"创建WebDriver失败（尝试 {retries + 1}/{max_retries}）: {error_msg}")
             
             # 针对Linux环境的特定错误处理
             if is_linux:
                 # 检查是否缺少必要的依赖
                 if "error while loading shared libraries" in error_msg:
-                    logging.warning("检测到缺少共享库错误，Linux环境可能需要安装额外依赖")
-                    logging.warning("建议安装: sudo apt-get install -y libxss1 libappindicator1 libindicator7")
+                    logger.warning("检测到缺少共享库错误，Linux环境可能需要安装额外依赖")
+                    logger.warning("建议安装: sudo apt-get install -y libxss1 libappindicator1 libindicator7")
                 
                 # 检查权限问题
                 if "permission denied" in error_msg.lower():
-                    logging.warning("检测到权限问题，尝试设置执行权限")
+                    logger.warning("检测到权限问题，尝试设置执行权限")
                     try:
                         driver_path = ChromeDriverManager().install()
                         os.chmod(driver_path, 0o755)  # 设置可执行权限
                     except Exception as chmod_error:
-                        logging.error(f"设置执行权限失败: {chmod_error}")
+                        logger.error(f"设置执行权限失败: {chmod_error}")
             
             retries += 1
             if retries < max_retries:
                 wait_time = 3  # 可随机化：random.uniform(3, 7)
-                logging.info(f"将在{wait_time}秒后重试...")
-                print(f"将在{wait_time}秒后重试...")
+                logger.info(f"将在{wait_time}秒后重试...")
                 time.sleep(wait_time)
             else:
-                logging.error("达到最大重试次数，放弃创建WebDriver")
-                print("达到最大重试次数，放弃创建WebDriver")
-                # 记录详细错误日志
-                with open('webdriver_error.log', 'w', encoding='utf-8') as f:
-                    f.write(f"错误时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                    f.write(f"错误信息: {str(e)}\n")
+                logger.error("达到最大重试次数，放弃创建WebDriver", extra={'error': str(e)})
+                # 导出最近的日志事件，保留完整的失败现场
+                crash_file = dump_ring_buffer('webdriver')
+                if crash_file:
+                    logger.error(f"WebDriver失败现场已导出到: {crash_file}")
     
     # 如果WebDriver创建失败，尝试使用备用方法
-    logging.warning("尝试使用备用方法...")
-    print("尝试使用备用方法...")
+    logger.info("尝试使用备用方法...")
     return None
 
+def abort_browsers():
+    """
+    强制关闭正在使用的浏览器（在其他线程调用，用于定时任务的超时看门狗）
+
+    先结束浏览器进程树，使卡住的 driver.get() 等调用立即失败，再调用 quit() 清理chromedriver。
+    返回关闭的实例数。
+    """
+    from browser_profile import MemoryWatchdog
+    with _drivers_lock:
+        drivers = list(_active_drivers)
+    for driver in drivers:
+        MemoryWatchdog(driver).kill()
+        try:
+            driver.quit()
+        except Exception:
+            pass
+    return len(drivers)
+
 # 使用requests作为备用爬取方法
+@profiled('requests')
 def fetch_with_requests():
     """使用requests库作为备用爬取方法，增强JSON数据提取和错误处理"""
-    print("尝试使用requests库爬取数据...")
+    logger.info("尝试使用requests库爬取数据...")
     import requests
-    from bs4 import BeautifulSoup
-    import re
     
-    url = "https://top.baidu.com/board?tab=realtime"
+    url = BOARD_URL
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36',
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -199,167 +229,54 @@ def fetch_with_requests():
             except requests.RequestException as e:
                 if retry == max_retries - 1:
                     raise
-                print(f"请求失败 (尝试 {retry + 1}/{max_retries}): {e}")
+                logger.warning(f"请求失败 (尝试 {retry + 1}/{max_retries}): {e}")
                 time.sleep(2)
         
         response.encoding = 'utf-8'
-        print(f"请求成功，状态码: {response.status_code}")
-        
-        # 保存页面内容用于调试
-        with open('backup_page.html', 'w', encoding='utf-8') as f:
-            f.write(response.text)
-        
-        results = []
+        logger.info(f"请求成功，状态码: {response.status_code}")
         
-        # 1. 尝试从页面中提取JSON数据
-        print("尝试提取页面中的JSON数据...")
-        json_pattern = r'window\.__INITIAL_STATE__=(\{.*?\});'
-        json_match = re.search(json_pattern, response.text)
-        
-        if json_match:
-            try:
-                json_data = json.loads(json_match.group(1))
-                print("发现JSON数据，尝试解析...")
-                
-                # 递归搜索可能的热搜数据
-                def search_hot_data(obj, path=""):
-                    if isinstance(obj, list) and len(obj) > 0:
-                        # 检查是否是热搜数据列表
-                        first_item = obj[0]
-                        if isinstance(first_item, dict) and any(k in first_item for k in ['title', 'name', 'hotValue']):
-                            return obj
-                    if isinstance(obj, dict):
-                        for key, value in obj.items():
-                            result = search_hot_data(value, f"{path}.{key}")
-                            if result:
-                                return result
-                    return None
-                
-                hot_list = search_hot_data(json_data)
-                if hot_list and isinstance(hot_list, list):
-                    print(f"找到 {len(hot_list)} 条JSON格式的数据")
-                    for i, item in enumerate(hot_list[:20], 1):
-                        if isinstance(item, dict):
-                            title = item.get('title') or item.get('name') or f"无标题{i}"
-                            hot_index = item.get('hotValue') or item.get('hot_index') or "0"
-                            description = item.get('description') or item.get('desc') or ""
-                            
-                            results.append({
-                                'rank': i,
-                                'title': str(title)[:100],
-                                'description': str(description)[:200],
-                                'hot_index': str(hot_index)
-                            })
-                            print(f"备用方法(JSON) - 已爬取第 {i} 条: {title[:30]}...")
-            except Exception as e:
-                print(f"解析JSON数据失败: {e}")
-        
-        # 2. 如果JSON解析失败，使用BeautifulSoup解析HTML
-        if not results:
-            print("尝试使用BeautifulSoup解析HTML...")
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # 尝试多种可能的选择器
-            selector_sequences = [
-                # 主要选择器
-                ('.category-wrap_iQLoo', '.c-single-text-ellipsis', '.hot-desc_1m_jR', '.hot-index_1Bl1a'),
-                # 备选选择器组合
-                ('.hot-list', '.title', '.desc', '.hot'),
-                ('.hot-rank', '.content', '.detail', '.index'),
-                ('#hot-list', '.hot-item-title', '.hot-item-desc', '.hot-item-index')
-            ]
-            
-            for containers_selector, title_selector, desc_selector, hot_selector in selector_sequences:
-                containers = soup.select(containers_selector)[:20]
-                if not containers:
-                    continue
-                
-                print(f"使用选择器 {containers_selector} 找到 {len(containers)} 个容器")
-                for i, container in enumerate(containers, 1):
-                    try:
-                        # 尝试提取各字段
-                        title_elements = container.select(title_selector)
-                        desc_elements = container.select(desc_selector)
-                        hot_elements = container.select(hot_selector)
-                        
-                        title = title_elements[0].text.strip() if title_elements else container.text.strip()[:50]
-                        description = desc_elements[0].text.strip() if desc_elements else ""
-                        hot_index = hot_elements[0].text.strip() if hot_elements else "0"
-                        
-                        # 清理指数，只保留数字
-                        hot_index = re.sub(r'[^0-9]', '', hot_index)
-                        
-                        results.append({
-                            'rank': i,
-                            'title': title[:100],
-                            'description': description[:200],
-                            'hot_index': hot_index
-                        })
-                        print(f"备用方法(HTML) - 已爬取第 {i} 条: {title[:30]}...")
-                    except Exception as e:
-                        print(f"解析第 {i} 条失败: {e}")
-                
-                if results:
-                    break
+        # 原始页面存入内容寻址归档，替代每次覆盖写入的backup_page.html
+        try:
+            archive_page(response.text, url)
+        except Exception as e:
+            logger.warning(f"页面归档失败: {e}")
         
-        # 3. 如果仍然没有数据，使用通用文本提取
-        if not results:
-            print("尝试通用文本提取...")
-            # 提取所有可能的标题行
-            lines = response.text.split('\n')
-            potential_titles = []
-            
-            for line in lines:
-                line = line.strip()
-                # 过滤出可能是标题的行（长度适中，包含中文字符）
-                if 10 <= len(line) <= 100 and re.search(r'[\u4e00-\u9fa5]', line):
-                    # 清理HTML标签
-                    clean_line = re.sub(r'<[^>]+>', '', line)
-                    clean_line = clean_line.strip()
-                    if clean_line and clean_line not in [item[0] for item in potential_titles]:
-                        # 尝试提取数字作为指数
-                        numbers = re.findall(r'\d+', line)
-                        hot_index = max(numbers) if numbers else "0"
-                        potential_titles.append((clean_line, hot_index))
-            
-            # 使用前20个候选标题
-            for i, (title, hot_index) in enumerate(potential_titles[:20], 1):
-                results.append({
-                    'rank': i,
-                    'title': title[:100],
-                    'description': "通用文本提取",
-                    'hot_index': hot_index
-                })
-            
-            if results:
-                print(f"通过通用文本提取获取到 {len(results)} 条数据")
+        results = parse_hot_page(response.text)
         
         if results:
-            print(f"备用方法成功获取 {len(results)} 条数据")
+            logger.info(f"备用方法成功获取 {len(results)} 条数据")
             return results
         else:
-            print("备用方法也未能获取到数据")
+            logger.warning("备用方法也未能获取到数据")
             return []
             
     except Exception as e:
-        print(f"备用方法爬取失败: {e}")
-        # 记录详细错误
-        error_info = f"错误类型: {type(e).__name__}\n错误信息: {str(e)}"
-        print(error_info)
+        logger.error(f"备用方法爬取失败: {e}", extra={'error_type': type(e).__name__})
         return []
 
 # 使用虚拟浏览器爬取百度热搜榜数据
+@profiled('browser')
 def fetch_baidu_hot_with_browser():
     """使用Selenium虚拟浏览器爬取百度热搜榜数据，带备用方法和智能重试"""
-    url = "https://top.baidu.com/board?tab=realtime"
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from topic_cluster import NearDuplicateFilter
+    from browser_profile import MemoryWatchdog
+    
+    url = BOARD_URL
     results = []
     
     # 首先尝试使用Selenium
     driver = get_webdriver()
     if driver:
+        with _drivers_lock:
+            _active_drivers.add(driver)
+        # 内存看门狗：浏览器进程树超过内存上限时被终止，随后改用requests备用方法
+        watchdog = MemoryWatchdog(driver).start()
         try:
             # 优化页面加载策略
-            print(f"已访问网页: {url}")
+            logger.info(f"已访问网页: {url}")
             # 分阶段加载：先访问，然后等待关键元素
             driver.get(url)
             
@@ -374,20 +291,20 @@ def fetch_baidu_hot_with_browser():
             
             for by, selector in wait_strategies:
                 try:
-                    print(f"尝试等待元素: {by}={selector}")
+                    logger.info(f"尝试等待元素: {by}={selector}")
                     # 使用较短的等待时间快速尝试
                     WebDriverWait(driver, 5).until(
                         EC.presence_of_element_located((by, selector))
                     )
                     element_found = True
-                    print(f"成功找到元素: {selector}")
+                    logger.info(f"成功找到元素: {selector}")
                     break
                 except:
                     continue
             
             # 如果没有找到特定元素，等待页面稳定
             if not element_found:
-                print("未找到特定元素，等待页面加载完成...")
+                logger.warning("未找到特定元素，等待页面加载完成...")
                 time.sleep(5)  # 强制等待
             
             # 模拟人类行为：随机延迟和滚动
@@ -416,15 +333,15 @@ def fetch_baidu_hot_with_browser():
                     items = method()
                     if items and len(items) > 0:
                         hot_items = items[:20]  # 限制数量
-                        print(f"找到 {len(hot_items)} 条热搜数据")
+                        logger.info(f"找到 {len(hot_items)} 条热搜数据")
                         break
                 except Exception as e:
-                    print(f"提取方法失败: {e}")
+                    logger.warning(f"提取方法失败: {e}")
                     continue
             
             # 如果仍然没有找到，尝试获取所有可见元素
             if not hot_items:
-                print("尝试获取页面中所有可能的元素...")
+                logger.info("尝试获取页面中所有可能的元素...")
                 all_elements = driver.find_elements(By.TAG_NAME, 'div')[:100]
                 # 过滤出有意义的元素
                 for elem in all_elements:
@@ -435,10 +352,11 @@ def fetch_baidu_hot_with_browser():
                     except:
                         continue
                 hot_items = hot_items[:20]
-                print(f"找到 {len(hot_items)} 个可能的元素")
+                logger.info(f"找到 {len(hot_items)} 个可能的元素")
             
             # 智能解析数据
-            seen_titles = set()
+            # 按标题和简介的近似相似度去重，避免同一话题的不同标题变体重复入榜
+            near_dupes = NearDuplicateFilter()
             for i, item in enumerate(hot_items, 1):
                 try:
                     # 尝试滚动到元素（如果是可见元素）
@@ -523,27 +441,26 @@ def fetch_baidu_hot_with_browser():
                         pass
                     
                     # 去重
-                    if title and title not in seen_titles:
-                        seen_titles.add(title)
+                    if title and near_dupes.add({'title': title, 'description': description}):
                         results.append({
                             'rank': len(results) + 1,  # 动态排名
                             'title': title[:100],
                             'description': description[:200],
                             'hot_index': hot_index
                         })
-                        print(f"已爬取第 {len(results)} 条: {title[:30]}... - 指数: {hot_index}")
+                        logger.info(f"已爬取第 {len(results)} 条: {title[:30]}... - 指数: {hot_index}", extra={'sample': 'item'})
                         
                         # 避免爬取过多数据
                         if len(results) >= 20:
                             break
                             
                 except Exception as e:
-                    print(f"解析第 {i} 条热搜失败: {e}")
+                    logger.warning(f"解析第 {i} 条热搜失败: {e}")
                     continue
             
             # 验证数据质量
             if results:
-                print(f"Selenium成功提取 {len(results)} 条数据")
+                logger.info(f"Selenium成功提取 {len(results)} 条数据")
                 # 移除重复数据
                 unique_results = []
                 seen = set()
@@ -552,9 +469,9 @@ def fetch_baidu_hot_with_browser():
                         seen.add(item['title'])
                         unique_results.append(item)
                 results = unique_results
-                print(f"去重后剩余 {len(results)} 条数据")
+                logger.info(f"去重后剩余 {len(results)} 条数据")
             else:
-                print("Selenium未能提取到有效数据，尝试备用策略")
+                logger.warning("Selenium未能提取到有效数据，尝试备用策略")
                 
                 # 备用策略：直接获取页面中的所有文本块
                 all_texts = driver.find_elements(By.XPATH, '//*[text()]')
@@ -587,48 +504,53 @@ def fetch_baidu_hot_with_browser():
                         if len(results) >= 20:
                             break
                 
-                print(f"备用策略提取到 {len(results)} 条数据")
+                logger.info(f"备用策略提取到 {len(results)} 条数据")
             
         except Exception as e:
-            print(f"Selenium爬取过程中出现错误: {e}")
-            # 保存页面源码用于调试
+            logger.error(f"Selenium爬取过程中出现错误: {e}")
+            # 出错时的页面源码同样存入归档，便于之后重新解析
             try:
-                with open('selenium_error_page.html', 'w', encoding='utf-8') as f:
-                    f.write(driver.page_source)
-                print("错误页面已保存到selenium_error_page.html")
+                digest = archive_page(driver.page_source, url, link=False)
+                logger.info(f"错误页面已归档: {digest[:12]}")
             except:
                 pass
         finally:
+            watchdog.stop()
+            if watchdog.peak_mb:
+                logger.info(f"浏览器内存峰值 {watchdog.peak_mb:.0f}MB", extra={'rss_mb': round(watchdog.peak_mb, 1)})
             # 确保关闭浏览器
+            with _drivers_lock:
+                _active_drivers.discard(driver)
             try:
                 driver.quit()
-                print("浏览器已关闭")
+                logger.info("浏览器已关闭")
             except:
                 pass
     else:
-        print("WebDriver创建失败，使用requests备用方法")
+        logger.warning("WebDriver创建失败，使用requests备用方法")
     
     # 如果Selenium失败或没有获取到足够数据，使用备用方法
     if not results or len(results) < 5:
-        print(f"使用requests备用方法补充数据")
+        logger.info(f"使用requests备用方法补充数据")
         backup_results = fetch_with_requests()
         
         # 合并结果，避免重复
         if backup_results:
-            seen_titles = {item['title'] for item in results}
+            near_dupes = NearDuplicateFilter()
+            for item in results:
+                near_dupes.add(item)
             for item in backup_results:
-                if item['title'] not in seen_titles:
-                    seen_titles.add(item['title'])
+                if near_dupes.add(item):
                     results.append(item)
-            print(f"合并后共 {len(results)} 条数据")
+            logger.info(f"合并后共 {len(results)} 条数据")
     
     # 最终验证数据
     if results:
-        print(f"爬取完成，共获取 {len(results)} 条有效数据")
+        logger.info(f"爬取完成，共获取 {len(results)} 条有效数据")
     else:
-        print("所有爬取方法均失败，未获取到数据")
-        # 生成模拟数据作为最后的备选方案
-        print("生成模拟数据作为测试...")
+        logger.error("所有爬取方法均失败，未获取到数据")
+        # 生成模拟数据作为最后的备选方案（带mock标记，保存前的质量检查会把它隔离，不会写入历史）
+        logger.warning("生成模拟数据作为测试...")
         import random
         current_time = datetime.now().strftime('%H:%M')
         
@@ -654,14 +576,17 @@ def fetch_baidu_hot_with_browser():
                 'rank': i,
                 'title': title,
                 'description': f"这是关于'{title}'的详细报道和分析",
-                'hot_index': str(hot_value)
+                'hot_index': str(hot_value),
+                'mock': True
             })
     
     return results
 
 # 保存数据到Excel文件（JSON格式）
+@profiled('excel')
 def save_to_excel(data):
     """将爬取的数据转换为JSON并追加到同一个Excel文件中"""
+    import openpyxl
     filename = "baidu_hot_history.xlsx"
     current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
@@ -691,65 +616,75 @@ def save_to_excel(data):
         
         # 保存文件
         workbook.save(filename)
-        print(f"数据已追加到 {filename} 文件")
+        logger.info(f"数据已追加到 {filename} 文件")
         
         # 创建备份文件
         backup_filename = f"baidu_hot_history_backup_{datetime.now().strftime('%Y%m%d%H%M%S')}.xlsx"
         workbook.save(backup_filename)
-        print(f"备份文件已创建: {backup_filename}")
+        logger.info(f"备份文件已创建: {backup_filename}")
         
         return filename
     except Exception as e:
-        print(f"保存Excel文件失败: {e}")
-        # 创建错误日志
-        error_log = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_error.log"
-        with open(error_log, "w", encoding="utf-8") as f:
-            f.write(f"错误时间: {current_time}\n")
-            f.write(f"错误信息: {str(e)}\n")
-            f.write(f"数据预览: {str(data[:2])}...")
-        print(f"错误日志已保存到: {error_log}")
+        logger.error(f"保存Excel文件失败: {e}", extra={'crawl_time': current_time, 'preview': data[:2]})
+        crash_file = dump_ring_buffer('save')
+        if crash_file:
+            logger.error(f"保存失败现场已导出到: {crash_file}")
         
         # 尝试保存为文本文件
         text_filename = f"baidu_hot_backup_{datetime.now().strftime('%Y%m%d%H%M%S')}.txt"
         with open(text_filename, "w", encoding="utf-8") as f:
             f.write(json_data)
-        print(f"数据已临时保存到文本文件: {text_filename}")
+        logger.warning(f"数据已临时保存到文本文件: {text_filename}")
         
         return None
 
 # 主函数
-def main():
-    """主函数"""
-    print(f"开始爬取百度热搜榜 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+def main(strategy='browser'):
+    """主函数，strategy为 browser（Selenium优先，失败时退回requests）或 http（只用requests）"""
+    logger.info(f"开始爬取百度热搜榜 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
-    # 使用虚拟浏览器爬取数据
-    data = fetch_baidu_hot_with_browser()
+    if strategy == 'http':
+        data = fetch_with_requests()
+    else:
+        # 使用虚拟浏览器爬取数据
+        data = fetch_baidu_hot_with_browser()
     
     # 验证爬取结果
     if not data:
-        print("爬取失败，未获取到数据")
+        logger.error("爬取失败，未获取到数据")
         return False
     
     # 验证数据完整性
     if len(data) < 10:
-        print(f"警告: 爬取的数据较少，仅 {len(data)} 条")
+        logger.warning(f"警告: 爬取的数据较少，仅 {len(data)} 条")
     
     # 打印样例数据
     if data:
-        print("\n样例数据:")
+        logger.info("样例数据:")
         for item in data[:3]:  # 只打印前3条
-            print(f"排名: {item['rank']}, 标题: {item['title']}, 指数: {item['hot_index']}")
+            logger.info(f"排名: {item['rank']}, 标题: {item['title']}, 指数: {item['hot_index']}")
     
-    # 保存数据
-    saved_file = save_to_excel(data)
-    if saved_file:
-        print(f"\n爬取完成 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"总共爬取 {len(data)} 条数据")
+    # 保存数据：写入快照存储，并通知查询视图等增量更新
+    store_failed = False
+    try:
+        saved = save_snapshot(data) is not None
+    except Exception as e:
+        logger.exception(f"保存快照失败: {e}")
+        saved = False
+        store_failed = True
+    # 兼容旧流程：继续追加到Excel历史文件（未通过质量检查的结果不写入；快照存储出错时仍写入Excel）
+    if LEGACY_EXCEL and (saved or store_failed):
+        saved = bool(save_to_excel(data)) or saved
+    if saved:
+        logger.info(f"爬取完成 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        logger.info(f"总共爬取 {len(data)} 条数据")
         return True
     else:
-        print("保存数据失败")
+        logger.error("保存数据失败")
         return False
 
 # 程序入口
 if __name__ == "__main__":
-    main()
+    setup_logging('selenium')
+    with profile_run('selenium'):
+        main()
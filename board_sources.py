@@ -0,0 +1,172 @@
+import os
+import re
+import json
+import importlib
+from spider_logging import get_logger
+
+logger = get_logger('sources')
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36'
+
+# 每个榜单最多保留的条目数
+LIMIT = 50
+
+_SCALES = {'万': 10_000, '亿': 100_000_000}
+
+
+def hot_number(value):
+    """把 "1234万热度"、"1.2亿"、12345 这类热度值统一为整数字符串，无法识别时返回空字符串"""
+    if value is None:
+        return ''
+    if isinstance(value, (int, float)):
+        return str(int(value))
+    match = re.search(r'(\d+(?:\.\d+)?)\s*([万亿]?)', str(value).replace(',', ''))
+    if not match:
+        return ''
+    return str(int(float(match.group(1)) * _SCALES.get(match.group(2), 1)))
+
+
+def make_record(rank, title, description='', hot_index=''):
+    """所有数据源共用的记录结构（与百度热搜的字段一致）"""
+    return {
+        'rank': rank,
+        'title': str(title).strip()[:100],
+        'description': str(description or '').strip()[:200],
+        'hot_index': hot_number(hot_index),
+    }
+
+
+class SourceAdapter:
+    """
+    榜单数据源适配器：每个数据源提供自己的地址、请求头和解析逻辑，输出统一的记录结构
+
+    简单的数据源只需设置 name、url 并实现 parse(text)；需要多次请求或特殊处理的数据源可以重写
+    fetch(client)（协程，client 为引擎共用的 HttpClient）。地址可通过环境变量 BAIDU_HOT_<NAME>_URL 覆盖，
+    便于指向本地模拟服务。
+    """
+
+    name = None
+    url = None
+    headers = {}
+
+    def __init__(self, url=None):
+        self.url = url or os.environ.get(f'BAIDU_HOT_{self.name.upper()}_URL') or self.url
+
+    def request_headers(self):
+        return dict({'User-Agent': USER_AGENT, 'Accept-Language': 'zh-CN,zh;q=0.9'}, **self.headers)
+
+    async def fetch(self, client):
+        """请求并解析，返回记录列表"""
+        text = await client.get_text(self.url, self.request_headers())
+        return await client.run(self.parse, text)
+
+    def parse(self, text):
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.name} {self.url}>"
+
+
+class BaiduAdapter(SourceAdapter):
+    """百度热搜实时榜（页面内嵌s-data，退化时按HTML结构解析）"""
+
+    name = 'baidu'
+
+    def __init__(self, url=None):
+        from hot_parser import BOARD_URL
+        super().__init__(url or BOARD_URL)
+
+    def parse(self, text):
+        from hot_parser import parse_hot_page, normalize_items
+        return normalize_items(parse_hot_page(text))
+
+
+class JsonAdapter(SourceAdapter):
+    """返回JSON的榜单接口：子类实现 entries(data)，逐条产出 (标题, 简介, 热度)"""
+
+    headers = {'Accept': 'application/json, text/plain, */*'}
+
+    def parse(self, text):
+        records = []
+        for title, description, hot in self.entries(json.loads(text)):
+            if not title:
+                continue
+            records.append(make_record(len(records) + 1, title, description, hot))
+            if len(records) >= LIMIT:
+                break
+        return records
+
+    def entries(self, data):
+        raise NotImplementedError
+
+
+class WeiboAdapter(JsonAdapter):
+    """微博热搜榜（跳过广告位）"""
+
+    name = 'weibo'
+    url = 'https://weibo.com/ajax/side/hotSearch'
+
+    def entries(self, data):
+        for item in (data.get('data') or {}).get('realtime') or []:
+            if item.get('is_ad'):
+                continue
+            yield item.get('word') or item.get('note'), item.get('label_name') or '', item.get('num')
+
+
+class ZhihuAdapter(JsonAdapter):
+    """知乎热榜"""
+
+    name = 'zhihu'
+    url = 'https://www.zhihu.com/api/v3/feed/topstory/hot-lists/total?limit=50'
+
+    def entries(self, data):
+        for item in data.get('data') or []:
+            target = item.get('target') or {}
+            yield target.get('title'), target.get('excerpt'), item.get('detail_text')
+
+
+class ToutiaoAdapter(JsonAdapter):
+    """今日头条热榜"""
+
+    name = 'toutiao'
+    url = 'https://www.toutiao.com/hot-event/hot-board/?origin=toutiao_pc'
+
+    def entries(self, data):
+        for item in data.get('data') or []:
+            yield item.get('Title'), item.get('LabelDesc') or '', item.get('HotValue')
+
+
+# 内置数据源；其他数据源可以用 "模块:类名" 的形式指定（与写入钩子相同，使用时才导入）
+ADAPTERS = {
+    'baidu': BaiduAdapter,
+    'weibo': WeiboAdapter,
+    'zhihu': ZhihuAdapter,
+    'toutiao': ToutiaoAdapter,
+}
+
+# 默认爬取的数据源，逗号分隔
+DEFAULT_SOURCES = os.environ.get('BAIDU_HOT_SOURCES', 'baidu')
+
+
+def register_adapter(cls):
+    """注册数据源适配器（可用作类装饰器）"""
+    ADAPTERS[cls.name] = cls
+    return cls
+
+
+def load_adapter(spec):
+    """按名称或 "模块:类名" 创建适配器实例"""
+    if ':' in spec:
+        module_name, class_name = spec.split(':')
+        return getattr(importlib.import_module(module_name), class_name)()
+    try:
+        return ADAPTERS[spec]()
+    except KeyError:
+        raise ValueError(f"未知的数据源: {spec}（可选: {', '.join(ADAPTERS)}）") from None
+
+
+def load_adapters(specs=None):
+    specs = specs or DEFAULT_SOURCES
+    if isinstance(specs, str):
+        specs = [s.strip() for s in specs.split(',') if s.strip()]
+    return [load_adapter(spec) for spec in specs]
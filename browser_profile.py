@@ -0,0 +1,277 @@
+import os
+import sys
+import time
+import socket
+import signal
+import argparse
+import threading
+from spider_logging import get_logger, setup_logging
+
+logger = get_logger('browser')
+
+# 精简模式（默认开启）：屏蔽图片、字体、样式表、媒体和统计脚本，只保留页面HTML和主脚本
+LEAN_BROWSER = os.environ.get('BAIDU_HOT_LEAN_BROWSER', '1') != '0'
+# 每个浏览器实例（chromedriver及其全部子进程）的常驻内存上限，超过即终止该实例
+MEMORY_LIMIT_MB = int(os.environ.get('BAIDU_HOT_BROWSER_MEMORY_MB', '768'))
+# 渲染进程V8堆的上限
+JS_HEAP_MB = int(os.environ.get('BAIDU_HOT_BROWSER_JS_HEAP_MB', '128'))
+
+# Network.setBlockedURLs 的匹配规则（* 为通配符）；榜单数据在HTML和s-data中，这些资源都不影响解析
+BLOCKED_URL_PATTERNS = [
+    # 图片（榜单封面在 fyb-1/fyb-2 等CDN上，URL没有扩展名）
+    '*.png*', '*.jpg*', '*.jpeg*', '*.gif*', '*.webp*', '*.svg*', '*.ico*',
+    '*fyb-1.cdn.bcebos.com/*', '*fyb-2.cdn.bcebos.com/*', '*fyb-3.cdn.bcebos.com/*',
+    # 字体和样式表
+    '*.woff*', '*.ttf*', '*.otf*', '*.eot*', '*.css*',
+    # 音视频
+    '*.mp4*', '*.m3u8*', '*.mp3*', '*.webm*',
+    # 统计和上报
+    '*hm.baidu.com/*', '*hmcdn.baidu.com/*', '*sestat.baidu.com/*', '*sp0.baidu.com/*',
+    '*sp1.baidu.com/*', '*mbd.baidu.com/ztbox*',
+]
+
+LEAN_ARGUMENTS = [
+    '--blink-settings=imagesEnabled=false',
+    '--disable-background-networking',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-sync',
+    '--disable-translate',
+    '--disable-features=Translate,OptimizationHints,MediaRouter,AutofillServerCommunication',
+    '--metrics-recording-only',
+    '--mute-audio',
+    '--no-first-run',
+    '--renderer-process-limit=1',
+    '--disk-cache-size=1',
+    '--media-cache-size=1',
+    '--window-size=1280,800',
+]
+
+
+def free_port():
+    """由系统分配一个空闲端口作为远程调试端口，多个浏览器实例可以同时运行"""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def apply_lean_profile(options, js_heap_mb=JS_HEAP_MB):
+    """在ChromeOptions上追加精简模式的启动参数和内容设置"""
+    for argument in LEAN_ARGUMENTS:
+        options.add_argument(argument)
+    options.add_argument(f'--js-flags=--max-old-space-size={js_heap_mb}')
+    options.add_experimental_option('prefs', {
+        'profile.managed_default_content_settings.images': 2,
+        'profile.managed_default_content_settings.fonts': 2,
+        'profile.managed_default_content_settings.media_stream': 2,
+        'profile.default_content_setting_values.notifications': 2,
+    })
+    return options
+
+
+def block_resources(driver, patterns=None):
+    """通过CDP在浏览器网络层屏蔽非必要资源（对之后的所有请求生效）"""
+    patterns = BLOCKED_URL_PATTERNS if patterns is None else patterns
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+    logger.info(f"已屏蔽 {len(patterns)} 类非必要资源")
+
+
+# ---- 内存：统计chromedriver进程树的常驻内存 ----
+
+def _children_map():
+    """读取 /proc 得到 父进程 -> 子进程列表"""
+    children = {}
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat', 'rb') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # 进程名可能包含空格，从最后一个右括号之后解析
+        fields = stat[stat.rfind(b')') + 2:].split()
+        children.setdefault(int(fields[1]), []).append(int(name))
+    return children
+
+
+def process_tree(pid):
+    """返回pid及其全部子孙进程"""
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            return [pid] + [child.pid for child in root.children(recursive=True)]
+        except psutil.Error:
+            return []
+    if not os.path.isdir('/proc'):
+        return []
+    children = _children_map()
+    pids, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        pids.append(current)
+        stack.extend(children.get(current, ()))
+    return pids
+
+
+def _rss(pid):
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss
+    except ImportError:
+        pass
+    except Exception:
+        return 0
+    try:
+        with open(f'/proc/{pid}/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def driver_pid(driver):
+    process = getattr(getattr(driver, 'service', None), 'process', None)
+    return process.pid if process is not None else None
+
+
+def tree_rss_mb(pid):
+    """进程树的常驻内存（MB）；无法统计时返回None"""
+    pids = process_tree(pid) if pid else []
+    if not pids:
+        return None
+    return sum(_rss(p) for p in pids) / (1024 * 1024)
+
+
+class MemoryWatchdog:
+    """
+    后台线程定时统计浏览器进程树的常驻内存，记录峰值；超过上限时结束整个进程树，
+    使正在进行的 driver.get() 等调用失败，由调用方改用requests备用方法
+    """
+
+    def __init__(self, driver, limit_mb=MEMORY_LIMIT_MB, interval=0.5):
+        self.pid = driver_pid(driver)
+        self.limit_mb = limit_mb
+        self.interval = interval
+        self.peak_mb = 0.0
+        self.exceeded = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        rss = tree_rss_mb(self.pid)
+        if rss is None:
+            return None
+        self.peak_mb = max(self.peak_mb, rss)
+        if self.limit_mb and rss > self.limit_mb and not self.exceeded:
+            self.exceeded = True
+            logger.error(f"浏览器内存 {rss:.0f}MB 超过上限 {self.limit_mb}MB，终止浏览器进程",
+                         extra={'rss_mb': round(rss, 1)})
+            self.kill()
+        return rss
+
+    def kill(self):
+        # 先结束子进程（Chrome），最后结束chromedriver本身
+        for pid in reversed(process_tree(self.pid)):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
+
+    def _run(self):
+        while not self._stop.is_set() and not self.exceeded:
+            self.sample()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self.pid is not None:
+            self._thread = threading.Thread(target=self._run, name='browser-memory', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def page_timing(driver):
+    """读取 Navigation Timing，返回各阶段耗时（毫秒）"""
+    timing = driver.execute_script("""
+        const t = performance.timing;
+        return {ttfb: t.responseStart - t.navigationStart,
+                dom_content_loaded: t.domContentLoadedEventEnd - t.navigationStart,
+                load: t.loadEventEnd > 0 ? t.loadEventEnd - t.navigationStart : null,
+                resources: performance.getEntriesByType('resource').length};
+    """)
+    return timing or {}
+
+
+def measure(lean, url=None, runs=3):
+    """分别启动 runs 个浏览器实例加载榜单页，返回每次的加载耗时、资源数和内存峰值"""
+    from hot_parser import BOARD_URL
+    from baidu_hot_spider_selenium import get_webdriver
+    samples = []
+    for _ in range(runs):
+        driver = get_webdriver(max_retries=1, lean=lean)
+        if driver is None:
+            break
+        try:
+            with MemoryWatchdog(driver, limit_mb=0, interval=0.2) as watchdog:
+                started = time.perf_counter()
+                driver.get(url or BOARD_URL)
+                elapsed = (time.perf_counter() - started) * 1000
+                timing = page_timing(driver)
+                watchdog.sample()
+            samples.append({'get_ms': elapsed, 'rss_mb': watchdog.peak_mb, **timing})
+        finally:
+            driver.quit()
+    return samples
+
+
+def _summary(samples, key):
+    values = sorted(s[key] for s in samples if s.get(key) is not None)
+    return values[len(values) // 2] if values else None
+
+
+def main(argv=None):
+    """命令行入口：对比完整模式和精简模式的页面加载耗时与内存占用"""
+    parser = argparse.ArgumentParser(description="浏览器配置基准：完整模式 vs 精简模式")
+    parser.add_argument('--runs', type=int, default=3, help="每种模式启动的浏览器实例数")
+    parser.add_argument('--url', default=None)
+    args = parser.parse_args(argv)
+
+    setup_logging('browser', console=False)
+    results = {}
+    for name, lean in (('full', False), ('lean', True)):
+        samples = measure(lean, args.url, args.runs)
+        if not samples:
+            print(f"{name}: 无法创建浏览器实例，请检查Chrome和chromedriver")
+            return 1
+        results[name] = samples
+
+    keys = ('get_ms', 'dom_content_loaded', 'ttfb', 'resources', 'rss_mb')
+    print(f"{'':<8}" + "".join(f"{key:>20}" for key in keys) + "   （中位数）")
+    for name, samples in results.items():
+        print(f"{name:<8}" + "".join(f"{_summary(samples, key) or 0:>20.1f}" for key in keys))
+    full, lean = results['full'], results['lean']
+    for key in ('get_ms', 'rss_mb'):
+        before, after = _summary(full, key), _summary(lean, key)
+        if before and after is not None:
+            print(f"{key}: 降低 {(1 - after / before):.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
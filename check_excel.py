@@ -1,6 +1,5 @@
 import os
 import json
-import openpyxl
 from datetime import datetime
 
 def get_history_excel():
@@ -25,9 +24,10 @@ def get_history_excel():
 
 def read_excel(filename):
     """读取Excel文件并显示基本信息（支持Selenium爬虫生成的数据）"""
+    import openpyxl
     try:
-        # 使用openpyxl读取Excel文件
-        workbook = openpyxl.load_workbook(filename)
+        # 使用openpyxl以只读模式流式读取Excel文件
+        workbook = openpyxl.load_workbook(filename, read_only=True)
         worksheet = workbook.active
         print(f"成功读取文件: {filename}")
         print(f"工作表名称: {worksheet.title}")
@@ -0,0 +1,187 @@
+import sys
+import argparse
+from array import array
+from collections import namedtuple
+
+# 热搜条目的只读视图，字段与爬虫输出的字典一致（hot_index为整数，缺失时为None）
+HotItem = namedtuple('HotItem', ['rank', 'title', 'description', 'hot_index'])
+
+MISSING_HOT = -1
+
+
+class StringTable:
+    """字符串驻留表：相同的标题/简介在内存中只保存一份，快照里只存4字节的ID"""
+
+    __slots__ = ('strings', 'ids')
+
+    def __init__(self):
+        self.strings = []
+        self.ids = {}
+
+    def intern(self, text):
+        string_id = self.ids.get(text)
+        if string_id is None:
+            string_id = len(self.strings)
+            text = sys.intern(text)
+            self.ids[text] = string_id
+            self.strings.append(text)
+        return string_id
+
+    def __getitem__(self, string_id):
+        return self.strings[string_id]
+
+    def __len__(self):
+        return len(self.strings)
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return MISSING_HOT
+
+
+class Snapshot:
+    """
+    紧凑的快照表示
+
+    标题、简介存为驻留表中的ID（array('I')），热搜指数存为 array('q')，排名默认等于位置，
+    只有不连续时才单独保存。数组构造后不再修改，hot_indices() 等返回的memoryview可以放心长期持有。
+    """
+
+    __slots__ = ('id', 'source', 'crawl_time', 'title_ids', 'desc_ids', 'hot', 'ranks', 'tables')
+
+    def __init__(self, snapshot_id, source, crawl_time, title_ids, desc_ids, hot, ranks, tables):
+        self.id = snapshot_id
+        self.source = source
+        self.crawl_time = crawl_time
+        self.title_ids = title_ids
+        self.desc_ids = desc_ids
+        self.hot = hot
+        self.ranks = ranks
+        self.tables = tables
+
+    @classmethod
+    def from_record(cls, record, tables):
+        """由快照存储中的记录（或爬虫返回的字典列表）构造"""
+        titles, descriptions = tables
+        items = record['items']
+        title_ids = array('I', (titles.intern(item['title']) for item in items))
+        desc_ids = array('I', (descriptions.intern(item.get('description') or '') for item in items))
+        hot = array('q', (_to_int(item.get('hot_index')) for item in items))
+        ranks = array('h', (_to_int(item.get('rank')) for item in items))
+        if all(rank == position for position, rank in enumerate(ranks, 1)):
+            ranks = None
+        return cls(record.get('id'), sys.intern(record.get('source', 'baidu')),
+                   record.get('crawl_time'), title_ids, desc_ids, hot, ranks, tables)
+
+    def __len__(self):
+        return len(self.title_ids)
+
+    def __iter__(self):
+        titles, descriptions = self.tables
+        ranks = self.ranks or range(1, len(self.title_ids) + 1)
+        for rank, title_id, desc_id, hot in zip(ranks, self.title_ids, self.desc_ids, self.hot):
+            yield HotItem(rank, titles[title_id], descriptions[desc_id], None if hot == MISSING_HOT else hot)
+
+    def titles(self):
+        titles = self.tables[0]
+        return [titles[title_id] for title_id in self.title_ids]
+
+    def hot_indices(self):
+        """热搜指数的零拷贝视图（缺失为-1）"""
+        return memoryview(self.hot)
+
+    def title_id_view(self):
+        """标题ID的零拷贝视图，便于跨快照比较而不必比较字符串"""
+        return memoryview(self.title_ids)
+
+    def to_items(self):
+        """还原为爬虫输出的字典列表格式"""
+        return [{
+            'rank': item.rank,
+            'title': item.title,
+            'description': item.description,
+            'hot_index': '' if item.hot_index is None else str(item.hot_index),
+        } for item in self]
+
+
+class SnapshotHistory:
+    """按时间顺序保存在内存中的一组紧凑快照，所有快照共享同一组字符串驻留表"""
+
+    def __init__(self, maxlen=None):
+        self.tables = (StringTable(), StringTable())
+        self.snapshots = []
+        self.maxlen = maxlen
+
+    def append(self, record):
+        snapshot = Snapshot.from_record(record, self.tables)
+        self.snapshots.append(snapshot)
+        if self.maxlen and len(self.snapshots) > self.maxlen:
+            # 只丢弃快照，驻留表中的字符串保留（数量远小于条目数，且后续快照大多会复用）
+            del self.snapshots[0]
+        return snapshot
+
+    def __len__(self):
+        return len(self.snapshots)
+
+    def __getitem__(self, index):
+        return self.snapshots[index]
+
+    def __iter__(self):
+        return iter(self.snapshots)
+
+
+def deep_sizeof(obj, seen=None):
+    """递归估算对象占用的内存（字节），共享对象只计一次"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(deep_sizeof(v, seen) for v in obj)
+    elif isinstance(obj, (Snapshot, StringTable)):
+        size += sum(deep_sizeof(getattr(obj, name), seen) for name in type(obj).__slots__)
+    elif isinstance(obj, SnapshotHistory):
+        size += deep_sizeof(obj.__dict__, seen)
+    return size
+
+
+def measure(records):
+    """比较字典列表和紧凑表示占用的内存，返回 (条目数, 字典列表字节/条, 紧凑表示字节/条)"""
+    records = list(records)
+    items = sum(len(record['items']) for record in records)
+    if not items:
+        return 0, 0.0, 0.0
+    history = SnapshotHistory()
+    for record in records:
+        history.append(record)
+    return items, deep_sizeof(records) / items, deep_sizeof(history) / items
+
+
+def main(argv=None):
+    """命令行入口：测量快照存储中的历史数据在两种表示下的内存占用"""
+    parser = argparse.ArgumentParser(description="紧凑快照表示的内存占用测量")
+    parser.add_argument('--store', default=None, help="快照存储目录")
+    parser.add_argument('--limit', type=int, default=None, help="最多载入的快照数")
+    args = parser.parse_args(argv)
+
+    from itertools import islice
+    from snapshot_store import SnapshotStore
+    # 每条快照单独解析，字符串互不共享，与长期运行的进程逐条载入时一致
+    records = list(islice(SnapshotStore(args.store).iter_snapshots(), args.limit))
+    items, dict_bytes, compact_bytes = measure(records)
+    if not items:
+        print("快照存储为空")
+        return 1
+    print(f"{len(records)} 条快照，{items} 个条目")
+    print(f"字典列表: {dict_bytes:.1f} 字节/条")
+    print(f"紧凑表示: {compact_bytes:.1f} 字节/条（{dict_bytes / compact_bytes:.1f} 倍）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
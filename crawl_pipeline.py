@@ -0,0 +1,347 @@
+import sys
+import json
+import time
+import queue
+import codecs
+import argparse
+import threading
+from spider_logging import get_logger, setup_logging
+from hot_parser import BOARD_URL, S_DATA_MARK, CONTENT_MARK, s_data_item, parse_hot_page, normalize_items, is_junk_item
+
+logger = get_logger('pipeline')
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'zh-CN,zh;q=0.8,zh-TW;q=0.7,zh-HK;q=0.5,en-US;q=0.3,en;q=0.2',
+}
+
+_decoder = json.JSONDecoder()
+
+
+# ---- 各阶段：每个阶段接收上游的迭代器，产出下游的元素 ----
+
+def fetch_chunks(url=None, chunk_size=16384, timeout=15, session=None, archive=True):
+    """
+    流式请求榜单页，逐块产出解码后的文本；下游停止迭代时立即返回，不等待剩余内容
+
+    archive为True时把完整的原始页面存入页面归档（与其他爬取方式一致，见 page_archive）。
+    提前结束时由后台线程读完剩余内容后再归档：只归档已读取的前缀会让内容哈希随分块位置变化，
+    去重失效、干扰压缩字典训练，重新解析时也只能得到被截断的页面。读取出错的页面不归档。
+    抓取开始时登记抓取ID，随后在本线程写入的快照与之关联，页面稍后才归档也不影响重新解析。
+    """
+    import requests
+    from datetime import datetime
+    http = session or requests
+    url = url or BOARD_URL
+    fetched_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    response = http.get(url, headers=HEADERS, timeout=timeout, stream=True)
+    received = fetch_id = None
+    if archive:
+        from page_archive import new_fetch_id, expect_snapshot
+        received = []
+        fetch_id = new_fetch_id()
+        expect_snapshot(fetch_id)
+    complete = drain = False
+    try:
+        response.raise_for_status()
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        chunks = response.iter_content(chunk_size=chunk_size)
+        for chunk in chunks:
+            text = decoder.decode(chunk)
+            if text:
+                if received is not None:
+                    received.append(text)
+                yield text
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            if received is not None:
+                received.append(tail)
+            yield tail
+        complete = True
+    except GeneratorExit:
+        # 下游已取到足够的条目：剩余内容交给后台线程读取，不拖慢本次爬取
+        drain = received is not None
+        raise
+    finally:
+        if drain:
+            # 非守护线程：进程退出前会等待页面读完并归档（每次读取受请求的timeout限制）
+            threading.Thread(target=_drain_and_archive, name='pipeline-drain',
+                             args=(response, chunks, decoder, received, url, fetched_at, fetch_id)).start()
+        else:
+            response.close()
+            if complete and received:
+                _archive_received(''.join(received), url, fetched_at, fetch_id)
+
+
+def _drain_and_archive(response, chunks, decoder, received, url, fetched_at, fetch_id):
+    """读完提前结束的响应的剩余内容，归档完整页面"""
+    try:
+        for chunk in chunks:
+            received.append(decoder.decode(chunk))
+        received.append(decoder.decode(b'', final=True))
+    except Exception as e:
+        logger.warning(f"读取剩余页面失败，不归档不完整的页面: {e}")
+        return
+    finally:
+        response.close()
+    _archive_received(''.join(received), url, fetched_at, fetch_id)
+
+
+def _archive_received(html, url, fetched_at, fetch_id):
+    from page_archive import archive_page
+    try:
+        archive_page(html, url, fetched_at=fetched_at, fetch_id=fetch_id, link=False)
+    except Exception as e:
+        logger.warning(f"页面归档失败: {e}")
+
+
+def parse_stream(chunks, limit=20):
+    """
+    从文本流中增量解析s-data里的热搜条目，每解析完一条就产出一条
+
+    找到s-data之前只保留已读取的前缀；整页都没有s-data时才退回到 parse_hot_page 对整页做完整解析。
+    """
+    prefix = []       # 尚未找到s-data时读到的内容，仅用于兜底解析
+    buffer = ''
+    state = 'seek'    # seek: 寻找s-data标记；list: 在条目数组内
+    position = 0
+    count = 0
+    for chunk in chunks:
+        if state == 'seek':
+            prefix.append(chunk)
+            window = buffer + chunk
+            start = window.find(S_DATA_MARK)
+            if start < 0:
+                buffer = window[-(len(S_DATA_MARK) + len(CONTENT_MARK)):]
+                continue
+            content = window.find(CONTENT_MARK, start)
+            if content < 0:
+                buffer = window[start:]
+                continue
+            prefix = None
+            buffer = window[content + len(CONTENT_MARK):]
+            state = 'list'
+        else:
+            buffer += chunk
+
+        while True:
+            while position < len(buffer) and buffer[position] in ' \r\n\t,':
+                position += 1
+            if position >= len(buffer):
+                break
+            if buffer[position] == ']':
+                return
+            try:
+                raw, end = _decoder.raw_decode(buffer, position)
+            except ValueError:
+                break  # 条目还没有读完整
+            item = s_data_item(raw, count + 1)
+            if item is not None:
+                count += 1
+                yield item
+                if count >= limit:
+                    return
+            # 已解析的部分丢弃，缓冲区只保留尚未完整的一条
+            buffer = buffer[end:]
+            position = 0
+
+    if prefix is not None:
+        logger.info("页面中没有s-data，对整页做完整解析")
+        yield from parse_hot_page(''.join(prefix))[:limit]
+
+
+def normalize_stream(items, dedupe=True):
+    """逐条去掉垃圾条目、热搜指数只保留数字，按标题近似相似度去重，并重新编排排名"""
+    near_dupes = None
+    if dedupe:
+        from topic_cluster import NearDuplicateFilter
+        near_dupes = NearDuplicateFilter()
+    rank = 0
+    for item in items:
+        if is_junk_item(item):
+            continue
+        normalized = normalize_items([item])[0]
+        if near_dupes is not None and not near_dupes.add(normalized):
+            continue
+        rank += 1
+        normalized['rank'] = rank
+        yield normalized
+
+
+def buffered(items, maxsize=64):
+    """在后台线程中运行上游阶段，通过有界队列传给下游，使网络读取与下游处理重叠"""
+    channel = queue.Queue(maxsize=maxsize)
+    done = object()
+    stop = threading.Event()
+
+    def put(item):
+        # 下游已停止时不再阻塞在满队列上
+        while not stop.is_set():
+            try:
+                channel.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(item):
+                    break
+        except Exception as e:
+            put(e)
+        finally:
+            close = getattr(items, 'close', None)
+            if close is not None:
+                close()
+            put(done)
+
+    threading.Thread(target=produce, name='pipeline-buffer', daemon=True).start()
+    try:
+        while True:
+            item = channel.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+# ---- 终点：消费最后一个阶段的输出 ----
+
+def collect_sink(items):
+    return list(items)
+
+
+def store_sink(items, source='baidu', store=None):
+    """写入快照存储（保存前的质量检查和写入钩子都在 save_snapshot 中完成），返回写入的快照"""
+    from snapshot_store import save_snapshot
+    data = list(items)
+    if not data:
+        logger.warning("流水线没有产出任何条目")
+        return None
+    return save_snapshot(data, source=source, store=store)
+
+
+class StageMetrics:
+    """包裹一个阶段的输出迭代器，统计产出条目数和在该阶段（含上游）中花费的时间"""
+
+    def __init__(self, name, iterator):
+        self.name = name
+        self.iterator = iterator
+        self.items = 0
+        self.inclusive = 0.0
+
+    def __iter__(self):
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(self.iterator)
+            except StopIteration:
+                self.inclusive += time.perf_counter() - started
+                return
+            self.inclusive += time.perf_counter() - started
+            self.items += 1
+            yield item
+
+    def close(self):
+        close = getattr(self.iterator, 'close', None)
+        if close is not None:
+            close()
+
+
+class Pipeline:
+    """
+    由可替换的阶段组成的爬取流水线：fetch → parse → validate → （终点）store
+
+    每个阶段是一个函数，第一个阶段不接收参数，其余阶段接收上游的迭代器并返回新的迭代器；
+    条目逐条在阶段之间流动，不会在中间复制整份列表。run() 返回终点的结果和各阶段的耗时统计
+    （每个阶段的耗时不含上游）。
+    """
+
+    def __init__(self, stages=None, sink=store_sink):
+        self.stages = list(stages or [('fetch', fetch_chunks), ('parse', parse_stream), ('validate', normalize_stream)])
+        self.sink = sink
+
+    def replace(self, name, stage):
+        """替换同名阶段（例如换成别的解析器），返回流水线本身"""
+        self.stages = [(n, stage if n == name else s) for n, s in self.stages]
+        return self
+
+    def run(self):
+        wrapped = []
+        iterator = None
+        for name, stage in self.stages:
+            iterator = StageMetrics(name, iter(stage() if iterator is None else stage(iterator)))
+            wrapped.append(iterator)
+            iterator = iter(iterator)
+        started = time.perf_counter()
+        try:
+            result = self.sink(iterator)
+        finally:
+            # 下游提前结束时逐级关闭，使请求阶段释放连接
+            for stage in reversed(wrapped):
+                stage.close()
+        total = time.perf_counter() - started
+
+        metrics = []
+        upstream = 0.0
+        for stage in wrapped:
+            metrics.append({'stage': stage.name, 'items': stage.items,
+                            'ms': round((stage.inclusive - upstream) * 1000, 2)})
+            upstream = stage.inclusive
+        metrics.append({'stage': 'sink', 'items': None, 'ms': round((total - upstream) * 1000, 2)})
+        logger.info("流水线各阶段耗时: " + ", ".join(f"{m['stage']} {m['ms']}ms" for m in metrics),
+                    extra={'stages': metrics})
+        return result, metrics
+
+
+def fetch_items():
+    """只爬取和解析、不写入存储，返回热搜列表（可作为 hot_cache、多节点模式等的爬取函数）"""
+    result, _ = Pipeline(sink=collect_sink).run()
+    return result
+
+
+def crawl(pipeline=None):
+    """用流水线完成一次爬取并写入存储，兼容旧流程时同时追加到Excel历史文件；返回写入的快照"""
+    from snapshot_store import LEGACY_EXCEL
+    try:
+        snapshot, _ = (pipeline or Pipeline()).run()
+    except Exception as e:
+        logger.error(f"流水线爬取失败: {e}", extra={'error_type': type(e).__name__})
+        return None
+    if snapshot is not None and LEGACY_EXCEL:
+        from baidu_hot_spider_selenium import save_to_excel
+        save_to_excel(snapshot['items'])
+    return snapshot
+
+
+def main(argv=None):
+    """命令行入口：用流水线执行一次爬取并打印各阶段耗时"""
+    parser = argparse.ArgumentParser(description="流式爬取流水线")
+    parser.add_argument('--no-store', action='store_true', help="只爬取和解析，不写入存储")
+    parser.add_argument('--buffer', type=int, default=0, help="请求阶段与下游之间的队列长度（0表示不使用后台线程）")
+    args = parser.parse_args(argv)
+
+    setup_logging('pipeline')
+    pipeline = Pipeline(sink=collect_sink if args.no_store else store_sink)
+    if args.buffer:
+        pipeline.replace('fetch', lambda: buffered(fetch_chunks(), args.buffer))
+    result, metrics = pipeline.run()
+    if result and not args.no_store:
+        from snapshot_store import LEGACY_EXCEL
+        if LEGACY_EXCEL:
+            from baidu_hot_spider_selenium import save_to_excel
+            save_to_excel(result['items'])
+    for m in metrics:
+        items = '' if m['items'] is None else f"{m['items']:>5} 条"
+        print(f"{m['stage']:<10} {m['ms']:>9.2f} ms  {items}")
+    return 0 if result else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,34 @@
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None    # Windows：只在进程内互斥
+
+# 同一进程内对同一个锁文件的线程锁（flock按打开的文件生效，同一进程的不同线程也需要互斥）
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+@contextmanager
+def file_lock(path):
+    """
+    跨进程的互斥锁（锁文件 + flock），同时在进程内按路径互斥
+
+    用于多个写入方（爬虫进程、调度器、负载测试中的并发写入）更新同一份索引文件时的读-改-写。
+    """
+    path = os.path.abspath(path)
+    with _thread_locks_guard:
+        lock = _thread_locks.setdefault(path, threading.Lock())
+    with lock:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
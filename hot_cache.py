@@ -0,0 +1,162 @@
+import os
+import json
+import time
+import threading
+from concurrent.futures import Future
+from spider_logging import get_logger
+
+logger = get_logger('cache')
+
+# 磁盘缓存目录，可通过环境变量覆盖
+CACHE_DIR = os.environ.get('BAIDU_HOT_CACHE_DIR', 'hot_cache')
+
+
+class HotCache:
+    """
+    热搜结果缓存：进程内 + 磁盘两级，支持TTL和stale-while-revalidate
+
+    - 结果在ttl秒内直接返回；
+    - 过期但未超过stale_ttl时立即返回旧结果，同时由后台线程刷新一次；
+    - 完全没有可用结果时同步抓取，并发的请求合并为一次上游抓取；
+    - 进程内结果不新鲜时，先看磁盘上是否有其他进程写入的更新结果，有则直接使用。
+    """
+
+    def __init__(self, fetcher, name='baidu', ttl=60, stale_ttl=600, cache_dir=None):
+        self.fetcher = fetcher
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        cache_dir = cache_dir or CACHE_DIR
+        os.makedirs(cache_dir, exist_ok=True)
+        self.disk_path = os.path.join(cache_dir, f'{name}.json')
+        self._lock = threading.Lock()
+        self._entry = None  # (抓取时间戳, 数据)
+        self._disk_mtime = None  # 最近一次读取或写入的磁盘缓存的修改时间
+        self._inflight = None  # 正在进行的上游抓取
+        self._metrics = {'hits': 0, 'stale_hits': 0, 'disk_hits': 0, 'misses': 0,
+                         'coalesced': 0, 'refreshes': 0, 'errors': 0}
+
+    def _load_disk(self):
+        try:
+            with open(self.disk_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            return cached['fetched_at'], cached['data']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _save_disk(self, entry):
+        tmp_path = f"{self.disk_path}.tmp{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'fetched_at': entry[0], 'data': entry[1]}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.disk_path)
+        return os.path.getmtime(self.disk_path)
+
+    def _fresher_disk_entry(self, entry):
+        """磁盘缓存在上次读写之后被（其他进程）更新过、且比进程内结果新时返回它，调用方需持有self._lock"""
+        try:
+            mtime = os.path.getmtime(self.disk_path)
+        except OSError:
+            return None
+        if entry is not None and mtime == self._disk_mtime:
+            return None
+        disk_entry = self._load_disk()
+        self._disk_mtime = mtime
+        if disk_entry is not None and (entry is None or disk_entry[0] > entry[0]):
+            return disk_entry
+        return None
+
+    def _refresh(self, future):
+        """执行一次上游抓取并更新两级缓存，结果通过future通知所有等待者"""
+        try:
+            data = self.fetcher()
+            if not data:
+                raise RuntimeError("上游未返回数据")
+            entry = (time.time(), data)
+            with self._lock:
+                self._entry = entry
+                self._metrics['refreshes'] += 1
+            try:
+                mtime = self._save_disk(entry)
+                with self._lock:
+                    self._disk_mtime = mtime
+            except OSError as e:
+                logger.warning(f"写入磁盘缓存失败: {e}")
+            future.set_result(data)
+        except Exception as e:
+            with self._lock:
+                self._metrics['errors'] += 1
+            logger.warning(f"缓存刷新失败: {e}")
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._inflight = None
+
+    def _start_refresh(self, background):
+        """发起（或加入已有的）上游抓取，调用方需持有self._lock"""
+        if self._inflight is not None:
+            self._metrics['coalesced'] += 1
+            return self._inflight, False
+        self._inflight = Future()
+        if background:
+            threading.Thread(target=self._refresh, args=(self._inflight,), daemon=True).start()
+        return self._inflight, True
+
+    def get(self, timeout=60):
+        """返回最新的热搜数据（可能是允许范围内的旧数据）"""
+        now = time.time()
+        with self._lock:
+            entry = self._entry
+            if entry is None or now - entry[0] >= self.ttl:
+                disk_entry = self._fresher_disk_entry(entry)
+                if disk_entry is not None:
+                    entry = self._entry = disk_entry
+                    self._metrics['disk_hits'] += 1
+
+            if entry is not None:
+                age = now - entry[0]
+                if age < self.ttl:
+                    self._metrics['hits'] += 1
+                    return entry[1]
+                if age < self.ttl + self.stale_ttl:
+                    self._metrics['stale_hits'] += 1
+                    self._start_refresh(background=True)
+                    return entry[1]
+
+            self._metrics['misses'] += 1
+            future, is_leader = self._start_refresh(background=False)
+
+        if is_leader:
+            self._refresh(future)
+        return future.result(timeout=timeout)
+
+    def invalidate(self):
+        """清空进程内缓存（磁盘缓存保留）"""
+        with self._lock:
+            self._entry = None
+
+    def metrics(self):
+        """缓存命中统计"""
+        with self._lock:
+            metrics = dict(self._metrics)
+        total = metrics['hits'] + metrics['stale_hits'] + metrics['misses']
+        metrics['hit_ratio'] = (metrics['hits'] + metrics['stale_hits']) / total if total else 0.0
+        return metrics
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_hot_cache():
+    """默认的百度热搜缓存，上游使用requests版爬虫"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            from baidu_hot_spider import fetch_baidu_hot
+            _default_cache = HotCache(fetch_baidu_hot)
+        return _default_cache
+
+
+def fetch_baidu_hot_cached():
+    """fetch_baidu_hot的缓存版本，供按需调用的内部服务使用"""
+    return get_hot_cache().get()
@@ -0,0 +1,230 @@
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+# 注意：本模块只导入标准库中的轻量模块，各子命令需要的依赖在执行时才导入
+
+STRATEGIES = ('http', 'browser', 'stream')
+
+# 各策略在爬取时才导入的第三方依赖：load_strategy 提前导入，启动耗时检查才能计入它们的真实开销
+STRATEGY_IMPORTS = {
+    'http': ('requests',),
+    'stream': ('requests',),
+    'browser': ('requests', 'selenium.webdriver', 'selenium.webdriver.chrome.service', 'webdriver_manager.chrome'),
+}
+
+# 各策略的启动预算（毫秒）：requests本身的导入约50~60ms（urllib3、certifi等），无法再压缩
+STARTUP_BUDGETS_MS = {'http': 150, 'stream': 150, 'browser': 500}
+
+
+def load_strategy(name):
+    """导入指定爬取策略所需的模块（包括爬取时才会用到的第三方依赖），返回爬取函数"""
+    import importlib
+    for module_name in STRATEGY_IMPORTS[name]:
+        importlib.import_module(module_name)
+    if name == 'stream':
+        import crawl_pipeline
+        return crawl_pipeline.fetch_items
+    import baidu_hot_spider_selenium
+    if name == 'http':
+        return baidu_hot_spider_selenium.fetch_with_requests
+    return baidu_hot_spider_selenium.fetch_baidu_hot_with_browser
+
+
+def cmd_crawl(args):
+    from spider_logging import setup_logging
+    setup_logging('spider')
+    if args.no_excel:
+        os.environ['BAIDU_HOT_EXCEL'] = '0'
+    from run_profiler import profile_run
+    load_strategy(args.strategy)
+    with profile_run(f'crawl-{args.strategy}', force=args.profile):
+        if args.strategy == 'stream':
+            from crawl_pipeline import crawl
+            return 0 if crawl() else 1
+        from baidu_hot_spider_selenium import main
+        return 0 if main(strategy=args.strategy) else 1
+
+
+def cmd_check(args):
+    import check_excel
+    return 0 if check_excel.main() else 1
+
+
+def export_excel(store, filename, source=None):
+    """把快照存储导出为旧格式的Excel历史文件（爬取时间 + JSON数据），返回导出的行数"""
+    import json
+    import openpyxl
+    workbook = openpyxl.Workbook(write_only=True)
+    worksheet = workbook.create_sheet("hot_search_history")
+    worksheet.column_dimensions['A'].width = 20
+    worksheet.column_dimensions['B'].width = 150
+    worksheet.append(["爬取时间", "JSON数据"])
+    rows = 0
+    for snapshot in sorted(store.iter_snapshots(source), key=lambda s: s['crawl_time']):
+        # 单元格最多32767个字符
+        worksheet.append([snapshot['crawl_time'], json.dumps(snapshot['items'], ensure_ascii=False, indent=2)[:32767]])
+        rows += 1
+    workbook.save(filename)
+    return rows
+
+
+def cmd_export(args):
+    from spider_logging import setup_logging
+    from snapshot_store import SnapshotStore
+    setup_logging('cli')
+    rows = export_excel(SnapshotStore(args.store), args.output, args.source)
+    print(f"已导出 {rows} 条快照到 {args.output}")
+    return 0
+
+
+def cmd_serve(args):
+    import query_service
+    argv = ['--host', args.host, '--port', str(args.port)]
+    if args.store:
+        argv += ['--store', args.store]
+    return query_service.main(argv)
+
+
+def cmd_node(args):
+    import leader_lease
+    argv = ['--tick', str(args.tick), '--strategy', args.strategy]
+    if args.node_id:
+        argv += ['--node-id', args.node_id]
+    if args.lease_dir:
+        argv += ['--lease-dir', args.lease_dir]
+    return leader_lease.main(argv)
+
+
+def cmd_migrate(args):
+    import migrate_history
+    argv = list(args.files) + ['--dir', args.dir]
+    if args.store:
+        argv += ['--store', args.store]
+    if args.workers:
+        argv += ['--workers', str(args.workers)]
+    return migrate_history.main(argv)
+
+
+def cmd_aggregate(args):
+    import source_engine
+    argv = ['--interval', str(args.interval)]
+    if args.sources:
+        argv += ['--sources', args.sources]
+    if args.store:
+        argv += ['--store', args.store]
+    return source_engine.main(argv)
+
+
+def parse_importtime(stderr):
+    """
+    解析 -X importtime 的输出，返回按累计耗时降序排列的顶层导入 [(累计微秒, 模块名)]
+
+    每行格式为 "import time: self [us] | cumulative | imported package"，模块名前的缩进表示嵌套层级。
+    """
+    top_level = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split(':', 1)[1].split('|')
+        # 顶层导入的模块名前只有一个空格
+        if name.startswith('  '):
+            continue
+        top_level.append((int(cumulative_us), name.strip()))
+    top_level.sort(reverse=True)
+    return top_level
+
+
+def cmd_startup(args):
+    """测量某个策略从解释器启动到可以开始爬取的耗时，并与预算比较"""
+    code = f"import hot_cli; hot_cli.load_strategy({args.strategy!r})"
+    cwd = os.path.dirname(os.path.abspath(__file__))
+
+    # 计时运行不带 -X importtime（它本身会拖慢导入），最后单独运行一次获取导入明细
+    runs = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=cwd)
+        runs.append((time.perf_counter() - started) * 1000)
+        if result.returncode != 0:
+            print(result.stderr)
+            return 1
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True, cwd=cwd)
+    top_level = parse_importtime(result.stderr)
+
+    budget = args.budget if args.budget is not None else STARTUP_BUDGETS_MS[args.strategy]
+    best = min(runs)
+    print(f"策略 {args.strategy}: 启动耗时 最佳 {best:.1f} ms，平均 {sum(runs) / len(runs):.1f} ms（{args.runs} 次）")
+    print("导入耗时最多的顶层模块:")
+    for cumulative_us, name in top_level[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+    if best > budget:
+        print(f"超出启动预算 {budget} ms")
+        return 1
+    print(f"在启动预算 {budget} ms 以内")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='hot_cli', description="百度热搜爬虫统一命令行")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    crawl = sub.add_parser('crawl', help="执行一次爬取")
+    crawl.add_argument('--strategy', choices=STRATEGIES, default='http', help="http: 只用requests；browser: Selenium优先；stream: 流式流水线")
+    crawl.add_argument('--no-excel', action='store_true', help="不再同时追加到Excel历史文件")
+    crawl.add_argument('--profile', action='store_true', help="本次运行做性能剖析（cProfile、tracemalloc、火焰图）")
+    crawl.set_defaults(func=cmd_crawl)
+
+    check = sub.add_parser('check', help="检查Excel历史文件")
+    check.set_defaults(func=cmd_check)
+
+    export = sub.add_parser('export', help="把快照存储导出为Excel")
+    export.add_argument('--output', default='baidu_hot_export.xlsx')
+    export.add_argument('--store', default=None, help="快照存储目录")
+    export.add_argument('--source', default=None, help="只导出指定数据源")
+    export.set_defaults(func=cmd_export)
+
+    serve = sub.add_parser('serve', help="启动HTTP查询服务")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--store', default=None, help="快照存储目录")
+    serve.set_defaults(func=cmd_serve)
+
+    node = sub.add_parser('node', help="以多节点协同模式运行（租约选主，共享快照存储）")
+    node.add_argument('--node-id', default=None)
+    node.add_argument('--tick', type=int, default=600, help="调度周期（秒）")
+    node.add_argument('--lease-dir', default=None, help="共享的租约目录")
+    node.add_argument('--strategy', choices=STRATEGIES, default='http')
+    node.set_defaults(func=cmd_node)
+
+    migrate = sub.add_parser('migrate', help="把Excel历史和备份文件迁移到快照存储")
+    migrate.add_argument('files', nargs='*', help="要迁移的文件，默认查找历史文件和所有备份")
+    migrate.add_argument('--dir', default='.', help="查找历史文件的目录")
+    migrate.add_argument('--store', default=None, help="快照存储目录")
+    migrate.add_argument('--workers', type=int, default=None, help="读取文件的进程数")
+    migrate.set_defaults(func=cmd_migrate)
+
+    aggregate = sub.add_parser('aggregate', help="并发爬取多个榜单（百度、微博、知乎、头条等）")
+    aggregate.add_argument('--sources', default=None, help="逗号分隔的数据源，默认读取 BAIDU_HOT_SOURCES")
+    aggregate.add_argument('--interval', type=int, default=0, help="循环爬取的间隔（秒），0表示只爬取一次")
+    aggregate.add_argument('--store', default=None, help="快照存储目录")
+    aggregate.set_defaults(func=cmd_aggregate)
+
+    startup = sub.add_parser('startup', help="测量启动和导入耗时（基于 -X importtime）")
+    startup.add_argument('--strategy', choices=STRATEGIES, default='http')
+    startup.add_argument('--budget', type=float, default=None, help="启动预算（毫秒），默认按策略取 STARTUP_BUDGETS_MS")
+    startup.add_argument('--runs', type=int, default=5)
+    startup.add_argument('--top', type=int, default=10)
+    startup.set_defaults(func=cmd_startup)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
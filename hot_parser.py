@@ -0,0 +1,243 @@
+import os
+import re
+import json
+from spider_logging import get_logger
+from run_profiler import profiled
+
+logger = get_logger('parser')
+
+# 榜单地址，可通过环境变量指向本地的模拟服务（见 mock_board.py）
+BOARD_URL = os.environ.get('BAIDU_HOT_URL', 'https://top.baidu.com/board?tab=realtime')
+
+S_DATA_MARK = '<!--s-data:'
+CONTENT_MARK = '"content":['
+
+def s_data_item(item, rank):
+    """把s-data中的一条原始记录转换为热搜条目，无效记录返回None"""
+    if not isinstance(item, dict) or not (item.get('word') or item.get('query')):
+        return None
+    return {
+        'rank': rank,
+        'title': str(item.get('word') or item.get('query')).strip()[:100],
+        'description': str(item.get('desc') or '').strip()[:200],
+        'hot_index': re.sub(r'[^0-9]', '', str(item.get('hotScore') or ''))
+    }
+
+
+def extract_s_data(html, limit=20):
+    """从页面内嵌的 <!--s-data:{...}--> 注释中提取热搜列表，不依赖任何样式类名"""
+    start = html.find(S_DATA_MARK)
+    if start < 0:
+        return []
+    start += len(S_DATA_MARK)
+    end = html.find('-->', start)
+    if end < 0:
+        return _truncated_s_data(html, start, limit)
+    try:
+        data = json.loads(html[start:end])
+        cards = data['data']['cards']
+    except (ValueError, KeyError, TypeError) as e:
+        logger.warning(f"解析s-data失败: {e}")
+        return []
+
+    results = []
+    for card in cards:
+        for item in card.get('content') or []:
+            entry = s_data_item(item, len(results) + 1)
+            if entry is None:
+                continue
+            results.append(entry)
+            if len(results) >= limit:
+                return results
+        if results:
+            break
+    return results
+
+
+def _truncated_s_data(html, start, limit):
+    """页面只有前半部分时（流式爬取提前结束后归档的内容），逐条解码s-data中已完整的条目"""
+    content = html.find(CONTENT_MARK, start)
+    if content < 0:
+        return []
+    decoder = json.JSONDecoder()
+    position = content + len(CONTENT_MARK)
+    results = []
+    while len(results) < limit:
+        while position < len(html) and html[position] in ' \r\n\t,':
+            position += 1
+        if position >= len(html) or html[position] == ']':
+            break
+        try:
+            raw, position = decoder.raw_decode(html, position)
+        except ValueError:
+            break  # 最后一条不完整
+        entry = s_data_item(raw, len(results) + 1)
+        if entry is not None:
+            results.append(entry)
+    return results
+
+@profiled('parse')
+def parse_hot_page(html):
+    """从热搜榜页面HTML中解析热搜数据（依次尝试页面JSON、CSS选择器、通用文本提取）"""
+    # 1. 优先使用页面内嵌的s-data数据：最快，也不需要导入HTML解析库
+    results = extract_s_data(html)
+    if results:
+        logger.info(f"从s-data中提取到 {len(results)} 条数据")
+        return results
+
+    logger.info("尝试提取页面中的JSON数据...")
+    json_pattern = r'window\.__INITIAL_STATE__=(\{.*?\});'
+    json_match = re.search(json_pattern, html)
+
+    if json_match:
+        try:
+            json_data = json.loads(json_match.group(1))
+            logger.info("发现JSON数据，尝试解析...")
+
+            # 递归搜索可能的热搜数据
+            def search_hot_data(obj, path=""):
+                if isinstance(obj, list) and len(obj) > 0:
+                    # 检查是否是热搜数据列表
+                    first_item = obj[0]
+                    if isinstance(first_item, dict) and any(k in first_item for k in ['title', 'name', 'hotValue']):
+                        return obj
+                if isinstance(obj, dict):
+                    for key, value in obj.items():
+                        result = search_hot_data(value, f"{path}.{key}")
+                        if result:
+                            return result
+                return None
+
+            hot_list = search_hot_data(json_data)
+            if hot_list and isinstance(hot_list, list):
+                logger.info(f"找到 {len(hot_list)} 条JSON格式的数据")
+                for i, item in enumerate(hot_list[:20], 1):
+                    if isinstance(item, dict):
+                        title = item.get('title') or item.get('name') or f"无标题{i}"
+                        hot_index = item.get('hotValue') or item.get('hot_index') or "0"
+                        description = item.get('description') or item.get('desc') or ""
+
+                        results.append({
+                            'rank': i,
+                            'title': str(title)[:100],
+                            'description': str(description)[:200],
+                            'hot_index': str(hot_index)
+                        })
+                        logger.info(f"备用方法(JSON) - 已爬取第 {i} 条: {title[:30]}...", extra={'sample': 'item'})
+        except Exception as e:
+            logger.warning(f"解析JSON数据失败: {e}")
+
+    # 2. 如果JSON解析失败，使用BeautifulSoup解析HTML
+    if not results:
+        logger.info("尝试使用BeautifulSoup解析HTML...")
+        # HTML解析库只在需要时导入，页面JSON可用时完全不需要
+        from bs4 import BeautifulSoup
+        from selector_learner import extract_self_healing
+        soup = BeautifulSoup(html, 'html.parser')
+
+        # 尝试多种可能的选择器
+        selector_sequences = [
+            # 主要选择器
+            ('.category-wrap_iQLoo', '.c-single-text-ellipsis', '.hot-desc_1m_jR', '.hot-index_1Bl1a'),
+            # 备选选择器组合
+            ('.hot-list', '.title', '.desc', '.hot'),
+            ('.hot-rank', '.content', '.detail', '.index'),
+            ('#hot-list', '.hot-item-title', '.hot-item-desc', '.hot-item-index')
+        ]
+
+        for containers_selector, title_selector, desc_selector, hot_selector in selector_sequences:
+            containers = soup.select(containers_selector)[:20]
+            if not containers:
+                continue
+
+            logger.info(f"使用选择器 {containers_selector} 找到 {len(containers)} 个容器")
+            for i, container in enumerate(containers, 1):
+                try:
+                    # 尝试提取各字段
+                    title_elements = container.select(title_selector)
+                    desc_elements = container.select(desc_selector)
+                    hot_elements = container.select(hot_selector)
+
+                    title = title_elements[0].text.strip() if title_elements else container.text.strip()[:50]
+                    description = desc_elements[0].text.strip() if desc_elements else ""
+                    hot_index = hot_elements[0].text.strip() if hot_elements else "0"
+
+                    # 清理指数，只保留数字
+                    hot_index = re.sub(r'[^0-9]', '', hot_index)
+
+                    results.append({
+                        'rank': i,
+                        'title': title[:100],
+                        'description': description[:200],
+                        'hot_index': hot_index
+                    })
+                    logger.info(f"备用方法(HTML) - 已爬取第 {i} 条: {title[:30]}...", extra={'sample': 'item'})
+                except Exception as e:
+                    logger.warning(f"解析第 {i} 条失败: {e}")
+
+            if results:
+                break
+
+        # 固定的类名都失效时（页面改版、哈希变化），使用自学习的前缀选择器
+        if not results:
+            logger.info("固定选择器未命中，尝试自学习选择器...")
+            results = extract_self_healing(soup)
+
+    # 3. 如果仍然没有数据，使用通用文本提取
+    if not results:
+        logger.info("尝试通用文本提取...")
+        # 提取所有可能的标题行
+        lines = html.split('\n')
+        potential_titles = []
+
+        for line in lines:
+            line = line.strip()
+            # 过滤出可能是标题的行（长度适中，包含中文字符）
+            if 10 <= len(line) <= 100 and re.search(r'[\u4e00-\u9fa5]', line):
+                # 清理HTML标签
+                clean_line = re.sub(r'<[^>]+>', '', line)
+                clean_line = clean_line.strip()
+                if clean_line and clean_line not in [item[0] for item in potential_titles]:
+                    # 尝试提取数字作为指数
+                    numbers = re.findall(r'\d+', line)
+                    hot_index = max(numbers) if numbers else "0"
+                    potential_titles.append((clean_line, hot_index))
+
+        # 使用前20个候选标题
+        for i, (title, hot_index) in enumerate(potential_titles[:20], 1):
+            results.append({
+                'rank': i,
+                'title': title[:100],
+                'description': "通用文本提取",
+                'hot_index': hot_index
+            })
+
+        if results:
+            logger.info(f"通过通用文本提取获取到 {len(results)} 条数据")
+
+    return results
+
+# 兜底策略生成的占位内容，出现这些内容的条目不是真实的热搜数据
+JUNK_DESCRIPTIONS = {"通用文本提取", "备用策略提取"}
+JUNK_TITLE_PREFIX = "无标题"
+
+def is_junk_item(item):
+    """判断单条热搜是否为兜底策略产生的垃圾数据"""
+    title = str(item.get('title') or '').strip()
+    return (not title
+            or title.startswith(JUNK_TITLE_PREFIX)
+            or item.get('description') in JUNK_DESCRIPTIONS)
+
+def normalize_items(items):
+    """去掉垃圾条目，热搜指数只保留数字，并重新编排排名"""
+    results = []
+    for item in items:
+        if not isinstance(item, dict) or is_junk_item(item):
+            continue
+        results.append({
+            'rank': len(results) + 1,
+            'title': str(item['title']).strip()[:100],
+            'description': str(item.get('description') or '').strip()[:200],
+            'hot_index': re.sub(r'[^0-9]', '', str(item.get('hot_index') or ''))
+        })
+    return results
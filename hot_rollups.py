@@ -0,0 +1,392 @@
+import os
+import sys
+import json
+import zlib
+import struct
+import hashlib
+import argparse
+import threading
+from array import array
+from datetime import datetime
+from file_lock import file_lock
+from spider_logging import get_logger, setup_logging
+
+logger = get_logger('rollups')
+
+# 统计目录，可通过环境变量覆盖
+ROLLUP_DIR = os.environ.get('BAIDU_HOT_ROLLUP_DIR', 'rollups')
+# 增量日志超过这个大小时，写入钩子把日志合并进状态文件并清空日志（约2000条快照）
+COMPACT_LOG_BYTES = int(os.environ.get('BAIDU_HOT_ROLLUP_COMPACT_BYTES', str(2 * 1024 * 1024)))
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 停留时长：相邻两次快照的间隔计入上一次快照中前10名的话题；间隔超过MAX_GAP秒（爬虫停机）只计MAX_GAP秒
+TOP_N = 10
+MAX_GAP = 3600
+# 小时级计数只保留最近这么多天，天级计数全部保留
+HOUR_RETENTION_DAYS = 90
+
+# count-min sketch：DEPTH行 × WIDTH列的32位计数器；高频标题候选最多保留HEAVY_HITTERS个
+DEPTH = 4
+WIDTH = 4096
+HEAVY_HITTERS = 100
+
+# 文件头：魔数、版本、sketch的行数和列数、后面压缩JSON的长度
+MAGIC = b'BHRU'
+VERSION = 1
+HEADER = struct.Struct('<4sHHII')
+
+# 小时/天计数的字段顺序（以列表存储，比字典紧凑）
+SNAPSHOTS, ITEMS, HOT_COUNT, HOT_SUM, HOT_MAX = range(5)
+
+
+def _hot_value(item):
+    try:
+        return int(item.get('hot_index'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _epoch(crawl_time):
+    return datetime.strptime(crawl_time, TIME_FORMAT).timestamp()
+
+
+def _new_counter():
+    return [0, 0, 0, 0, 0]
+
+
+def _add(counter, items, hot_values):
+    counter[SNAPSHOTS] += 1
+    counter[ITEMS] += len(items)
+    for value in hot_values:
+        counter[HOT_COUNT] += 1
+        counter[HOT_SUM] += value
+        if value > counter[HOT_MAX]:
+            counter[HOT_MAX] = value
+
+
+def _describe(key, counter):
+    if counter is None:
+        return None
+    return {
+        'period': key,
+        'snapshots': counter[SNAPSHOTS],
+        'items': counter[ITEMS],
+        'hot_max': counter[HOT_MAX] if counter[HOT_COUNT] else None,
+        'hot_mean': round(counter[HOT_SUM] / counter[HOT_COUNT], 1) if counter[HOT_COUNT] else None,
+    }
+
+
+class CountMinSketch:
+    """标题出现次数的count-min sketch（保守更新），估计值只会偏大，不会偏小"""
+
+    __slots__ = ('depth', 'width', 'counters')
+
+    def __init__(self, depth=DEPTH, width=WIDTH, counters=None):
+        self.depth = depth
+        self.width = width
+        self.counters = counters if counters is not None else array('I', bytes(4 * depth * width))
+
+    def _cells(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=4 * self.depth).digest()
+        return [row * self.width + int.from_bytes(digest[4 * row:4 * row + 4], 'little') % self.width
+                for row in range(self.depth)]
+
+    def add(self, key, count=1):
+        """加count并返回新的估计值"""
+        cells = self._cells(key)
+        estimate = min(self.counters[cell] for cell in cells) + count
+        for cell in cells:
+            if self.counters[cell] < estimate:
+                self.counters[cell] = estimate
+        return estimate
+
+    def estimate(self, key):
+        return min(self.counters[cell] for cell in self._cells(key))
+
+
+class Rollups:
+    """
+    一个数据源的写入期统计，每写入一条快照以 O(条目数) 增量更新
+
+    - 每小时、每天的计数：快照数、条目数、热搜指数的最大值和均值（保存总和与个数）；
+    - 按一天中的小时（0~23）汇总的热搜指数，回答“各时段平均热度”；
+    - 每天各话题在前10名的停留秒数；
+    - 标题出现次数的count-min sketch和高频标题候选。
+    所有报表都是直接查表，与历史长度无关。
+
+    持久化为状态文件 <source>.rollup（定长文件头 + sketch计数器 + zlib压缩的JSON）+ 增量日志 <source>.log。
+    写入时持有锁文件，只向日志追加这条快照（代价与历史长度无关）；日志超过 COMPACT_LOG_BYTES 时才重写状态文件并清空日志。
+    载入时先读状态文件再重放日志。每行日志带有状态文件的代数，重写状态文件后、清空日志前中断时，旧代数的行在重放时跳过。
+    """
+
+    def __init__(self, path=None, source='baidu'):
+        self.path = path or ROLLUP_DIR
+        os.makedirs(self.path, exist_ok=True)
+        self.source = source
+        self.filename = os.path.join(self.path, f'{source}.rollup')
+        self.log_file = os.path.join(self.path, f'{source}.log')
+        self.lock_file = os.path.join(self.path, f'{source}.lock')
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._reset()
+        self.load()
+
+    def _reset(self):
+        self.sketch = CountMinSketch()
+        self.hours = {}         # "YYYY-MM-DD HH" -> 计数
+        self.days = {}          # "YYYY-MM-DD" -> 计数
+        self.hour_of_day = [_new_counter() for _ in range(24)]
+        self.dwell = {}         # "YYYY-MM-DD" -> {标题: 前10名停留秒数}
+        self.heavy = {}         # 高频标题候选 -> 估计次数
+        self.last = None        # 最近一次快照的 [爬取时间, 前10名标题]
+        self.generation = 0     # 状态文件的代数，每次合并日志加一
+        self._log_offset = 0
+
+    def load(self):
+        """载入状态文件并重放增量日志"""
+        self._load_state()
+        self._replay_log()
+        return self
+
+    def _load_state(self):
+        if not os.path.exists(self.filename):
+            self._mtime = None
+            return
+        with open(self.filename, 'rb') as f:
+            data = f.read()
+        magic, version, depth, width, length = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"不是有效的统计文件: {self.filename}")
+        counters = array('I')
+        counters.frombytes(data[HEADER.size:HEADER.size + 4 * depth * width])
+        state = json.loads(zlib.decompress(data[HEADER.size + 4 * depth * width:][:length]))
+        self.sketch = CountMinSketch(depth, width, counters)
+        self.hours = state['hours']
+        self.days = state['days']
+        self.hour_of_day = state['hour_of_day']
+        self.dwell = state['dwell']
+        self.heavy = state['heavy']
+        self.last = state['last']
+        self.generation = state.get('generation', 0)
+        self._mtime = os.stat(self.filename).st_mtime_ns
+
+    def _replay_log(self):
+        if not os.path.exists(self.log_file):
+            return
+        with open(self.log_file, 'rb') as f:
+            f.seek(self._log_offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                self._log_offset += len(line)
+                delta = json.loads(line)
+                if delta['g'] < self.generation:
+                    continue    # 已合并进状态文件
+                self.apply({'crawl_time': delta['time'],
+                            'items': [{'title': title, 'rank': rank, 'hot_index': hot}
+                                      for title, rank, hot in delta['items']]})
+
+    def save(self):
+        """把当前状态写成状态文件（不清空日志，见 compact）"""
+        state = {'hours': self.hours, 'days': self.days, 'hour_of_day': self.hour_of_day,
+                 'dwell': self.dwell, 'heavy': self.heavy, 'last': self.last, 'generation': self.generation}
+        payload = zlib.compress(json.dumps(state, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 6)
+        tmp_path = f"{self.filename}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.sketch.depth, self.sketch.width, len(payload)))
+            f.write(self.sketch.counters.tobytes())
+            f.write(payload)
+        os.replace(tmp_path, self.filename)
+        self._mtime = os.stat(self.filename).st_mtime_ns
+
+    def _refresh(self):
+        """追上其他进程（例如另一个爬虫节点）的写入：状态文件被重写过时重新载入，否则只重放新增的日志"""
+        try:
+            mtime = os.stat(self.filename).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime != self._mtime:
+            self._reset()
+            self.load()
+        else:
+            self._replay_log()
+
+    def apply(self, snapshot):
+        """增量应用一条快照（不保存）"""
+        crawl_time = snapshot['crawl_time']
+        items = snapshot['items']
+        hour, day = crawl_time[:13], crawl_time[:10]
+        hot_values = [v for v in (_hot_value(item) for item in items) if v is not None]
+
+        if day not in self.days:
+            self._prune(day)  # 每天只检查一次过期的小时计数
+        _add(self.hours.setdefault(hour, _new_counter()), items, hot_values)
+        _add(self.days.setdefault(day, _new_counter()), items, hot_values)
+        _add(self.hour_of_day[int(crawl_time[11:13])], items, hot_values)
+
+        for item in items:
+            title = item['title']
+            estimate = self.sketch.add(title)
+            if title in self.heavy or len(self.heavy) < HEAVY_HITTERS:
+                self.heavy[title] = estimate
+            else:
+                weakest = min(self.heavy, key=self.heavy.get)
+                if estimate > self.heavy[weakest]:
+                    del self.heavy[weakest]
+                    self.heavy[title] = estimate
+
+        # 停留时长只按时间顺序累计；晚到的旧快照只计入计数
+        top = [item['title'] for item in sorted(items, key=lambda i: i.get('rank', 0))[:TOP_N]]
+        if self.last is None or crawl_time > self.last[0]:
+            if self.last is not None:
+                previous_time, previous_top = self.last
+                gap = int(min(MAX_GAP, _epoch(crawl_time) - _epoch(previous_time)))
+                dwell = self.dwell.setdefault(previous_time[:10], {})
+                for title in previous_top:
+                    dwell[title] = dwell.get(title, 0) + gap
+            self.last = [crawl_time, top]
+
+    def _prune(self, day):
+        cutoff = datetime.fromtimestamp(_epoch(f"{day} 00:00:00") - HOUR_RETENTION_DAYS * 86400).strftime("%Y-%m-%d")
+        if self.hours and min(self.hours) < cutoff:
+            self.hours = {hour: counter for hour, counter in self.hours.items() if hour >= cutoff}
+
+    def ingest(self, snapshot, compact_bytes=None):
+        """写入钩子调用：应用一条快照并追加到增量日志，日志超过阈值时顺带合并"""
+        delta = {
+            'g': 0,
+            'time': snapshot['crawl_time'],
+            'items': [[item['title'], item.get('rank', 0), item.get('hot_index')] for item in snapshot['items']],
+        }
+        compact_bytes = COMPACT_LOG_BYTES if compact_bytes is None else compact_bytes
+        with self._lock, file_lock(self.lock_file):
+            self._refresh()
+            delta['g'] = self.generation
+            with open(self.log_file, 'ab') as f:
+                f.write((json.dumps(delta, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8'))
+                self._log_offset = f.tell()
+            self.apply(snapshot)
+            if compact_bytes and self._log_offset >= compact_bytes:
+                self._compact_locked()
+
+    def compact(self):
+        """把增量日志合并进状态文件并清空日志"""
+        with self._lock, file_lock(self.lock_file):
+            self._refresh()
+            self._compact_locked()
+
+    def _compact_locked(self):
+        # 先写入新一代的状态文件再清空日志，中途中断时日志中的旧代数行会在重放时跳过
+        self.generation += 1
+        self.save()
+        open(self.log_file, 'wb').close()
+        self._log_offset = 0
+
+    # ---- 报表：均为直接查表 ----
+
+    def hourly(self, hour):
+        """某个小时（"YYYY-MM-DD HH"）的计数"""
+        return _describe(hour, self.hours.get(hour))
+
+    def daily(self, day):
+        return _describe(day, self.days.get(day))
+
+    def by_hour_of_day(self):
+        """一天中各小时的热搜指数均值和最大值（全部历史）"""
+        return [_describe(f"{hour:02d}", counter) for hour, counter in enumerate(self.hour_of_day)]
+
+    def top_dwell(self, day, limit=10):
+        """某天在前10名停留最久的话题：[(标题, 秒数)]"""
+        dwell = self.dwell.get(day, {})
+        return sorted(dwell.items(), key=lambda pair: -pair[1])[:limit]
+
+    def frequent_titles(self, limit=10):
+        """出现次数最多的标题（count-min估计值）"""
+        return sorted(self.heavy.items(), key=lambda pair: -pair[1])[:limit]
+
+    def estimate(self, title):
+        return self.sketch.estimate(title)
+
+
+_rollups = {}
+
+
+def get_rollups(source='baidu'):
+    if source not in _rollups:
+        _rollups[source] = Rollups(source=source)
+    return _rollups[source]
+
+
+def on_snapshot(snapshot):
+    """快照写入钩子：更新统计"""
+    get_rollups(snapshot.get('source', 'baidu')).ingest(snapshot)
+
+
+def rebuild(store, path=None, source='baidu'):
+    """从快照存储按时间顺序重新计算统计，返回处理的快照数"""
+    path = path or ROLLUP_DIR
+    os.makedirs(path, exist_ok=True)
+    with file_lock(os.path.join(path, f'{source}.lock')):
+        for name in (f'{source}.rollup', f'{source}.log'):
+            if os.path.exists(os.path.join(path, name)):
+                os.remove(os.path.join(path, name))
+        rollups = Rollups(path, source)
+        count = 0
+        for snapshot in sorted(store.iter_snapshots(source), key=lambda s: s['crawl_time']):
+            rollups.apply(snapshot)
+            count += 1
+        rollups.save()
+    return count
+
+
+def _print_counter(row):
+    if row is None:
+        print("没有数据")
+        return
+    print(f"{row['period']}  快照 {row['snapshots']}  条目 {row['items']}  "
+          f"热搜指数 均值 {row['hot_mean']}  最大 {row['hot_max']}")
+
+
+def main(argv=None):
+    """命令行入口：rebuild / day / hour / hours / top"""
+    parser = argparse.ArgumentParser(description="写入期增量统计")
+    parser.add_argument('--path', default=None, help="统计目录")
+    parser.add_argument('--source', default='baidu')
+    sub = parser.add_subparsers(dest='command', required=True)
+    rebuild_cmd = sub.add_parser('rebuild', help="从快照存储重新计算")
+    rebuild_cmd.add_argument('--store', default=None, help="快照存储目录")
+    day = sub.add_parser('day', help="某天的计数和前10名停留时长")
+    day.add_argument('day', help="如 2025-11-01")
+    hour = sub.add_parser('hour', help="某个小时的计数")
+    hour.add_argument('hour', help="如 \"2025-11-01 09\"")
+    sub.add_parser('hours', help="一天中各小时的平均热度")
+    top = sub.add_parser('top', help="出现次数最多的标题")
+    top.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    setup_logging('rollups', console=args.command == 'rebuild')
+    if args.command == 'rebuild':
+        from snapshot_store import SnapshotStore
+        count = rebuild(SnapshotStore(args.store), args.path, args.source)
+        print(f"已处理 {count} 条快照")
+        return 0
+
+    rollups = Rollups(args.path, args.source)
+    if args.command == 'day':
+        _print_counter(rollups.daily(args.day))
+        for title, seconds in rollups.top_dwell(args.day):
+            print(f"  {seconds / 60:>7.0f} 分钟  {title}")
+    elif args.command == 'hour':
+        _print_counter(rollups.hourly(args.hour))
+    elif args.command == 'hours':
+        for row in rollups.by_hour_of_day():
+            _print_counter(row)
+    else:
+        for title, count in rollups.frequent_titles(args.limit):
+            print(f"{count:>6}  {title}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
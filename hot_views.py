@@ -0,0 +1,190 @@
+import os
+import gzip
+import json
+import bisect
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from spider_logging import get_logger
+
+logger = get_logger('views')
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _parse_time(value):
+    return datetime.strptime(value, TIME_FORMAT)
+
+
+def _hot_value(item):
+    try:
+        return int(item.get('hot_index') or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class Rendered:
+    """预先编码好的响应体：JSON字节、gzip压缩版本和ETag"""
+
+    __slots__ = ('body', 'gzipped', 'etag')
+
+    def __init__(self, payload):
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.gzipped = gzip.compress(self.body, compresslevel=5)
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest()[:20] + '"'
+
+
+class HotViews:
+    """
+    热搜历史的物化视图，随快照写入增量更新
+
+    - 最新榜单、最近一小时涨幅榜：每次写入时重新计算并预先编码；
+    - 任意时刻榜单：按时间有序的快照索引，二分查找后从存储按偏移读取一条记录；
+    - 话题时间线：标题 -> [(时间, 排名, 热搜指数)]。
+    查询时不扫描原始历史。
+    """
+
+    def __init__(self, store, riser_window=3600, board_cache_size=256):
+        self.store = store
+        self.riser_window = riser_window
+        self._lock = threading.RLock()
+        self._offset = 0
+        self._times = {}        # source -> 有序的爬取时间列表
+        self._ids = {}          # source -> 与_times对应的快照ID
+        self._latest = {}       # source -> 最新快照
+        self._timelines = {}    # (source, 标题) -> [(时间, 排名, 指数)]
+        self._rendered = {}     # 预先编码的最新榜单、涨幅榜
+        self._boards = OrderedDict()  # 快照ID -> 编码后的历史榜单（LRU）
+        self._board_cache_size = board_cache_size
+        self.version = 0
+
+    def sync(self):
+        """从存储文件上次读到的位置继续读取新写入的快照（文件未增长时只有一次stat）"""
+        filename = self.store.filename
+        try:
+            size = os.path.getsize(filename)
+        except OSError:
+            return 0
+        if size <= self._offset:
+            return 0
+        applied = 0
+        with self._lock, open(filename, 'rb') as f:
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # 写入尚未完成的行，下次再读
+                self._offset += len(line)
+                try:
+                    self.apply(json.loads(line))
+                    applied += 1
+                except (ValueError, KeyError) as e:
+                    logger.warning(f"跳过无法解析的快照: {e}")
+        return applied
+
+    def apply(self, snapshot):
+        """增量应用一条快照"""
+        with self._lock:
+            source = snapshot.get('source', 'baidu')
+            crawl_time = snapshot['crawl_time']
+            times = self._times.setdefault(source, [])
+            ids = self._ids.setdefault(source, [])
+            position = bisect.bisect_left(times, crawl_time)
+            if position < len(times) and times[position] == crawl_time:
+                ids[position] = snapshot['id']  # 回填修正，覆盖同一时刻的旧版本
+                self._boards.pop(snapshot['id'], None)
+            else:
+                times.insert(position, crawl_time)
+                ids.insert(position, snapshot['id'])
+
+            for item in snapshot['items']:
+                timeline = self._timelines.setdefault((source, item['title']), [])
+                point = (crawl_time, item['rank'], _hot_value(item))
+                index = bisect.bisect_left(timeline, (crawl_time,))
+                if index < len(timeline) and timeline[index][0] == crawl_time:
+                    timeline[index] = point
+                else:
+                    timeline.insert(index, point)
+
+            latest = self._latest.get(source)
+            if latest is None or crawl_time >= latest['crawl_time']:
+                self._latest[source] = snapshot
+                self._rendered[('latest', source)] = Rendered(snapshot)
+                self._rendered[('risers', source)] = Rendered(self._compute_risers(source, snapshot))
+            self.version += 1
+
+    def _compute_risers(self, source, snapshot):
+        """与一小时窗口起点相比，最新榜单中排名上升最多的话题"""
+        since = (_parse_time(snapshot['crawl_time']) - timedelta(seconds=self.riser_window)).strftime(TIME_FORMAT)
+        size = len(snapshot['items'])
+        risers = []
+        for item in snapshot['items']:
+            timeline = self._timelines.get((source, item['title']), [])
+            start = bisect.bisect_left(timeline, (since,))
+            if start < len(timeline) and timeline[start][0] < snapshot['crawl_time']:
+                _, base_rank, base_hot = timeline[start]
+            else:
+                base_rank, base_hot = size + 1, 0  # 窗口内新上榜
+            risers.append({
+                'title': item['title'],
+                'rank': item['rank'],
+                'previous_rank': base_rank if base_rank <= size else None,
+                'rank_change': base_rank - item['rank'],
+                'hot_index': _hot_value(item),
+                'hot_change': _hot_value(item) - base_hot if base_hot else None,
+            })
+        risers.sort(key=lambda r: (-r['rank_change'], r['rank']))
+        return {'crawl_time': snapshot['crawl_time'], 'since': since, 'risers': risers}
+
+    def latest(self, source='baidu'):
+        return self._rendered.get(('latest', source))
+
+    def risers(self, source='baidu'):
+        return self._rendered.get(('risers', source))
+
+    def board_at(self, when, source='baidu'):
+        """返回在指定时刻有效的榜单（不晚于该时刻的最后一次快照）"""
+        with self._lock:
+            times = self._times.get(source, [])
+            position = bisect.bisect_right(times, when) - 1
+            if position < 0:
+                return None
+            snapshot_id = self._ids[source][position]
+            rendered = self._boards.get(snapshot_id)
+            if rendered is not None:
+                self._boards.move_to_end(snapshot_id)
+                return rendered
+        snapshot = self.store.get(snapshot_id)
+        if snapshot is None:
+            return None
+        rendered = Rendered(snapshot)
+        with self._lock:
+            self._boards[snapshot_id] = rendered
+            while len(self._boards) > self._board_cache_size:
+                self._boards.popitem(last=False)
+        return rendered
+
+    def timeline(self, title, source='baidu'):
+        """话题在榜单上的完整轨迹"""
+        with self._lock:
+            points = list(self._timelines.get((source, title), []))
+        return Rendered({
+            'title': title,
+            'source': source,
+            'points': [{'crawl_time': t, 'rank': r, 'hot_index': h} for t, r, h in points],
+        })
+
+
+# 与写入方在同一进程中运行的视图（例如查询服务和定时爬虫同进程时），写入钩子会直接更新它
+_active_views = None
+
+
+def set_active_views(views):
+    global _active_views
+    _active_views = views
+
+
+def on_snapshot(snapshot):
+    """快照写入钩子：同进程内有活动视图时立即增量更新；其他进程中的视图通过sync()追上"""
+    if _active_views is not None:
+        _active_views.sync()
@@ -0,0 +1,319 @@
+import os
+import sys
+import json
+import time
+import socket
+import hashlib
+import argparse
+import threading
+from contextlib import contextmanager
+from spider_logging import get_logger, setup_logging, dump_ring_buffer
+
+logger = get_logger('lease')
+
+# 调度周期（秒）：每个周期每个榜单只由一个节点爬取一次
+DEFAULT_TICK = 600
+
+
+def tick_snapshot_id(source, slot, tick=DEFAULT_TICK):
+    """按调度周期生成快照ID：不同节点在同一周期内写入的快照ID相同，重复写入会被存储跳过"""
+    return hashlib.sha1(f"{source}|tick{tick}|{slot}".encode('utf-8')).hexdigest()[:16]
+
+
+class MemoryLeaseBackend:
+    """进程内的租约后端，用于单机演练多节点和故障切换"""
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._leases = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, name, owner, ttl):
+        """获取或续约租约，成功时返回防护令牌（每次易主加一），被他人持有时返回None"""
+        with self._lock:
+            lease, token = _next_lease(self._leases.get(name), owner, ttl, self.clock())
+            if lease is None:
+                return None
+            self._leases[name] = lease
+            return token
+
+    def release(self, name, owner):
+        with self._lock:
+            lease = self._leases.get(name)
+            if lease and lease['owner'] == owner:
+                lease['expires'] = 0
+
+    def record_attempt(self, name, owner, slot):
+        """在租约上记录已尝试爬取的调度周期，持有者已变更时不记录"""
+        with self._lock:
+            lease = self._leases.get(name)
+            if lease and lease['owner'] == owner:
+                lease['attempted'] = slot
+
+    def holder(self, name):
+        lease = self._leases.get(name)
+        return lease if lease and lease['expires'] > self.clock() else None
+
+
+class FileLeaseBackend:
+    """
+    基于共享目录的租约后端（各节点挂载同一个目录，例如NFS）
+
+    每个租约一个JSON文件 <name>.lease，读改写时用 O_EXCL 创建的 <name>.lease.lock 互斥；
+    持锁进程崩溃留下的锁文件超过 stale_lock 秒后会被清理。租约过期时间使用各节点的系统时间，
+    节点之间需要校时（误差应远小于租约时长）。
+    """
+
+    def __init__(self, path, clock=time.time, stale_lock=10.0):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.clock = clock
+        self.stale_lock = stale_lock
+
+    def _file(self, name):
+        return os.path.join(self.path, f'{name}.lease')
+
+    @contextmanager
+    def _mutex(self, name, timeout=5.0):
+        lock_file = self._file(name) + '.lock'
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fd = os.open(lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_file) > self.stale_lock:
+                        os.remove(lock_file)
+                        logger.warning(f"清理过期的租约锁文件: {lock_file}")
+                        continue
+                except OSError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"获取租约锁超时: {lock_file}")
+                time.sleep(0.05)
+        try:
+            os.close(fd)
+            yield
+        finally:
+            try:
+                os.remove(lock_file)
+            except OSError:
+                pass
+
+    def _read(self, name):
+        try:
+            with open(self._file(name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, name, lease):
+        tmp_path = f"{self._file(name)}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(lease, f)
+        os.replace(tmp_path, self._file(name))
+
+    def acquire(self, name, owner, ttl):
+        with self._mutex(name):
+            lease, token = _next_lease(self._read(name), owner, ttl, self.clock())
+            if lease is None:
+                return None
+            self._write(name, lease)
+            return token
+
+    def release(self, name, owner):
+        with self._mutex(name):
+            lease = self._read(name)
+            if lease and lease['owner'] == owner:
+                lease['expires'] = 0
+                self._write(name, lease)
+
+    def record_attempt(self, name, owner, slot):
+        with self._mutex(name):
+            lease = self._read(name)
+            if lease and lease['owner'] == owner:
+                lease['attempted'] = slot
+                self._write(name, lease)
+
+    def holder(self, name):
+        lease = self._read(name)
+        return lease if lease and lease['expires'] > self.clock() else None
+
+
+def _next_lease(current, owner, ttl, now):
+    """两种后端共用的租约规则，返回 (新租约, 令牌)，被他人持有时返回 (None, None)"""
+    if current and current['owner'] != owner and current['expires'] > now:
+        return None, None
+    if current and current['owner'] == owner and current['expires'] > now:
+        token = current['token']
+    else:
+        token = (current['token'] if current else 0) + 1
+    lease = {'owner': owner, 'expires': now + ttl, 'token': token}
+    # 已尝试的调度周期随租约保留，接管的节点也不会在同一周期重复爬取
+    if current and 'attempted' in current:
+        lease['attempted'] = current['attempted']
+    return lease, token
+
+
+class LeaderLease:
+    """一个具名租约：持有者为领导者，需要在ttl内续约，否则其他节点可以接管"""
+
+    def __init__(self, backend, name, owner, ttl):
+        self.backend = backend
+        self.name = name
+        self.owner = owner
+        self.ttl = ttl
+        self.token = None
+
+    def acquire(self):
+        """获取或续约，返回当前是否为领导者"""
+        try:
+            token = self.backend.acquire(self.name, self.owner, self.ttl)
+        except (OSError, TimeoutError) as e:
+            logger.warning(f"租约 {self.name} 续约失败: {e}")
+            token = None
+        if token != self.token:
+            if token is None:
+                logger.info(f"节点 {self.owner} 不再持有租约 {self.name}")
+            else:
+                logger.info(f"节点 {self.owner} 成为 {self.name} 的领导者（令牌 {token}）")
+        self.token = token
+        return token is not None
+
+    @property
+    def is_leader(self):
+        return self.token is not None
+
+    def holds(self, token):
+        """续约并确认仍以同一令牌持有租约：期间易主过（即使又被本节点拿回）时令牌已变，返回False"""
+        return token is not None and self.acquire() and self.token == token
+
+    @contextmanager
+    def renewing(self, interval):
+        """在耗时操作期间由后台线程每隔 interval 秒续约，避免操作超过ttl时租约过期被其他节点接管"""
+        stop = threading.Event()
+
+        def heartbeat():
+            while not stop.wait(interval):
+                if not self.acquire():
+                    break
+
+        thread = threading.Thread(target=heartbeat, name=f'lease-{self.name}', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def attempted_slot(self):
+        """最近一次尝试爬取的调度周期（无论结果是否写入），没有记录时返回None"""
+        lease = self.backend.holder(self.name)
+        return lease.get('attempted') if lease else None
+
+    def record_attempt(self, slot):
+        try:
+            self.backend.record_attempt(self.name, self.owner, slot)
+        except (OSError, TimeoutError) as e:
+            logger.warning(f"记录租约 {self.name} 的爬取周期失败: {e}")
+
+    def release(self):
+        if self.token is not None:
+            self.backend.release(self.name, self.owner)
+            self.token = None
+
+
+class ClusterNode:
+    """
+    多节点协同爬取中的一个节点
+
+    每个榜单一个租约。节点每隔 heartbeat 秒醒来：持有租约的节点续约，并检查当前调度周期是否已经爬取过，
+    没有才爬取；其他节点只尝试获取租约，领导者失联超过 ttl 后由它们接管，接管后同样先检查，因此不会重复爬取。
+
+    “已爬取”不等于“已有快照”：结果被质量检查隔离、爬取失败或没有数据时，本周期同样没有快照，
+    若只看存储，领导者会在每次心跳重新爬取。因此每次尝试后在租约上记录周期，每个周期最多爬取一次。
+
+    爬取期间由后台心跳续约，慢速爬取不会让租约过期；写入前确认令牌未变（防护令牌），
+    期间易主过的结果不写入。确认之后到写入之间的窗口由存储兜底：同一周期的快照ID相同，追加在文件锁内检查ID。
+    """
+
+    def __init__(self, backend, fetchers, node_id=None, tick=DEFAULT_TICK, heartbeat=None, ttl=None,
+                 store=None, clock=time.time):
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.fetchers = fetchers  # 数据源 -> 爬取函数（返回热搜列表）
+        self.tick = tick
+        self.heartbeat = heartbeat or min(30.0, tick / 3)
+        ttl = ttl or self.heartbeat * 3
+        self.leases = {source: LeaderLease(backend, f'crawl-{source}', self.node_id, ttl) for source in fetchers}
+        self.store = store
+        self.clock = clock
+
+    def step(self):
+        """执行一次心跳，返回本次实际爬取的数据源列表"""
+        from snapshot_store import get_store, save_snapshot
+        store = self.store if self.store is not None else get_store()
+        crawled = []
+        for source, fetch in self.fetchers.items():
+            lease = self.leases[source]
+            if not lease.acquire():
+                continue
+            slot = int(self.clock() // self.tick)
+            snapshot_id = tick_snapshot_id(source, slot, self.tick)
+            if snapshot_id in store or lease.attempted_slot() == slot:
+                continue
+            lease.record_attempt(slot)
+            token = lease.token
+            try:
+                with lease.renewing(self.heartbeat):
+                    data = fetch()
+            except Exception as e:
+                logger.exception(f"爬取 {source} 失败: {e}")
+                dump_ring_buffer('cluster')
+                continue
+            if not data:
+                logger.warning(f"爬取 {source} 没有获取到数据")
+                continue
+            if not lease.holds(token):
+                logger.warning(f"爬取期间失去了 {source} 的租约（令牌 {token}），放弃写入")
+                continue
+            save_snapshot(data, source=source, store=store, snapshot_id=snapshot_id)
+            crawled.append(source)
+        return crawled
+
+    def run_forever(self):
+        logger.info(f"节点 {self.node_id} 已启动：调度周期 {self.tick} 秒，心跳 {self.heartbeat:.0f} 秒")
+        try:
+            while True:
+                self.step()
+                time.sleep(self.heartbeat)
+        finally:
+            for lease in self.leases.values():
+                lease.release()
+
+
+def main(argv=None):
+    """命令行入口：以协同模式运行一个爬虫节点"""
+    parser = argparse.ArgumentParser(description="多节点协同爬取（租约选主 + 共享快照存储）")
+    parser.add_argument('--node-id', default=None, help="节点名称，默认 主机名-进程号")
+    parser.add_argument('--tick', type=int, default=DEFAULT_TICK, help="调度周期（秒）")
+    parser.add_argument('--lease-dir', default=None, help="共享的租约目录，默认为快照存储下的 leases")
+    parser.add_argument('--strategy', choices=('http', 'browser', 'stream'), default='http')
+    args = parser.parse_args(argv)
+
+    setup_logging('cluster')
+    from hot_cli import load_strategy
+    from snapshot_store import get_store
+    store = get_store()
+    backend = FileLeaseBackend(args.lease_dir or os.path.join(store.path, 'leases'))
+    node = ClusterNode(backend, {'baidu': load_strategy(args.strategy)}, node_id=args.node_id,
+                       tick=args.tick, store=store)
+    try:
+        node.run_forever()
+    except KeyboardInterrupt:
+        logger.info(f"节点 {node.node_id} 已停止")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+import os
+import sys
+import math
+import time
+import socket
+import argparse
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+# 注意：爬虫模块在导入时读取榜单地址和存储目录等环境变量，
+# 因此必须先配置好环境变量再导入它们（见 prepare_environment）
+
+TARGETS = ('fetch', 'crawl', 'scheduler')
+
+
+def percentile(sorted_values, q):
+    """最近秩法求分位数，sorted_values需已排序"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class LoadResult:
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.failures = 0
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, ok):
+        with self._lock:
+            self.latencies.append(seconds)
+            if not ok:
+                self.failures += 1
+
+    def report(self):
+        values = sorted(self.latencies)
+        count = len(values)
+        lines = [
+            f"[{self.name}] {count} 次调用，失败 {self.failures} 次，总耗时 {self.elapsed:.2f}s，"
+            f"吞吐 {count / self.elapsed if self.elapsed else 0:.1f} 次/秒",
+        ]
+        if values:
+            lines.append("  延迟: " + "  ".join(f"p{q}={percentile(values, q) * 1000:.1f}ms" for q in (50, 95, 99))
+                         + f"  max={values[-1] * 1000:.1f}ms")
+        return "\n".join(lines)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def prepare_environment(workdir, url):
+    """让爬虫、存储和各个索引都指向临时目录和模拟服务，不影响正式数据"""
+    os.environ['BAIDU_HOT_URL'] = url
+    os.environ['BAIDU_HOT_EXCEL'] = '0'
+    for name, sub in (('STORE', 'hot_store'), ('ARCHIVE', 'page_archive'), ('INDEX', 'search_index'),
+                      ('CLUSTER', 'topic_clusters'), ('MATRIX', 'rank_matrix'), ('ROLLUP', 'rollups'), ('CACHE', 'hot_cache'),
+                      ('LOG', 'logs')):
+        os.environ[f'BAIDU_HOT_{name}_DIR'] = os.path.join(workdir, sub)
+    os.environ['BAIDU_HOT_SELECTOR_CACHE'] = os.path.join(workdir, 'selector_cache.json')
+    # 共享内存段不在临时目录中，使用本次运行独有的段名，结束后由 cleanup_environment 删除
+    os.environ['BAIDU_HOT_SHM_PREFIX'] = f'baidu_hot_load{os.getpid()}'
+
+
+def cleanup_environment():
+    """删除本次运行创建的共享内存段（临时目录保留，便于查看测试数据）"""
+    import shm_cache
+    shm_cache.unlink('baidu')
+
+
+def run_load(name, call, requests, concurrency):
+    """用concurrency个线程共执行requests次call，call返回真值表示成功"""
+    result = LoadResult(name)
+
+    def one(_):
+        started = time.perf_counter()
+        try:
+            ok = bool(call())
+        except Exception:
+            ok = False
+        result.record(time.perf_counter() - started, ok)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def make_crawl():
+    """
+    完整的一次爬取：请求 → 解析 → 质量检查 → 写入存储及各写入钩子；爬取时间按每次1分钟递增，避免快照ID冲突
+
+    请求和解析并发执行，写入串行（与 source_engine 的 write_lock 相同）：分配爬取时间和写入在同一把锁内，
+    快照按时间顺序到达各写入钩子，排名矩阵等只接受递增时间的钩子不会丢行。
+    """
+    from baidu_hot_spider_selenium import fetch_with_requests
+    from snapshot_store import save_snapshot
+    clock = {'next': datetime.now().replace(microsecond=0)}
+    write_lock = threading.Lock()
+
+    def crawl():
+        data = fetch_with_requests()
+        if not data:
+            return False
+        with write_lock:
+            crawl_time = clock['next'].strftime("%Y-%m-%d %H:%M:%S")
+            clock['next'] += timedelta(minutes=1)
+            save_snapshot(data, crawl_time=crawl_time)
+        return True
+
+    return crawl
+
+
+def check_consistency(source='baidu'):
+    """
+    核对各写入钩子的结果与存储中的快照数是否一致，返回 [(名称, 数量, 存储中的快照数)]
+
+    并发写入时钩子可能静默丢弃快照（例如排名矩阵跳过乱序到达的行），只看调用成功率发现不了。
+    """
+    from snapshot_store import get_store
+    from rank_matrix import RankMatrix
+    from search_index import SearchIndex
+    from hot_rollups import Rollups, SNAPSHOTS
+    expected = sum(1 for _ in get_store().iter_snapshots(source))
+    counts = [
+        ('排名矩阵行数', len(RankMatrix(source=source))),
+        ('检索索引快照数', len(SearchIndex().load().snapshots)),
+        ('统计快照数', sum(counter[SNAPSHOTS] for counter in Rollups(source=source).days.values())),
+    ]
+    return [(name, count, expected) for name, count in counts]
+
+
+def run_scheduler(requests):
+    """驱动自适应调度器（模拟时钟，不真正等待），测量每个调度周期的端到端耗时"""
+    from adaptive_schedule import AdaptiveScheduler
+    from snapshot_store import register_ingest_hook
+    fake_now = [time.time()]
+    crawl = make_crawl()
+    scheduler = AdaptiveScheduler(crawl, clock=lambda: fake_now[0], sleep=None)
+    register_ingest_hook(scheduler.observe)
+    result = LoadResult('scheduler')
+    intervals = []
+    started = time.perf_counter()
+    for _ in range(requests):
+        tick_started = time.perf_counter()
+        wait = scheduler.run_once()
+        result.record(time.perf_counter() - tick_started, scheduler._observed)
+        intervals.append(wait)
+        fake_now[0] += wait
+    result.elapsed = time.perf_counter() - started
+    print(f"  调度间隔: 最短 {min(intervals):.0f}s，最长 {max(intervals):.0f}s，"
+          f"模拟时长 {(fake_now[0] - time.time()) / 3600:.1f} 小时")
+    return result
+
+
+def main(argv=None):
+    """命令行入口：启动模拟服务并对爬取链路做压力测试"""
+    parser = argparse.ArgumentParser(description="基于本地模拟服务的端到端压力测试")
+    parser.add_argument('--target', choices=TARGETS, default='crawl',
+                        help="fetch: 只请求和解析；crawl: 加上质量检查和存储；scheduler: 通过自适应调度器驱动")
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.05, help="模拟服务的平均响应延迟（秒）")
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--variant', default='original', help="original / renamed / no-sdata / churn")
+    parser.add_argument('--page', default='backup_page.html')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', default=None, help="存放测试数据的目录，默认使用临时目录")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='baidu_hot_load_')
+    port = _free_port()
+    prepare_environment(workdir, f"http://127.0.0.1:{port}/board?tab=realtime&variant={args.variant}")
+
+    from spider_logging import setup_logging
+    from mock_board import MockBoard
+    setup_logging('load_test', console=False)
+    board = MockBoard(args.page, args.latency, args.jitter, args.error_rate, args.variant, args.seed)
+    board.start_in_thread(port=port)
+    print(f"模拟服务: {os.environ['BAIDU_HOT_URL']}，测试数据目录: {workdir}")
+
+    try:
+        if args.target == 'fetch':
+            from baidu_hot_spider_selenium import fetch_with_requests
+            result = run_load('fetch', fetch_with_requests, args.requests, args.concurrency)
+        elif args.target == 'crawl':
+            result = run_load('crawl', make_crawl(), args.requests, args.concurrency)
+        else:
+            result = run_scheduler(args.requests)
+        print(result.report())
+        print(f"  模拟服务共收到 {board.requests} 个请求，其中 {board.errors} 个返回错误")
+        consistent = True
+        if args.target != 'fetch':
+            for name, count, expected in check_consistency():
+                mark = '一致' if count == expected else '不一致'
+                consistent = consistent and count == expected
+                print(f"  {name}: {count}（存储中 {expected} 个快照，{mark}）")
+    finally:
+        cleanup_environment()
+    return 0 if result.failures < len(result.latencies) and consistent else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+import os
+import re
+import sys
+import glob
+import json
+import time
+import queue
+import argparse
+import multiprocessing
+from datetime import datetime
+from spider_logging import get_logger, setup_logging
+
+logger = get_logger('migrate')
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 默认迁移的文件：主历史文件、Excel备份、写入Excel失败时留下的文本备份
+DEFAULT_PATTERNS = (
+    'baidu_hot_history.xlsx',
+    'baidu_hot_history_backup_*.xlsx',
+    'baidu_hot_backup_*.xlsx',
+    'baidu_hot_backup_*.txt',
+)
+
+FILE_TIME = re.compile(r'(\d{8})_?(\d{6})')
+
+# 工作进程每批发送的行数；结果队列最多积压QUEUE_BATCHES批，解析快于写入时工作进程等待
+BATCH_ROWS = 200
+QUEUE_BATCHES = 16
+
+
+def find_files(patterns=DEFAULT_PATTERNS, directory='.'):
+    """按模式列出要迁移的文件（去重，保持模式的顺序）"""
+    files = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(os.path.join(directory, pattern))):
+            if path not in files:
+                files.append(path)
+    return files
+
+
+def normalize_time(value):
+    """Excel中的爬取时间可能是字符串或datetime，统一为 "YYYY-MM-DD HH:MM:SS"，无法识别时返回None"""
+    if isinstance(value, datetime):
+        return value.strftime(TIME_FORMAT)
+    text = str(value).strip()[:19]
+    try:
+        return datetime.strptime(text, TIME_FORMAT).strftime(TIME_FORMAT)
+    except ValueError:
+        return None
+
+
+def time_from_filename(path):
+    """文本备份没有爬取时间列，用文件名中的时间（写入失败的时刻，与爬取时间相差不到一秒）"""
+    match = FILE_TIME.search(os.path.basename(path))
+    if not match:
+        return None
+    try:
+        return datetime.strptime(''.join(match.groups()), "%Y%m%d%H%M%S").strftime(TIME_FORMAT)
+    except ValueError:
+        return None
+
+
+def iter_rows(path):
+    """流式产出文件中的 (爬取时间, JSON字符串)；Excel使用只读模式逐行读取，不载入整个工作簿"""
+    if path.endswith('.txt'):
+        with open(path, 'r', encoding='utf-8') as f:
+            yield time_from_filename(path), f.read()
+        return
+    import openpyxl
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    try:
+        for row in workbook.active.iter_rows(min_row=2, values_only=True):
+            if len(row) >= 2 and (row[0] or row[1]):
+                yield row[0], row[1]
+    finally:
+        workbook.close()
+
+
+def parse_row(crawl_time, payload):
+    """把一行解析为 (爬取时间, 内容哈希, 热搜列表)，无法使用的行返回 (原因, None, None)"""
+    from hot_parser import normalize_items
+    from snapshot_store import content_hash
+    crawl_time = normalize_time(crawl_time) if crawl_time else None
+    if crawl_time is None:
+        return 'bad_time', None, None
+    try:
+        raw = json.loads(payload)
+    except (TypeError, ValueError):
+        return 'bad_json', None, None  # 例如被截断到单元格长度上限的JSON
+    if not isinstance(raw, list):
+        return 'bad_json', None, None
+    if any(isinstance(item, dict) and item.get('mock') for item in raw):
+        return 'mock', None, None
+    items = normalize_items(raw)
+    if not items:
+        return 'empty', None, None
+    return crawl_time, content_hash(items), items
+
+
+def _worker(files, results):
+    """工作进程：逐个读取分到的文件，按批把解析结果放入有界队列"""
+    for path in iter(files.get, None):
+        started = time.perf_counter()
+        batch = []
+        rows = 0
+        try:
+            for crawl_time, payload in iter_rows(path):
+                rows += 1
+                batch.append(parse_row(crawl_time, payload))
+                if len(batch) >= BATCH_ROWS:
+                    results.put(('rows', path, batch))
+                    batch = []
+        except Exception as e:
+            results.put(('error', path, f"{type(e).__name__}: {e}"))
+        if batch:
+            results.put(('rows', path, batch))
+        results.put(('file', path, (rows, time.perf_counter() - started)))
+    results.put(('done', None, None))
+
+
+class Migration:
+    """
+    把Excel历史、Excel备份和文本备份合并迁移到快照存储
+
+    多个工作进程并行读取文件（每个进程一次读一个文件），主进程按 (爬取时间, 内容哈希) 去重后写入存储：
+    各备份文件中重复的快照只写一次；同一时刻内容不同的版本保留条目更多的一个（条目数相同时保留哈希较小的，
+    结果与文件读取顺序无关）；存储中已有的快照不会被覆盖为更差的版本。快照ID由爬取时间决定，重复运行是安全的。
+    每个候选版本先做与 save_snapshot 相同的质量检查（见 snapshot_quality），未通过的隔离而不参与选择；
+    文件读取顺序不是时间顺序，因此不比较与上一次快照的标题重合度。
+    """
+
+    def __init__(self, store, workers=None):
+        self.store = store
+        self.workers = workers or min(os.cpu_count() or 1, 8)
+        self.chosen = {}        # 爬取时间 -> (条目数, 内容哈希)
+        self.migrated = set()   # 出现在迁移文件中的爬取时间（不含未通过质量检查的）
+        self.rejected = set()   # 未通过质量检查的 (爬取时间, 内容哈希)，备份中重复出现时只隔离一次
+        self.stats = {'rows': 0, 'duplicates': 0, 'conflicts': 0, 'written': 0, 'present': 0, 'rejected': 0,
+                      'bad_time': 0, 'bad_json': 0, 'mock': 0, 'empty': 0, 'errors': 0}
+        self.files = {}         # 文件 -> (行数, 秒)
+        self.bytes = 0
+
+    def _seed(self):
+        """载入存储中已有快照的 (条目数, 哈希)，作为去重和冲突比较的基准"""
+        for snapshot in self.store.iter_snapshots('baidu'):
+            self.chosen[snapshot['crawl_time']] = (len(snapshot['items']), snapshot['hash'])
+
+    def _better(self, candidate, current):
+        """条目更多的版本更好；条目数相同时取哈希较小的，保证结果确定"""
+        return (candidate[0], current[1]) > (current[0], candidate[1])
+
+    def _passes_quality(self, crawl_time, digest, items):
+        from snapshot_quality import assess, quarantine
+        if (crawl_time, digest) in self.rejected:
+            return False
+        report = assess(items, crawl_time=crawl_time)
+        if report.accepted:
+            return True
+        self.rejected.add((crawl_time, digest))
+        quarantine(self.store, items, report, crawl_time)
+        return False
+
+    def _accept(self, crawl_time, digest, items):
+        candidate = (len(items), digest)
+        current = self.chosen.get(crawl_time)
+        if current is not None and current[1] == digest:
+            self.migrated.add(crawl_time)
+            self.stats['duplicates'] += 1
+            return
+        if not self._passes_quality(crawl_time, digest, items):
+            self.stats['rejected'] += 1
+            return
+        self.migrated.add(crawl_time)
+        if current is not None:
+            self.stats['conflicts'] += 1
+            if not self._better(candidate, current):
+                return
+        # replace=True：同一时刻已有较差的版本时追加新版本覆盖它
+        if self.store.append(items, crawl_time=crawl_time, replace=True):
+            self.stats['written'] += 1
+        else:
+            self.stats['present'] += 1
+        self.chosen[crawl_time] = candidate
+
+    def run(self, paths):
+        self._seed()
+        seeded = len(self.chosen)
+        self.bytes = sum(os.path.getsize(p) for p in paths)
+        started = time.perf_counter()
+
+        files = multiprocessing.Queue()
+        results = multiprocessing.Queue(maxsize=QUEUE_BATCHES)
+        for path in paths:
+            files.put(path)
+        workers = max(1, min(self.workers, len(paths)))
+        for _ in range(workers):
+            files.put(None)
+        processes = [multiprocessing.Process(target=_worker, args=(files, results), daemon=True)
+                     for _ in range(workers)]
+        for process in processes:
+            process.start()
+
+        running = workers
+        last_report = started
+        while running:
+            try:
+                kind, path, payload = results.get(timeout=1)
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes):
+                    logger.error("工作进程意外退出")
+                    break
+                continue
+            if kind == 'done':
+                running -= 1
+            elif kind == 'error':
+                self.stats['errors'] += 1
+                logger.error(f"读取 {path} 失败: {payload}")
+            elif kind == 'file':
+                self.files[path] = payload
+                logger.info(f"已读取 {path}: {payload[0]} 行，{payload[1]:.1f} 秒")
+            else:
+                for crawl_time, digest, items in payload:
+                    self.stats['rows'] += 1
+                    if items is None:
+                        self.stats[crawl_time] += 1  # 此时第一个字段是无法使用的原因
+                    else:
+                        self._accept(crawl_time, digest, items)
+                now = time.perf_counter()
+                if now - last_report >= 5:
+                    last_report = now
+                    logger.info(f"迁移进度: {self.stats['rows']} 行，{self.stats['rows'] / (now - started):.0f} 行/秒",
+                                extra={'rows': self.stats['rows']})
+        for process in processes:
+            process.join()
+
+        self.stats['seconds'] = round(time.perf_counter() - started, 2)
+        self.stats['seeded'] = seeded
+        return self.stats
+
+    def verify(self):
+        """逐一核对迁移文件中的每个时刻在存储中的版本与选中的内容哈希一致，返回 (一致数, 不一致的时刻列表)"""
+        from snapshot_store import make_snapshot_id
+        ok, mismatched = 0, []
+        for crawl_time in sorted(self.migrated):
+            if self.store.content_hash_of(make_snapshot_id(crawl_time)) == self.chosen[crawl_time][1]:
+                ok += 1
+            else:
+                mismatched.append(crawl_time)
+        return ok, mismatched
+
+    def report(self, verified, mismatched):
+        s = self.stats
+        seconds = s['seconds'] or 1e-9
+        lines = [
+            f"文件 {len(self.files)} 个，共 {self.bytes / 1024 / 1024:.1f} MB，读取 {s['rows']} 行，"
+            f"耗时 {s['seconds']:.2f} 秒（{s['rows'] / seconds:.0f} 行/秒，{self.bytes / 1024 / 1024 / seconds:.1f} MB/秒）",
+            f"写入 {s['written']} 条，存储中已存在 {s['present']} 条，重复跳过 {s['duplicates']} 行，"
+            f"同一时刻内容不同 {s['conflicts']} 行，未通过质量检查 {s['rejected']} 行（已隔离）",
+            f"无法使用: 时间无效 {s['bad_time']}，JSON无效 {s['bad_json']}，模拟数据 {s['mock']}，"
+            f"无有效条目 {s['empty']}；读取失败的文件 {s['errors']} 个",
+            f"校验: 迁移前存储中 {s['seeded']} 个时刻，迁移后 {len(self.chosen)} 个时刻；"
+            f"迁移文件中的 {len(self.migrated)} 个时刻与存储一致 {verified} 个，不一致 {len(mismatched)} 个",
+        ]
+        for path, (rows, file_seconds) in self.files.items():
+            lines.append(f"  {path}: {rows} 行，{file_seconds:.2f} 秒")
+        return "\n".join(lines)
+
+
+def main(argv=None):
+    """命令行入口：把Excel历史和备份迁移到快照存储"""
+    parser = argparse.ArgumentParser(description="把Excel历史、Excel备份和文本备份迁移到快照存储")
+    parser.add_argument('files', nargs='*', help="要迁移的文件，默认按固定模式在 --dir 中查找")
+    parser.add_argument('--dir', default='.', help="查找历史文件的目录")
+    parser.add_argument('--store', default=None, help="快照存储目录")
+    parser.add_argument('--workers', type=int, default=None, help="读取文件的进程数")
+    args = parser.parse_args(argv)
+
+    setup_logging('migrate')
+    from snapshot_store import SnapshotStore, REBUILD_NOTICE
+    paths = args.files or find_files(directory=args.dir)
+    if not paths:
+        print("没有找到需要迁移的文件")
+        return 1
+    migration = Migration(SnapshotStore(args.store), args.workers)
+    migration.run(paths)
+    verified, mismatched = migration.verify()
+    print(migration.report(verified, mismatched))
+    for crawl_time in mismatched[:20]:
+        print(f"  不一致: {crawl_time}")
+    if migration.stats['written']:
+        print(REBUILD_NOTICE)
+    return 0 if not mismatched and not migration.stats['errors'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
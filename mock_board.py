@@ -0,0 +1,185 @@
+import re
+import sys
+import json
+import random
+import asyncio
+import argparse
+import threading
+from urllib.parse import urlsplit, parse_qs
+from spider_logging import get_logger, setup_logging
+from hot_parser import S_DATA_MARK
+
+logger = get_logger('mock')
+
+DEFAULT_PAGE = 'backup_page.html'
+DEFAULT_PORT = 8766
+
+# 页面变体：original 原样；renamed 样式类名的哈希后缀全部换掉（模拟前端重新构建）；
+# no-sdata 去掉内嵌的s-data（只能按HTML结构解析）；churn 每次请求轮换榜单顺序（模拟榜单变动）
+VARIANTS = ('original', 'renamed', 'no-sdata', 'churn')
+
+CLASS_HASH = re.compile(r'\b([a-z][a-z0-9-]*)_([A-Za-z0-9]{5})\b')
+
+
+def rename_class_hashes(html, rng):
+    """把 "title_dIF3B" 这类样式类名的哈希后缀统一替换为新的随机值（同一个类名替换结果一致）"""
+    mapping = {}
+
+    def replace(match):
+        key = match.group(0)
+        if key not in mapping:
+            mapping[key] = f"{match.group(1)}_{''.join(rng.choices('abcdefghijkmnpqrstuvwxyzABCDEFGHJKLMNPQRSTUVWXYZ23456789', k=5))}"
+        return mapping[key]
+
+    return CLASS_HASH.sub(replace, html)
+
+
+def strip_s_data(html):
+    start = html.find(S_DATA_MARK)
+    if start < 0:
+        return html
+    end = html.find('-->', start)
+    return html[:start] + html[end + 3:]
+
+
+def rotate_s_data(html, shift):
+    """轮换s-data中榜单的顺序，热搜指数按新顺序重新分配，保持单调递减"""
+    start = html.find(S_DATA_MARK)
+    if start < 0:
+        return html
+    start += len(S_DATA_MARK)
+    end = html.find('-->', start)
+    data = json.loads(html[start:end])
+    content = data['data']['cards'][0]['content']
+    if content:
+        scores = [item.get('hotScore') for item in content]
+        shift %= len(content)
+        content[:] = content[shift:] + content[:shift]
+        for item, score in zip(content, scores):
+            item['hotScore'] = score
+    return html[:start] + json.dumps(data, ensure_ascii=False) + html[end:]
+
+
+class MockBoard:
+    """
+    top.baidu.com 榜单页的本地模拟服务，基于录制的页面（默认 backup_page.html）
+
+    可配置响应延迟（均值 + 抖动）、错误率（返回503）和页面变体；请求参数 ?variant= 可覆盖默认变体。
+    使用固定的随机种子，同样的请求序列得到同样的响应，便于复现基准测试。
+    """
+
+    def __init__(self, page_file=DEFAULT_PAGE, latency=0.05, jitter=0.02, error_rate=0.0,
+                 variant='original', seed=0):
+        with open(page_file, 'r', encoding='utf-8') as f:
+            self.page = f.read()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.variant = variant
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        # 静态变体预先编码，churn变体每次请求生成
+        self.rendered = {
+            'original': self.page.encode('utf-8'),
+            'renamed': rename_class_hashes(self.page, random.Random(seed)).encode('utf-8'),
+            'no-sdata': strip_s_data(self.page).encode('utf-8'),
+        }
+        self._churn_cache = {}
+
+    def render(self, variant):
+        if variant == 'churn':
+            shift = self.requests // 3  # 每3次请求榜单变动一次
+            if shift not in self._churn_cache:
+                self._churn_cache = {shift: rotate_s_data(self.page, shift).encode('utf-8')}
+            return self._churn_cache[shift]
+        return self.rendered[variant]
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                request_line = head.split(b'\r\n', 1)[0].decode('latin-1')
+                try:
+                    _, target, _ = request_line.split(' ', 2)
+                except ValueError:
+                    break
+                keep_alive = b'connection: close' not in head.lower()
+                params = {k: v[0] for k, v in parse_qs(urlsplit(target).query).items()}
+                variant = params.get('variant', self.variant)
+
+                self.requests += 1
+                delay = max(0.0, self.rng.gauss(self.latency, self.jitter)) if self.latency else 0.0
+                failed = self.rng.random() < self.error_rate
+                await asyncio.sleep(delay)
+
+                if failed:
+                    self.errors += 1
+                    status, body = '503 Service Unavailable', b'service unavailable'
+                elif variant not in VARIANTS:
+                    status, body = '400 Bad Request', b'unknown variant'
+                else:
+                    status, body = '200 OK', self.render(variant)
+                headers = [f"HTTP/1.1 {status}", "Content-Type: text/html; charset=utf-8",
+                           f"Content-Length: {len(body)}", f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1') + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=DEFAULT_PORT, ready=None):
+        server = await asyncio.start_server(self.handle, host, port)
+        port = server.sockets[0].getsockname()[1]
+        logger.info(f"模拟榜单服务已启动: http://{host}:{port}/board?tab=realtime "
+                    f"（变体 {self.variant}，延迟 {self.latency * 1000:.0f}ms，错误率 {self.error_rate:.0%}）")
+        if ready is not None:
+            ready(port)
+        async with server:
+            await server.serve_forever()
+
+    def start_in_thread(self, host='127.0.0.1', port=0):
+        """在后台线程中启动服务（port=0 自动分配端口），返回榜单地址"""
+        started = threading.Event()
+        result = {}
+
+        def ready(bound_port):
+            result['port'] = bound_port
+            started.set()
+
+        def run():
+            asyncio.run(self.serve(host, port, ready))
+
+        threading.Thread(target=run, name='mock-board', daemon=True).start()
+        started.wait(10)
+        return f"http://{host}:{result['port']}/board?tab=realtime"
+
+
+def main(argv=None):
+    """命令行入口：启动模拟榜单服务"""
+    parser = argparse.ArgumentParser(description="top.baidu.com 榜单页的本地模拟服务")
+    parser.add_argument('--page', default=DEFAULT_PAGE, help="录制的页面文件")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--latency', type=float, default=0.05, help="平均响应延迟（秒）")
+    parser.add_argument('--jitter', type=float, default=0.02, help="延迟抖动（标准差，秒）")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="返回503的比例")
+    parser.add_argument('--variant', choices=VARIANTS, default='original')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    setup_logging('mock')
+    board = MockBoard(args.page, args.latency, args.jitter, args.error_rate, args.variant, args.seed)
+    try:
+        asyncio.run(board.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        logger.info("模拟榜单服务已停止")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
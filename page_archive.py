@@ -0,0 +1,417 @@
+import os
+import sys
+import json
+import zlib
+import time
+import struct
+import bisect
+import hashlib
+import argparse
+import threading
+import uuid
+from datetime import datetime
+from file_lock import file_lock
+from spider_logging import get_logger, setup_logging
+
+logger = get_logger('archive')
+
+# 原始页面归档目录，可通过环境变量覆盖
+ARCHIVE_DIR = os.environ.get('BAIDU_HOT_ARCHIVE_DIR', 'page_archive')
+
+# 对象文件头：魔数 + 压缩方式 + 字典ID
+MAGIC = b'BHPA'
+HEADER = struct.Struct('>4sBI')
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+
+# 累计多少个页面后自动训练压缩字典，以及之后每隔多少个页面重新训练
+TRAIN_MIN_SAMPLES = 16
+RETRAIN_EVERY = 500
+DICT_SIZE = 110 * 1024
+
+# 对象清单中每行是一个64位十六进制哈希加换行，行宽固定：对象数 = 文件大小 / 行宽，最近的对象在文件末尾
+MANIFEST_LINE = 65
+
+# 抓取后这么多秒内本线程写入的快照与归档页面关联；没有关联记录的旧归档，按抓取后这个窗口内最近的快照匹配
+LINK_WINDOW = 300
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _zstd():
+    """zstandard为可选依赖，未安装时退回zlib"""
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+
+class PageArchive:
+    """
+    内容寻址的原始页面归档
+
+    页面按sha256存放在 objects/<前两位>/<sha256>，内容相同的页面只存一份；
+    每次抓取都会在 index.jsonl 中记录一行（抓取时间、URL、哈希、抓取ID），用于按时间重放历史；
+    抓取结果写入快照存储后，links.jsonl 记录抓取ID对应的快照ID和爬取时间，重新解析时覆盖的是原来的快照；
+    新对象按归档顺序追加到 objects.manifest，统计对象数和挑选最近的对象都不需要遍历目录。
+    热搜页面彼此高度相似，安装zstandard时使用训练好的字典压缩。
+    """
+
+    def __init__(self, path=None):
+        self.path = path or ARCHIVE_DIR
+        self.objects_dir = os.path.join(self.path, 'objects')
+        self.dicts_dir = os.path.join(self.path, 'dicts')
+        self.index_file = os.path.join(self.path, 'index.jsonl')
+        self.manifest_file = os.path.join(self.path, 'objects.manifest')
+        self.links_file = os.path.join(self.path, 'links.jsonl')
+        self.lock_file = os.path.join(self.path, '.lock')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.dicts_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._dicts = {}
+        if not os.path.exists(self.manifest_file):
+            self.rebuild_manifest()
+
+    def rebuild_manifest(self):
+        """按对象文件的修改时间重建对象清单（清单不存在的旧归档只需要遍历一次）"""
+        digests = sorted(self.iter_digests(), key=lambda d: os.path.getmtime(self._object_path(d)))
+        tmp_path = f"{self.manifest_file}.tmp{os.getpid()}"
+        with open(tmp_path, 'w', encoding='ascii') as f:
+            f.writelines(f"{digest}\n" for digest in digests)
+        os.replace(tmp_path, self.manifest_file)
+        return len(digests)
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def _current_dict_id(self):
+        current = os.path.join(self.dicts_dir, 'CURRENT')
+        if not os.path.exists(current):
+            return 0
+        with open(current, 'r', encoding='utf-8') as f:
+            return int(f.read().strip() or 0)
+
+    def _load_dict(self, dict_id):
+        if dict_id not in self._dicts:
+            zstandard = _zstd()
+            with open(os.path.join(self.dicts_dir, f'{dict_id}.dict'), 'rb') as f:
+                self._dicts[dict_id] = zstandard.ZstdCompressionDict(f.read())
+        return self._dicts[dict_id]
+
+    def _compress(self, raw):
+        zstandard = _zstd()
+        if zstandard is None:
+            return HEADER.pack(MAGIC, CODEC_ZLIB, 0) + zlib.compress(raw, 9)
+        dict_id = self._current_dict_id()
+        if dict_id:
+            compressor = zstandard.ZstdCompressor(level=19, dict_data=self._load_dict(dict_id))
+        else:
+            compressor = zstandard.ZstdCompressor(level=19)
+        return HEADER.pack(MAGIC, CODEC_ZSTD, dict_id) + compressor.compress(raw)
+
+    def _decompress(self, blob):
+        magic, codec, dict_id = HEADER.unpack_from(blob)
+        if magic != MAGIC:
+            raise ValueError("不是有效的归档对象")
+        payload = blob[HEADER.size:]
+        if codec == CODEC_ZLIB:
+            return zlib.decompress(payload)
+        zstandard = _zstd()
+        if zstandard is None:
+            raise RuntimeError("该对象使用zstd压缩，需要安装zstandard")
+        if dict_id:
+            decompressor = zstandard.ZstdDecompressor(dict_data=self._load_dict(dict_id))
+        else:
+            decompressor = zstandard.ZstdDecompressor()
+        return decompressor.decompress(payload)
+
+    def put(self, html, url, fetched_at=None, fetch_id=None):
+        """归档一个页面，返回 (sha256, 是否为新对象)"""
+        raw = html.encode('utf-8')
+        digest = hashlib.sha256(raw).hexdigest()
+        fetched_at = fetched_at or datetime.now().strftime(TIME_FORMAT)
+        path = self._object_path(digest)
+
+        # 回填、重新解析的进程池和多个爬虫节点可能同时归档：判断是否为新对象和追加清单、索引需要跨进程互斥
+        with self._lock, file_lock(self.lock_file):
+            is_new = not os.path.exists(path)
+            if is_new:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                blob = self._compress(raw)
+                tmp_path = f"{path}.tmp{os.getpid()}"
+                with open(tmp_path, 'wb') as f:
+                    f.write(blob)
+                os.replace(tmp_path, path)
+                with open(self.manifest_file, 'a', encoding='ascii') as f:
+                    f.write(f"{digest}\n")
+                logger.debug(f"归档新页面 {digest[:12]}，压缩后 {len(blob)} 字节（原始 {len(raw)} 字节）")
+            entry = {'fetched_at': fetched_at, 'url': url, 'sha256': digest, 'size': len(raw)}
+            if fetch_id:
+                entry['fetch_id'] = fetch_id
+            with open(self.index_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        return digest, is_new
+
+    def link(self, fetch_id, snapshot):
+        """记录一次抓取写入的快照（快照ID、爬取时间、数据源）"""
+        record = {'fetch_id': fetch_id, 'snapshot_id': snapshot['id'], 'crawl_time': snapshot['crawl_time'],
+                  'source': snapshot.get('source', 'baidu')}
+        with self._lock, file_lock(self.lock_file):
+            with open(self.links_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def links(self):
+        """抓取ID -> 关联记录"""
+        links = {}
+        if os.path.exists(self.links_file):
+            with open(self.links_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        links[record['fetch_id']] = record
+        return links
+
+    def iter_fetches(self, store=None):
+        """
+        逐条产出抓取记录及其对应的快照：(索引记录, 快照ID, 爬取时间, 数据源)
+
+        有关联记录时沿用写入时的快照ID和爬取时间；没有关联记录的旧归档，按抓取后 LINK_WINDOW 秒内
+        爬取时间最近的快照匹配（需要传入store）；都没有时快照ID为None，由调用方按抓取时间写入新快照
+        （例如当时没有解析出数据的页面）。
+        """
+        links = self.links()
+        snapshots = None
+        for entry in self.iter_entries():
+            link = links.get(entry.get('fetch_id'))
+            if link is not None:
+                yield entry, link['snapshot_id'], link['crawl_time'], link['source']
+                continue
+            if store is not None and snapshots is None:
+                snapshots = sorted((s['crawl_time'], s['id']) for s in store.iter_snapshots('baidu'))
+            match = _nearest_after(snapshots, entry['fetched_at']) if snapshots else None
+            if match is not None:
+                yield entry, match[1], match[0], 'baidu'
+            else:
+                yield entry, None, entry['fetched_at'], 'baidu'
+
+    def load(self, digest):
+        """按哈希读取页面HTML"""
+        with open(self._object_path(digest), 'rb') as f:
+            return self._decompress(f.read()).decode('utf-8')
+
+    def iter_entries(self):
+        """逐条产出索引记录（按抓取顺序）"""
+        if not os.path.exists(self.index_file):
+            return
+        with open(self.index_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+    def iter_digests(self):
+        """产出所有已归档对象的哈希"""
+        for prefix in sorted(os.listdir(self.objects_dir)):
+            prefix_dir = os.path.join(self.objects_dir, prefix)
+            for name in sorted(os.listdir(prefix_dir)):
+                if '.tmp' not in name:
+                    yield name
+
+    def object_count(self):
+        try:
+            return os.path.getsize(self.manifest_file) // MANIFEST_LINE
+        except OSError:
+            return 0
+
+    def recent_digests(self, limit):
+        """最近归档的limit个对象的哈希（按归档顺序，最新的在最后），只读取清单末尾"""
+        try:
+            with open(self.manifest_file, 'rb') as f:
+                f.seek(max(0, self.object_count() - limit) * MANIFEST_LINE)
+                data = f.read(limit * MANIFEST_LINE)
+        except OSError:
+            return []
+        return [line for line in data.decode('ascii').split('\n') if len(line) == MANIFEST_LINE - 1]
+
+    def train_dictionary(self, max_samples=200):
+        """用最近归档的页面训练zstd字典，返回新字典ID（未安装zstandard时返回0）"""
+        zstandard = _zstd()
+        if zstandard is None:
+            logger.warning("未安装zstandard，跳过字典训练")
+            return 0
+        digests = self.recent_digests(max_samples)
+        samples = [self.load(d).encode('utf-8') for d in digests]
+        if len(samples) < 2:
+            return 0
+        trained = zstandard.train_dictionary(DICT_SIZE, samples)
+        dict_id = trained.dict_id()
+        with open(os.path.join(self.dicts_dir, f'{dict_id}.dict'), 'wb') as f:
+            f.write(trained.as_bytes())
+        with open(os.path.join(self.dicts_dir, 'CURRENT'), 'w', encoding='utf-8') as f:
+            f.write(str(dict_id))
+        logger.info(f"已用 {len(samples)} 个页面训练压缩字典，字典ID: {dict_id}")
+        return dict_id
+
+    def stats(self):
+        """统计归档规模：抓取次数、去重后的对象数、原始与压缩后字节数"""
+        fetches = 0
+        raw_bytes = 0
+        for entry in self.iter_entries():
+            fetches += 1
+            raw_bytes += entry.get('size', 0)
+        objects = 0
+        stored_bytes = 0
+        for digest in self.iter_digests():
+            objects += 1
+            stored_bytes += os.path.getsize(self._object_path(digest))
+        return {'fetches': fetches, 'objects': objects, 'raw_bytes': raw_bytes, 'stored_bytes': stored_bytes}
+
+
+def _nearest_after(snapshots, fetched_at):
+    """在按爬取时间排序的 [(爬取时间, 快照ID)] 中找抓取后 LINK_WINDOW 秒内的第一个快照"""
+    position = bisect.bisect_left(snapshots, (fetched_at, ''))
+    if position == len(snapshots):
+        return None
+    crawl_time, snapshot_id = snapshots[position]
+    elapsed = (datetime.strptime(crawl_time, TIME_FORMAT) - datetime.strptime(fetched_at, TIME_FORMAT)).total_seconds()
+    return (crawl_time, snapshot_id) if elapsed <= LINK_WINDOW else None
+
+
+_default_archive = None
+# 本线程最近一次抓取的ID，等待接下来写入的快照与之关联（见 take_pending）
+_pending = threading.local()
+
+
+def get_archive():
+    global _default_archive
+    if _default_archive is None:
+        _default_archive = PageArchive()
+    return _default_archive
+
+
+def archive_page(html, url, fetched_at=None, fetch_id=None, link=True):
+    """
+    归档一次抓取的原始页面，累计到一定数量后自动（重新）训练压缩字典
+
+    link为True时，本线程接下来用 save_snapshot 写入的快照会关联到这次抓取；出错页面等不产生快照的页面传入False。
+    """
+    archive = get_archive()
+    fetch_id = fetch_id or new_fetch_id()
+    digest, is_new = archive.put(html, url, fetched_at, fetch_id)
+    if link:
+        expect_snapshot(fetch_id)
+    if is_new and _zstd() is not None:
+        count = archive.object_count()
+        if (count == TRAIN_MIN_SAMPLES and not archive._current_dict_id()) or count % RETRAIN_EVERY == 0:
+            try:
+                archive.train_dictionary()
+            except Exception as e:
+                logger.warning(f"训练压缩字典失败: {e}")
+    return digest
+
+
+def new_fetch_id():
+    return uuid.uuid4().hex[:16]
+
+
+def expect_snapshot(fetch_id):
+    """登记本线程的一次抓取，接下来写入的快照与之关联（页面可以稍后再归档，例如流式爬取读完剩余内容后）"""
+    _pending.fetch = (fetch_id, time.monotonic())
+
+
+def take_pending():
+    """取出并清除本线程等待关联的抓取ID（save_snapshot调用），超过 LINK_WINDOW 秒的不再关联"""
+    pending = getattr(_pending, 'fetch', None)
+    _pending.fetch = None
+    if pending is not None and time.monotonic() - pending[1] <= LINK_WINDOW:
+        return pending[0]
+    return None
+
+
+def link_snapshot(fetch_id, snapshot):
+    get_archive().link(fetch_id, snapshot)
+
+
+# 进程池中每个工作进程各自持有一个归档实例
+_worker_archive = None
+
+
+def _init_reparse_worker(path):
+    global _worker_archive
+    _worker_archive = PageArchive(path)
+
+
+def _reparse_one(digest):
+    from hot_parser import parse_hot_page, normalize_items
+    return digest, normalize_items(parse_hot_page(_worker_archive.load(digest)))
+
+
+def reparse_archive(archive=None, store=None, workers=None):
+    """
+    用当前解析器并行重新解析归档中的全部页面，重建快照历史
+
+    每个不同的页面只解析一次；每条抓取记录覆盖它当时写入的快照（见 PageArchive.iter_fetches），
+    内容不同时才追加新版本，重复运行是安全的。没有对应快照的抓取按抓取时间写入新快照。
+    写入不经过写入钩子，完成后需要重建各索引（见 snapshot_store.REBUILD_NOTICE）。
+    """
+    from multiprocessing import Pool
+    from snapshot_store import SnapshotStore
+
+    archive = archive or get_archive()
+    store = store if store is not None else SnapshotStore()
+    workers = workers or os.cpu_count() or 1
+
+    # 先按哈希收集每个页面对应的快照，只保留哈希和快照信息，不载入页面内容
+    targets = {}
+    for entry, snapshot_id, crawl_time, source in archive.iter_fetches(store):
+        targets.setdefault(entry['sha256'], []).append((snapshot_id, crawl_time, source))
+
+    started = time.perf_counter()
+    parsed = written = empty = 0
+    with Pool(workers, initializer=_init_reparse_worker, initargs=(archive.path,)) as pool:
+        for digest, items in pool.imap_unordered(_reparse_one, list(targets), chunksize=8):
+            parsed += 1
+            if not items:
+                empty += 1
+                continue
+            for snapshot_id, crawl_time, source in targets[digest]:
+                if store.append(items, crawl_time=crawl_time, source=source, snapshot_id=snapshot_id, replace=True):
+                    written += 1
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"重新解析完成: {parsed} 个页面，写入 {written} 条快照，{empty} 个页面未解析出数据，耗时 {elapsed:.1f} 秒")
+    return {'pages': parsed, 'written': written, 'empty': empty, 'seconds': elapsed}
+
+
+def main(argv=None):
+    """命令行入口：reparse / train / stats"""
+    parser = argparse.ArgumentParser(description="百度热搜原始页面归档")
+    parser.add_argument('--archive', default=None, help="归档目录")
+    sub = parser.add_subparsers(dest='command', required=True)
+    reparse = sub.add_parser('reparse', help="并行重新解析归档页面，重建快照历史")
+    reparse.add_argument('--store', default=None, help="快照存储目录")
+    reparse.add_argument('--workers', type=int, default=None, help="工作进程数（默认CPU核数）")
+    sub.add_parser('train', help="重新训练压缩字典")
+    sub.add_parser('stats', help="显示归档统计")
+    args = parser.parse_args(argv)
+
+    setup_logging('archive')
+    archive = PageArchive(args.archive)
+    if args.command == 'reparse':
+        from snapshot_store import SnapshotStore, REBUILD_NOTICE
+        result = reparse_archive(archive, SnapshotStore(args.store), args.workers)
+        print(f"重新解析 {result['pages']} 个页面，写入 {result['written']} 条快照，{result['empty']} 个页面未解析出数据")
+        if result['written']:
+            print(REBUILD_NOTICE)
+    elif args.command == 'train':
+        archive.train_dictionary()
+    else:
+        stats = archive.stats()
+        ratio = stats['raw_bytes'] / stats['stored_bytes'] if stats['stored_bytes'] else 0
+        print(f"抓取次数: {stats['fetches']}，去重后页面: {stats['objects']}")
+        print(f"原始大小: {stats['raw_bytes'] / 1024:.1f} KB，归档大小: {stats['stored_bytes'] / 1024:.1f} KB，压缩比: {ratio:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+import sys
+import json
+import asyncio
+import argparse
+from urllib.parse import urlsplit, parse_qs
+from spider_logging import get_logger, setup_logging
+
+logger = get_logger('service')
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+STATUS_TEXT = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+               405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+class QueryService:
+    """
+    基于asyncio的轻量HTTP查询服务，只读取预先计算好的物化视图
+
+    GET /board/latest?source=baidu          最新榜单
+    GET /board/at?t=2025-11-08 20:12:00     指定时刻的榜单
+    GET /topic/timeline?title=...           话题时间线
+    GET /risers?source=baidu                最近一小时涨幅榜
+    GET /health                             健康检查
+    """
+
+    def __init__(self, views, sync_interval=1.0):
+        self.views = views
+        self.sync_interval = sync_interval
+
+    def route(self, path, params):
+        """返回 (状态码, Rendered或None, 错误信息)"""
+        source = params.get('source', 'baidu')
+        if path == '/board/latest':
+            return self._found(self.views.latest(source), "暂无数据")
+        if path == '/board/at':
+            if 't' not in params:
+                return 400, None, "缺少参数 t"
+            return self._found(self.views.board_at(params['t'], source), "该时刻之前没有快照")
+        if path == '/topic/timeline':
+            if 'title' not in params:
+                return 400, None, "缺少参数 title"
+            return 200, self.views.timeline(params['title'], source), None
+        if path == '/risers':
+            return self._found(self.views.risers(source), "暂无数据")
+        return 404, None, "未知的接口"
+
+    @staticmethod
+    def _found(rendered, message):
+        return (200, rendered, None) if rendered is not None else (404, None, message)
+
+    async def handle(self, reader, writer):
+        """处理一个连接，支持keep-alive"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = lines[0].split(' ', 2)
+                except ValueError:
+                    await self._send(writer, 400, b'', {})
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ':' in line:
+                        key, value = line.split(':', 1)
+                        headers[key.strip().lower()] = value.strip()
+
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                await self._respond(writer, method, target, headers, keep_alive)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, method, target, headers, keep_alive):
+        conn = {'Connection': 'keep-alive' if keep_alive else 'close'}
+        if method not in ('GET', 'HEAD'):
+            return await self._send(writer, 405, self._error("仅支持GET"), conn)
+
+        url = urlsplit(target)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if url.path == '/health':
+            return await self._send(writer, 200, b'{"status":"ok"}', dict(conn, **{'Content-Type': 'application/json'}))
+
+        self.views.sync()
+        try:
+            status, rendered, message = self.route(url.path, params)
+        except Exception as e:
+            logger.exception(f"处理请求 {target} 失败: {e}")
+            status, rendered, message = 500, None, "内部错误"
+        if rendered is None:
+            return await self._send(writer, status, self._error(message), conn)
+
+        extra = dict(conn, **{'ETag': rendered.etag, 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'})
+        if rendered.etag in headers.get('if-none-match', ''):
+            return await self._send(writer, 304, b'', extra)
+        body = rendered.body
+        if 'gzip' in headers.get('accept-encoding', ''):
+            body = rendered.gzipped
+            extra['Content-Encoding'] = 'gzip'
+        extra['Content-Type'] = 'application/json; charset=utf-8'
+        await self._send(writer, status, b'' if method == 'HEAD' else body, extra, len(body))
+
+    @staticmethod
+    def _error(message):
+        return json.dumps({'error': message}, ensure_ascii=False).encode('utf-8')
+
+    @staticmethod
+    async def _send(writer, status, body, headers, length=None):
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}"]
+        if status != 304:
+            headers = dict(headers, **{'Content-Length': str(len(body) if length is None else length)})
+            headers.setdefault('Content-Type', 'application/json; charset=utf-8')
+        lines.extend(f"{k}: {v}" for k, v in headers.items())
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+    async def _sync_loop(self):
+        """定期追读新快照，保证即使没有请求，视图也是最新的"""
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                self.views.sync()
+            except Exception as e:
+                logger.warning(f"视图同步失败: {e}")
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        applied = self.views.sync()
+        logger.info(f"视图已从存储载入 {applied} 条快照")
+        server = await asyncio.start_server(self.handle, host, port)
+        logger.info(f"查询服务已启动: http://{host}:{port}")
+        sync_task = asyncio.create_task(self._sync_loop())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            sync_task.cancel()
+
+
+def main(argv=None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="百度热搜历史查询服务")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--store', default=None, help="快照存储目录")
+    args = parser.parse_args(argv)
+
+    setup_logging('service')
+    from snapshot_store import SnapshotStore
+    from hot_views import HotViews, set_active_views
+
+    views = HotViews(SnapshotStore(args.store))
+    set_active_views(views)
+    try:
+        asyncio.run(QueryService(views).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        logger.info("查询服务已停止")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,442 @@
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+from urllib.parse import urlsplit, parse_qs
+from spider_logging import get_logger, setup_logging
+from compact_snapshot import MISSING_HOT, Snapshot, StringTable
+
+logger = get_logger('events')
+
+# 事件服务的Unix套接字，默认放在快照存储目录下；写入钩子通过它推送新快照
+EVENT_SOCKET = os.environ.get('BAIDU_HOT_EVENT_SOCKET') or os.path.join(
+    os.environ.get('BAIDU_HOT_STORE_DIR', 'hot_store'), 'events.sock')
+DEFAULT_SSE_PORT = 8767
+
+EVENT_TYPES = ('entered', 'exited', 'moved', 'surged')
+
+# 排名至少变化MIN_MOVE位才算moved；热搜指数较上次增长SURGE_RATIO以上，或向上越过某个阈值，算surged
+MIN_MOVE = 1
+SURGE_RATIO = 0.2
+HOT_THRESHOLDS = tuple(int(v) for v in os.environ.get(
+    'BAIDU_HOT_SURGE_THRESHOLDS', '1000000,2000000,3000000,4000000,5000000').split(',') if v)
+
+# 每个订阅者的缓冲事件数；缓冲满时丢弃最旧的事件，自上次收到lagged通知后又丢弃超过MAX_DROPPED条的订阅者被断开
+BUFFER_SIZE = 256
+MAX_DROPPED = 4096
+# 单行消息（推送的快照）的最大长度
+LINE_LIMIT = 4 * 1024 * 1024
+
+
+def _hot_value(item):
+    try:
+        return int(item.get('hot_index'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _board(snapshot):
+    """标题 -> (排名, 热搜指数)；snapshot 可以是存储中的记录，也可以是紧凑快照"""
+    if isinstance(snapshot, Snapshot):
+        return {item.title: (None if item.rank == MISSING_HOT else item.rank, item.hot_index) for item in snapshot}
+    return {item['title']: (item.get('rank'), _hot_value(item)) for item in snapshot['items']}
+
+
+def diff_snapshots(previous, current, min_move=MIN_MOVE, surge_ratio=SURGE_RATIO, thresholds=HOT_THRESHOLDS):
+    """
+    比较同一数据源相邻两次快照，返回事件列表
+
+    entered 新上榜；exited 掉出榜单；moved 排名变化至少min_move位；
+    surged 热搜指数增长至少surge_ratio，或向上越过thresholds中的某个值（threshold字段为越过的最高阈值）。
+    """
+    before = _board(previous) if previous else {}
+    base = {'source': current.get('source', 'baidu'), 'crawl_time': current['crawl_time'],
+            'snapshot_id': current.get('id')}
+    events = []
+    after = _board(current)
+    for title, (rank, hot) in after.items():
+        if title not in before:
+            events.append(dict(base, type='entered', title=title, rank=rank, previous_rank=None,
+                               hot_index=hot, previous_hot=None))
+            continue
+        previous_rank, previous_hot = before[title]
+        if rank is not None and previous_rank is not None and abs(previous_rank - rank) >= min_move:
+            events.append(dict(base, type='moved', title=title, rank=rank, previous_rank=previous_rank,
+                               change=previous_rank - rank, hot_index=hot, previous_hot=previous_hot))
+        if hot is not None and previous_hot:
+            crossed = [t for t in thresholds if previous_hot < t <= hot]
+            if crossed or (hot - previous_hot) / previous_hot >= surge_ratio:
+                events.append(dict(base, type='surged', title=title, rank=rank, previous_rank=previous_rank,
+                                   hot_index=hot, previous_hot=previous_hot,
+                                   threshold=max(crossed) if crossed else None))
+    for title, (previous_rank, previous_hot) in before.items():
+        if title not in after:
+            events.append(dict(base, type='exited', title=title, rank=None, previous_rank=previous_rank,
+                               hot_index=None, previous_hot=previous_hot))
+    return events
+
+
+class EventEngine:
+    """
+    在内存中保留每个数据源的上一次快照，新快照到达时与之比较产生事件；早于已处理快照的记录被忽略
+
+    事件服务长期运行，上一次快照以紧凑形式保存（见 compact_snapshot），各数据源共用字符串驻留表。
+    """
+
+    def __init__(self, min_move=MIN_MOVE, surge_ratio=SURGE_RATIO, thresholds=HOT_THRESHOLDS):
+        self.min_move = min_move
+        self.surge_ratio = surge_ratio
+        self.thresholds = thresholds
+        self._tables = (StringTable(), StringTable())
+        self._previous = {}
+
+    def seed(self, snapshot):
+        """设定比较基准（服务启动时使用存储中的最新快照），不产生事件"""
+        if snapshot:
+            self._previous[snapshot.get('source', 'baidu')] = Snapshot.from_record(snapshot, self._tables)
+
+    def process(self, snapshot):
+        source = snapshot.get('source', 'baidu')
+        previous = self._previous.get(source)
+        if previous is not None and snapshot['crawl_time'] <= previous.crawl_time:
+            return []
+        self._previous[source] = Snapshot.from_record(snapshot, self._tables)
+        if previous is None:
+            return []  # 第一条快照只作为基准
+        return diff_snapshots(previous, snapshot, self.min_move, self.surge_ratio, self.thresholds)
+
+
+class EventFilter:
+    """
+    订阅条件（均可省略）：
+    types 事件类型；source 数据源；title 标题包含的文字；min_move 排名至少变化几位；
+    top 只关心进出前N名的变化（新上榜/排名变化进入前N、掉出前N），surged事件要求排名在前N内。
+    """
+
+    __slots__ = ('types', 'source', 'title', 'min_move', 'top')
+
+    def __init__(self, types=None, source=None, title=None, min_move=None, top=None):
+        self.types = set(types) if types else None
+        self.source = source
+        self.title = title
+        self.min_move = int(min_move) if min_move else None
+        self.top = int(top) if top else None
+
+    @classmethod
+    def from_params(cls, params):
+        types = params.get('types')
+        if isinstance(types, str):
+            types = [t for t in types.split(',') if t]
+        return cls(types, params.get('source'), params.get('title'), params.get('min_move'), params.get('top'))
+
+    def matches(self, event):
+        if self.types and event['type'] not in self.types:
+            return False
+        if self.source and event['source'] != self.source:
+            return False
+        if self.title and self.title not in event['title']:
+            return False
+        if self.min_move and event['type'] == 'moved' and abs(event['change']) < self.min_move:
+            return False
+        if self.top:
+            inside = event['rank'] is not None and event['rank'] <= self.top
+            was_inside = event['previous_rank'] is not None and event['previous_rank'] <= self.top
+            if event['type'] == 'surged':
+                return inside
+            return inside != was_inside
+        return True
+
+
+class Subscriber:
+    """一个订阅者：有界缓冲区，满时丢弃最旧的事件，并在下一条事件前插入一条lagged通知"""
+
+    def __init__(self, event_filter, buffer_size=BUFFER_SIZE, name=''):
+        self.filter = event_filter
+        self.name = name
+        self.queue = asyncio.Queue(maxsize=buffer_size)
+        self.dropped = 0
+        self.delivered = 0
+        self._reported = 0
+        self.closed = False
+        self.on_close = None  # 传输层设置：断开连接（发送协程可能正阻塞在drain上）
+
+    def offer(self, event):
+        if self.closed or not self.filter.matches(event):
+            return
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            # 只看尚未通知的丢弃数：偶尔落后又追上的长连接订阅者不会因累计丢弃数而被断开
+            if self.dropped - self._reported > MAX_DROPPED:
+                logger.warning(f"订阅者 {self.name} 消费过慢（连续丢弃 {self.dropped - self._reported} 条事件），断开连接")
+                self.close()
+                return
+        self.queue.put_nowait(event)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.on_close is not None:
+            self.on_close()
+        # 唤醒正在等待的发送协程
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    async def next(self):
+        """下一条要发送的消息，订阅结束时返回None"""
+        if self.dropped > self._reported:
+            lagged = {'type': 'lagged', 'dropped': self.dropped - self._reported}
+            self._reported = self.dropped
+            return lagged
+        event = await self.queue.get()
+        if event is not None:
+            self.delivered += 1
+        return event
+
+
+class EventBroker:
+    """事件分发：每个订阅者一个有界缓冲区和独立的发送协程，慢的订阅者不会拖慢其他订阅者或写入方"""
+
+    def __init__(self, engine=None):
+        self.engine = engine or EventEngine()
+        self.subscribers = set()
+        self.published = 0
+
+    def publish(self, snapshot):
+        events = self.engine.process(snapshot)
+        now = time.time()
+        for event in events:
+            event['emitted_at'] = now
+            for subscriber in list(self.subscribers):
+                subscriber.offer(event)
+                if subscriber.closed:
+                    self.subscribers.discard(subscriber)
+        self.published += len(events)
+        if events:
+            logger.info(f"快照 {snapshot.get('id')} 产生 {len(events)} 个事件，订阅者 {len(self.subscribers)} 个")
+        return events
+
+    def subscribe(self, event_filter, name=''):
+        subscriber = Subscriber(event_filter, name=name)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+
+class EventServer:
+    """
+    事件服务：Unix套接字（按行的JSON）和HTTP SSE两种订阅方式
+
+    Unix套接字上每个连接的第一行决定用途：
+      {"op": "subscribe", "types": [...], "top": 3, ...}   之后每行收到一条事件
+      {"op": "publish", "snapshot": {...}}                 写入钩子推送新快照
+    SSE: GET /events?types=entered,moved&top=3
+    另外定期追读快照存储文件新增的部分，钩子推送失败（例如快照由其他主机写入）时也不会漏掉。
+    """
+
+    def __init__(self, store, broker=None, sync_interval=2.0):
+        self.store = store
+        self.broker = broker or EventBroker()
+        self.sync_interval = sync_interval
+        self._offset = 0
+
+    def seed(self):
+        for source in self.store.sources():
+            self.broker.engine.seed(self.store.latest(source))
+        try:
+            self._offset = os.path.getsize(self.store.filename)
+        except OSError:
+            self._offset = 0
+
+    def sync(self):
+        """追读存储文件新增的快照（文件未增长时只有一次stat）"""
+        try:
+            size = os.path.getsize(self.store.filename)
+        except OSError:
+            return
+        if size <= self._offset:
+            return
+        with open(self.store.filename, 'rb') as f:
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                self._offset += len(line)
+                try:
+                    self.broker.publish(json.loads(line))
+                except (ValueError, KeyError) as e:
+                    logger.warning(f"跳过无法解析的快照: {e}")
+
+    async def _sync_loop(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                self.sync()
+            except Exception as e:
+                logger.warning(f"追读快照存储失败: {e}")
+
+    async def _pump(self, subscriber, writer, encode):
+        """把订阅者缓冲区中的事件写给客户端；drain() 等待期间新事件留在有界缓冲区中"""
+        try:
+            while True:
+                message = await subscriber.next()
+                if message is None:
+                    break
+                writer.write(encode(message))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.broker.unsubscribe(subscriber)
+            writer.close()
+
+    async def handle_unix(self, reader, writer):
+        try:
+            line = await reader.readline()
+            request = json.loads(line) if line.strip() else {}
+        except (ValueError, asyncio.LimitOverrunError, ConnectionError) as e:
+            logger.warning(f"无法解析的请求: {e}")
+            writer.close()
+            return
+        if request.get('op') == 'publish':
+            try:
+                self.broker.publish(request['snapshot'])
+            finally:
+                writer.close()
+            return
+        subscriber = self.broker.subscribe(EventFilter.from_params(request), name='unix')
+        subscriber.on_close = writer.transport.abort
+        logger.info(f"新的Unix套接字订阅者，当前共 {len(self.broker.subscribers)} 个")
+        encode = lambda message: (json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8')
+        await asyncio.gather(self._pump(subscriber, writer, encode), self._watch_close(reader, subscriber))
+
+    @staticmethod
+    async def _watch_close(reader, subscriber):
+        """客户端断开时结束订阅（订阅者不会再发送数据，读到EOF即断开）"""
+        try:
+            await reader.read()
+        except ConnectionError:
+            pass
+        subscriber.close()
+
+    async def handle_http(self, reader, writer):
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+            method, target, _ = head.split(b'\r\n', 1)[0].decode('latin-1').split(' ', 2)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, ValueError):
+            writer.close()
+            return
+        url = urlsplit(target)
+        if method != 'GET' or url.path != '/events':
+            writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            await writer.drain()
+            writer.close()
+            return
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream; charset=utf-8\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: keep-alive\r\n\r\n")
+        subscriber = self.broker.subscribe(EventFilter.from_params(params), name='sse')
+        subscriber.on_close = writer.transport.abort
+        logger.info(f"新的SSE订阅者，当前共 {len(self.broker.subscribers)} 个")
+
+        def encode(message):
+            data = json.dumps(message, ensure_ascii=False)
+            return f"event: {message['type']}\ndata: {data}\n\n".encode('utf-8')
+
+        await asyncio.gather(self._pump(subscriber, writer, encode), self._watch_close(reader, subscriber))
+
+    async def serve(self, socket_path=EVENT_SOCKET, host='127.0.0.1', port=DEFAULT_SSE_PORT):
+        self.seed()
+        servers = []
+        if socket_path and hasattr(asyncio, 'start_unix_server'):
+            if os.path.exists(socket_path):
+                os.remove(socket_path)  # 上次异常退出留下的套接字文件
+            servers.append(await asyncio.start_unix_server(self.handle_unix, socket_path, limit=LINE_LIMIT))
+            logger.info(f"事件服务已启动: unix:{socket_path}")
+        if port is not None:
+            servers.append(await asyncio.start_server(self.handle_http, host, port))
+            logger.info(f"SSE事件流: http://{host}:{port}/events")
+        sync_task = asyncio.create_task(self._sync_loop())
+        try:
+            await asyncio.gather(*(server.serve_forever() for server in servers))
+        finally:
+            sync_task.cancel()
+            if socket_path and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+
+def on_snapshot(snapshot, socket_path=None):
+    """快照写入钩子：事件服务在运行时把新快照推送给它（连接失败时忽略，服务会追读存储文件）"""
+    socket_path = socket_path or EVENT_SOCKET
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(socket_path):
+        return
+    message = (json.dumps({'op': 'publish', 'snapshot': snapshot}, ensure_ascii=False) + '\n').encode('utf-8')
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(0.5)
+            s.connect(socket_path)
+            s.sendall(message)
+    except OSError as e:
+        logger.debug(f"推送快照到事件服务失败: {e}")
+
+
+def subscribe(socket_path=None, **filters):
+    """阻塞式订阅（Unix套接字），逐条产出事件"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(socket_path or EVENT_SOCKET)
+        s.sendall((json.dumps(dict(filters, op='subscribe'), ensure_ascii=False) + '\n').encode('utf-8'))
+        with s.makefile('r', encoding='utf-8') as lines:
+            for line in lines:
+                yield json.loads(line)
+
+
+def main(argv=None):
+    """命令行入口：serve 启动事件服务；watch 订阅并打印事件"""
+    parser = argparse.ArgumentParser(description="排名变化事件流")
+    parser.add_argument('--socket', default=None, help="Unix套接字路径")
+    sub = parser.add_subparsers(dest='command', required=True)
+    serve = sub.add_parser('serve', help="启动事件服务")
+    serve.add_argument('--store', default=None, help="快照存储目录")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=DEFAULT_SSE_PORT, help="SSE端口")
+    watch = sub.add_parser('watch', help="订阅并打印事件")
+    watch.add_argument('--types', default=None, help="逗号分隔，如 entered,moved")
+    watch.add_argument('--top', type=int, default=None, help="只关心进出前N名的变化")
+    watch.add_argument('--min-move', type=int, default=None)
+    watch.add_argument('--title', default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        setup_logging('events')
+        from snapshot_store import SnapshotStore
+        server = EventServer(SnapshotStore(args.store))
+        try:
+            asyncio.run(server.serve(args.socket or EVENT_SOCKET, args.host, args.port))
+        except KeyboardInterrupt:
+            logger.info("事件服务已停止")
+        return 0
+
+    filters = {k: v for k, v in (('types', args.types), ('top', args.top), ('min_move', args.min_move),
+                                 ('title', args.title)) if v}
+    try:
+        for event in subscribe(args.socket, **filters):
+            if event['type'] == 'lagged':
+                print(f"[丢弃了 {event['dropped']} 条事件]")
+                continue
+            latency = (time.time() - event['emitted_at']) * 1000
+            print(f"{event['crawl_time']}  {event['type']:<8} {event['title'][:30]}  "
+                  f"{event['previous_rank']} → {event['rank']}  指数 {event['hot_index']}  （{latency:.1f}ms）")
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
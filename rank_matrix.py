@@ -0,0 +1,302 @@
+import os
+import sys
+import mmap
+import json
+import struct
+import argparse
+import threading
+from datetime import datetime
+from file_lock import file_lock
+from spider_logging import get_logger, setup_logging
+from compact_snapshot import StringTable
+
+logger = get_logger('matrix')
+
+# 矩阵目录，可通过环境变量覆盖
+MATRIX_DIR = os.environ.get('BAIDU_HOT_MATRIX_DIR', 'rank_matrix')
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 每行的排名位置数（实时榜最多50条，爬虫默认取前20）
+WIDTH = 50
+EMPTY_TOPIC = 0xFFFFFFFF
+MISSING_HOT = -1
+
+# 文件头：魔数、版本、每行宽度，补齐到16字节
+MAGIC = b'BHRM'
+VERSION = 1
+HEADER = struct.Struct('<4sHH8x')
+
+
+def row_struct(width):
+    """一行 = 爬取时间（Unix秒）+ 各排名位置的话题ID + 各排名位置的热搜指数"""
+    return struct.Struct(f'<q{width}I{width}q')
+
+
+def to_epoch(crawl_time):
+    return int(datetime.strptime(crawl_time, TIME_FORMAT).timestamp())
+
+
+def from_epoch(seconds):
+    return datetime.fromtimestamp(seconds).strftime(TIME_FORMAT)
+
+
+class TopicTable(StringTable):
+    """
+    话题ID表，追加写入 topics.jsonl，行号即话题ID，所有数据源共用
+
+    分配新ID时持有锁文件：先追读其他进程写入的行，再追加，保证行号与ID一一对应。
+    """
+
+    __slots__ = ('filename', '_offset', '_lock')
+
+    def __init__(self, filename):
+        super().__init__()
+        self.filename = filename
+        self._offset = 0
+        self._lock = threading.RLock()
+
+    def load(self):
+        with self._lock:
+            return self._load()
+
+    def _load(self):
+        if not os.path.exists(self.filename):
+            return self
+        with open(self.filename, 'rb') as f:
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                self._offset += len(line)
+                super().intern(json.loads(line))
+        return self
+
+    def intern(self, text):
+        topic_id = self.ids.get(text)
+        if topic_id is not None:
+            return topic_id
+        with self._lock, file_lock(f'{self.filename}.lock'):
+            self._load()  # 其他进程可能已经写入了新话题
+            topic_id = self.ids.get(text)
+            if topic_id is None:
+                topic_id = super().intern(text)
+                line = (json.dumps(text, ensure_ascii=False) + '\n').encode('utf-8')
+                with open(self.filename, 'ab') as f:
+                    f.write(line)
+                self._offset += len(line)
+        return topic_id
+
+
+class RankMatrix:
+    """
+    内存映射的定宽排名矩阵：每次爬取追加一行（爬取时间 × 排名位置 → 话题ID、热搜指数）
+
+    行按爬取时间递增，查询时间窗口只需在时间列上二分查找两次，得到的行区间在文件中连续，
+    可以直接映射为NumPy视图（安装了numpy时）或按行解包，不需要解析任何JSON。
+    每个数据源一个矩阵文件：<source>.bin。
+    """
+
+    def __init__(self, path=None, source='baidu', width=WIDTH):
+        self.path = path or MATRIX_DIR
+        os.makedirs(self.path, exist_ok=True)
+        self.filename = os.path.join(self.path, f'{source}.bin')
+        self.topics = TopicTable(os.path.join(self.path, 'topics.jsonl'))
+        self._lock = threading.Lock()
+        self._mmap = None
+        self._mapped_size = 0
+        if os.path.exists(self.filename):
+            with open(self.filename, 'rb') as f:
+                magic, version, width = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"不是有效的排名矩阵文件: {self.filename}")
+        else:
+            with open(self.filename, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, VERSION, width))
+        self.width = width
+        self.row = row_struct(width)
+
+    # ---- 写入 ----
+
+    def __len__(self):
+        return (os.path.getsize(self.filename) - HEADER.size) // self.row.size
+
+    def _last_time(self):
+        rows = len(self)
+        if not rows:
+            return None
+        with open(self.filename, 'rb') as f:
+            f.seek(HEADER.size + (rows - 1) * self.row.size)
+            return struct.unpack('<q', f.read(8))[0]
+
+    def append(self, snapshot):
+        """按条目的rank放入对应列，追加一行；同一时刻重复写入时覆盖最后一行，早于最后一行的快照跳过"""
+        epoch = to_epoch(snapshot['crawl_time'])
+        topic_ids = [EMPTY_TOPIC] * self.width
+        hots = [MISSING_HOT] * self.width
+        for item in snapshot['items']:
+            try:
+                position = int(item['rank']) - 1
+            except (KeyError, TypeError, ValueError):
+                continue
+            if 0 <= position < self.width:
+                topic_ids[position] = self.topics.intern(item['title'])
+                try:
+                    hots[position] = int(item.get('hot_index') or MISSING_HOT)
+                except (TypeError, ValueError):
+                    pass
+        packed = self.row.pack(epoch, *topic_ids, *hots)
+
+        # 读末行时间再追加是读-改-写，多个写入进程之间也需要互斥
+        with self._lock, file_lock(f'{self.filename}.lock'):
+            last = self._last_time()
+            if last is not None and epoch < last:
+                logger.debug(f"跳过早于矩阵末行的快照: {snapshot['crawl_time']}（请用 rebuild 重建）")
+                return False
+            with open(self.filename, 'r+b') as f:
+                if last == epoch:
+                    f.seek(HEADER.size + (len(self) - 1) * self.row.size)
+                else:
+                    f.seek(0, os.SEEK_END)
+                f.write(packed)
+        return True
+
+    # ---- 读取 ----
+
+    def _map(self):
+        """映射整个文件；文件增长后重新映射"""
+        size = os.path.getsize(self.filename)
+        if self._mmap is None or size != self._mapped_size:
+            if self._mmap is not None:
+                try:
+                    self._mmap.close()
+                except BufferError:
+                    pass  # 仍有视图引用旧映射，交给垃圾回收
+            with open(self.filename, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped_size = size
+        return self._mmap
+
+    def _time_at(self, buffer, index):
+        return struct.unpack_from('<q', buffer, HEADER.size + index * self.row.size)[0]
+
+    def _bisect(self, buffer, rows, epoch):
+        """时间列上的二分查找，返回第一个时间 >= epoch 的行号"""
+        lo, hi = 0, rows
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._time_at(buffer, mid) < epoch:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def window(self, start=None, end=None):
+        """返回 [start, end] 时间窗口对应的行区间 (首行, 行数)"""
+        buffer = self._map()
+        rows = len(self)
+        first = self._bisect(buffer, rows, to_epoch(start)) if start else 0
+        last = self._bisect(buffer, rows, to_epoch(end) + 1) if end else rows
+        return first, max(0, last - first)
+
+    def rows(self, start=None, end=None):
+        """逐行产出 (爬取时间, 话题ID元组, 热搜指数元组)"""
+        first, count = self.window(start, end)
+        buffer = self._map()
+        offset = HEADER.size + first * self.row.size
+        view = memoryview(buffer)[offset:offset + count * self.row.size]
+        try:
+            for values in self.row.iter_unpack(view):
+                yield from_epoch(values[0]), values[1:self.width + 1], values[self.width + 1:]
+        finally:
+            view.release()
+
+    def numpy_view(self, start=None, end=None):
+        """
+        时间窗口的零拷贝NumPy视图（结构化数组，字段 time / topic / hot）
+
+        需要安装numpy；视图直接引用内存映射，不复制数据。
+        """
+        import numpy as np
+        dtype = np.dtype([('time', '<i8'), ('topic', '<u4', (self.width,)), ('hot', '<i8', (self.width,))])
+        first, count = self.window(start, end)
+        return np.frombuffer(self._map(), dtype=dtype, count=count, offset=HEADER.size + first * self.row.size)
+
+    def topic_series(self, title, start=None, end=None):
+        """话题在时间窗口内每次上榜的 (爬取时间, 排名, 热搜指数)"""
+        self.topics.load()
+        topic_id = self.topics.ids.get(title)
+        if topic_id is None:
+            return []
+        series = []
+        for crawl_time, topic_ids, hots in self.rows(start, end):
+            if topic_id in topic_ids:
+                position = topic_ids.index(topic_id)
+                series.append((crawl_time, position + 1, None if hots[position] == MISSING_HOT else hots[position]))
+        return series
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+
+_matrices = {}
+
+
+def get_matrix(source='baidu'):
+    if source not in _matrices:
+        _matrices[source] = RankMatrix(source=source)
+    return _matrices[source]
+
+
+def on_snapshot(snapshot):
+    """快照写入钩子：追加一行"""
+    get_matrix(snapshot.get('source', 'baidu')).append(snapshot)
+
+
+def rebuild(store, path=None, source='baidu'):
+    """
+    从快照存储按时间顺序重建一个数据源的矩阵，返回写入的行数
+
+    只删除该数据源的 .bin 文件；topics.jsonl 是所有数据源共用的话题ID表，保留原有编号，
+    其他数据源矩阵中的话题ID仍然有效。
+    """
+    path = path or MATRIX_DIR
+    filename = os.path.join(path, f'{source}.bin')
+    if os.path.exists(filename):
+        os.remove(filename)
+    matrix = RankMatrix(path, source)
+    for snapshot in sorted(store.iter_snapshots(source), key=lambda s: s['crawl_time']):
+        matrix.append(snapshot)
+    return len(matrix)
+
+
+def main(argv=None):
+    """命令行入口：rebuild / series"""
+    parser = argparse.ArgumentParser(description="内存映射的排名矩阵")
+    parser.add_argument('--path', default=None, help="矩阵目录")
+    parser.add_argument('--source', default='baidu')
+    sub = parser.add_subparsers(dest='command', required=True)
+    rebuild_cmd = sub.add_parser('rebuild', help="从快照存储重建矩阵")
+    rebuild_cmd.add_argument('--store', default=None, help="快照存储目录")
+    series = sub.add_parser('series', help="话题在时间窗口内的排名轨迹")
+    series.add_argument('title')
+    series.add_argument('--start', default=None, help="起始时间，如 2025-11-01 00:00:00")
+    series.add_argument('--end', default=None)
+    args = parser.parse_args(argv)
+
+    setup_logging('matrix', console=args.command != 'series')
+    if args.command == 'rebuild':
+        from snapshot_store import SnapshotStore
+        rows = rebuild(SnapshotStore(args.store), args.path, args.source)
+        print(f"已重建 {rows} 行")
+    else:
+        matrix = RankMatrix(args.path, args.source)
+        for crawl_time, rank, hot in matrix.topic_series(args.title, args.start, args.end):
+            print(f"{crawl_time}  第 {rank} 名  {hot if hot is not None else '-'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+import os
+import sys
+import json
+import time
+import argparse
+import functools
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+from spider_logging import get_logger
+
+# 注意：本模块在爬虫和解析模块导入时就会被导入，只使用轻量的标准库模块；
+# cProfile、pstats、tracemalloc 只在真正剖析时才导入
+
+logger = get_logger('profiler')
+
+# 每N次运行剖析一次（0表示关闭，1表示每次都剖析），可通过环境变量或命令行参数开启
+PROFILE_EVERY = int(os.environ.get('BAIDU_HOT_PROFILE', '0') or 0)
+PROFILE_DIR = os.environ.get('BAIDU_HOT_PROFILE_DIR', 'profiles')
+# 最多保留的剖析结果数，超过时删除最旧的
+KEEP = int(os.environ.get('BAIDU_HOT_PROFILE_KEEP', '50'))
+
+# 调用栈采样间隔（秒），用于生成火焰图
+SAMPLE_INTERVAL = 0.005
+# tracemalloc记录的调用栈深度
+TRACE_FRAMES = 10
+
+COUNTER_NAME = 'run_counter'
+
+_active = None
+
+
+def configure(every=None, directory=None):
+    """命令行参数覆盖环境变量中的设置"""
+    global PROFILE_EVERY, PROFILE_DIR
+    if every is not None:
+        PROFILE_EVERY = every
+    if directory is not None:
+        PROFILE_DIR = directory
+
+
+def _next_run_number():
+    """运行计数保存在剖析目录中，每次启动新进程的定时任务（如cron）也能按“每N次”抽样"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, COUNTER_NAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            number = int(f.read().strip() or 0) + 1
+    except (OSError, ValueError):
+        number = 1
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(str(number))
+    os.replace(tmp_path, path)
+    return number
+
+
+def should_profile():
+    if PROFILE_EVERY <= 0:
+        return False
+    return _next_run_number() % PROFILE_EVERY == 0
+
+
+class StackSampler:
+    """后台线程定时采样目标线程的调用栈，统计为折叠栈（flamegraph.pl / speedscope 的输入格式）"""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            key = ';'.join(reversed(names))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+
+class RunProfile:
+    """一次运行的剖析：cProfile、tracemalloc、调用栈采样，以及被 @profiled 标记的各阶段耗时和内存增量"""
+
+    def __init__(self, name):
+        self.name = name
+        self.stages = {}    # 阶段 -> {'calls', 'seconds', 'allocated'}
+        self.started_at = datetime.now()
+        self.path = os.path.join(PROFILE_DIR, f"{self.started_at.strftime('%Y%m%d_%H%M%S')}_{name}")
+
+    def start(self):
+        import cProfile
+        import tracemalloc
+        self._tracing = not tracemalloc.is_tracing()
+        if self._tracing:
+            tracemalloc.start(TRACE_FRAMES)
+        self.sampler = StackSampler(threading.get_ident())
+        self.sampler.start()
+        self.profiler = cProfile.Profile()
+        self._started = time.perf_counter()
+        self.profiler.enable()
+
+    def stop(self):
+        import tracemalloc
+        self.profiler.disable()
+        self.elapsed = time.perf_counter() - self._started
+        self.sampler.stop()
+        self.memory = tracemalloc.take_snapshot()
+        self.peak = tracemalloc.get_traced_memory()[1]
+        if self._tracing:
+            tracemalloc.stop()
+
+    def measure(self, stage, func, args, kwargs):
+        import tracemalloc
+        before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stats = self.stages.setdefault(stage, {'calls': 0, 'seconds': 0.0, 'allocated': 0})
+            stats['calls'] += 1
+            stats['seconds'] += time.perf_counter() - started
+            stats['allocated'] += tracemalloc.get_traced_memory()[0] - before
+
+    def write(self, error=None):
+        """
+        写入剖析目录：
+        profile.pstats（可用 python -m pstats 或 snakeviz 查看）、stats.txt（按累计耗时排序的前40个函数）、
+        stacks.collapsed（火焰图）、memory.txt（分配最多的代码行）、summary.json（总耗时、峰值内存、各阶段）
+        """
+        import io
+        import pstats
+        os.makedirs(self.path, exist_ok=True)
+        self.profiler.dump_stats(os.path.join(self.path, 'profile.pstats'))
+        text = io.StringIO()
+        pstats.Stats(self.profiler, stream=text).sort_stats('cumulative').print_stats(40)
+        with open(os.path.join(self.path, 'stats.txt'), 'w', encoding='utf-8') as f:
+            f.write(text.getvalue())
+        self.sampler.write(os.path.join(self.path, 'stacks.collapsed'))
+        with open(os.path.join(self.path, 'memory.txt'), 'w', encoding='utf-8') as f:
+            f.write(f"峰值 {self.peak / 1024 / 1024:.2f} MB\n\n")
+            for stat in self.memory.statistics('lineno')[:25]:
+                f.write(f"{stat}\n")
+        summary = {
+            'name': self.name,
+            'started_at': self.started_at.strftime("%Y-%m-%d %H:%M:%S"),
+            'seconds': round(self.elapsed, 3),
+            'peak_mb': round(self.peak / 1024 / 1024, 2),
+            'samples': self.sampler.samples,
+            'stages': {name: {'calls': s['calls'], 'seconds': round(s['seconds'], 3),
+                              'allocated_kb': round(s['allocated'] / 1024, 1)}
+                       for name, s in self.stages.items()},
+            'error': error,
+        }
+        with open(os.path.join(self.path, 'summary.json'), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        return summary
+
+
+def _prune(keep=None):
+    keep = KEEP if keep is None else keep
+    entries = sorted(e for e in os.listdir(PROFILE_DIR) if os.path.isdir(os.path.join(PROFILE_DIR, e)))
+    import shutil
+    for entry in entries[:max(0, len(entries) - keep)]:
+        shutil.rmtree(os.path.join(PROFILE_DIR, entry), ignore_errors=True)
+
+
+@contextmanager
+def profile_run(name, force=False):
+    """
+    包裹一次完整的爬取运行：按配置每N次剖析一次（force=True时本次一定剖析）
+
+    未抽中时几乎没有开销；已在剖析中时（嵌套调用）不重复剖析。
+    """
+    global _active
+    if _active is not None or not (force or should_profile()):
+        yield None
+        return
+    run = RunProfile(name)
+    run.start()
+    _active = run
+    error = None
+    try:
+        yield run
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _active = None
+        run.stop()
+        try:
+            summary = run.write(error)
+            _prune()
+            stages = ", ".join(f"{stage} {s['seconds']:.2f}s" for stage, s in summary['stages'].items())
+            logger.info(f"性能剖析已保存到 {run.path}：耗时 {summary['seconds']:.2f}s，"
+                        f"内存峰值 {summary['peak_mb']:.1f}MB（{stages}）",
+                        extra={'profile': run.path, 'seconds': summary['seconds']})
+        except Exception as e:
+            logger.warning(f"保存性能剖析结果失败: {e}")
+
+
+def profiled(stage):
+    """标记需要单独统计耗时和内存增量的阶段；没有正在进行的剖析时直接调用原函数"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            run = _active
+            if run is None:
+                return func(*args, **kwargs)
+            return run.measure(stage, func, args, kwargs)
+        return wrapper
+    return decorate
+
+
+def main(argv=None):
+    """命令行入口：列出最近的剖析结果"""
+    parser = argparse.ArgumentParser(description="查看运行剖析结果")
+    parser.add_argument('--dir', default=None, help="剖析目录")
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    directory = args.dir or PROFILE_DIR
+    if not os.path.isdir(directory):
+        print("还没有剖析结果（设置 BAIDU_HOT_PROFILE=N 每N次运行剖析一次）")
+        return 0
+    entries = sorted((e for e in os.listdir(directory) if os.path.isdir(os.path.join(directory, e))),
+                     reverse=True)[:args.limit]
+    for entry in entries:
+        try:
+            with open(os.path.join(directory, entry, 'summary.json'), 'r', encoding='utf-8') as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            continue
+        stages = "  ".join(f"{stage}={s['seconds']:.2f}s" for stage, s in summary['stages'].items())
+        status = f"  失败: {summary['error']}" if summary.get('error') else ""
+        print(f"{summary['started_at']}  {summary['name']:<10} {summary['seconds']:>7.2f}s  "
+              f"峰值 {summary['peak_mb']:>6.1f}MB  {stages}{status}")
+    print(f"火焰图: flamegraph.pl {directory}/<目录>/stacks.collapsed > flame.svg（或拖入 speedscope.app）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,34 +1,62 @@
 import schedule
 import time
-import subprocess
+import argparse
 import os
 from datetime import datetime
+from spider_logging import get_logger, setup_logging, dump_ring_buffer
+
+logger = get_logger('schedule')
 
 def run_spider():
     """运行爬虫任务"""
-    print(f"定时任务启动 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    logger.info(f"定时任务启动 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     try:
         # 直接导入并运行爬虫模块
         from baidu_hot_spider import main
-        main()
-        print(f"爬虫执行完成 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        from run_profiler import profile_run
+        with profile_run('schedule'):
+            main()
+        logger.info(f"爬虫执行完成 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     except Exception as e:
-        print(f"爬虫运行失败: {e}")
-        # 记录错误到日志文件
-        with open("spider_error.log", "a", encoding="utf-8") as f:
-            f.write(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - 错误: {e}\n")
+        logger.exception(f"爬虫运行失败: {e}")
+        # 导出最近的日志事件用于排查
+        dump_ring_buffer('schedule')
         # 添加短暂延迟避免频繁失败
         time.sleep(5)
 
-def main():
+def main(argv=None):
     """主函数，设置定时任务"""
-    print("百度热搜榜定时爬虫已启动")
-    print(f"当前时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print("设置为每分钟爬取一次")
-    print("按 Ctrl+C 停止程序")
-    
+    parser = argparse.ArgumentParser(description="百度热搜榜定时爬虫")
+    parser.add_argument('--fixed', action='store_true', help="固定每10分钟爬取一次（默认根据榜单变动自适应调整）")
+    parser.add_argument('--min-interval', type=int, default=30, help="自适应模式的最短间隔（秒）")
+    parser.add_argument('--max-interval', type=int, default=1800, help="自适应模式的最长间隔（秒）")
+    parser.add_argument('--hourly-budget', type=int, default=60, help="每小时最多爬取次数")
+    parser.add_argument('--daily-budget', type=int, default=600, help="每天最多爬取次数")
+    parser.add_argument('--profile-every', type=int, default=None, metavar='N',
+                        help="每N次爬取做一次性能剖析（默认取 BAIDU_HOT_PROFILE，0表示关闭）")
+    args = parser.parse_args(argv)
+
+    setup_logging('schedule')
+    if args.profile_every is not None:
+        from run_profiler import configure
+        configure(every=args.profile_every)
+    logger.info("百度热搜榜定时爬虫已启动")
+    logger.info(f"当前时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    logger.info("按 Ctrl+C 停止程序")
+
+    if not args.fixed:
+        from adaptive_schedule import AdaptiveScheduler
+        scheduler = AdaptiveScheduler(run_spider, min_interval=args.min_interval, max_interval=args.max_interval,
+                                      hourly_budget=args.hourly_budget, daily_budget=args.daily_budget)
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            logger.info("程序已停止")
+        return
+
+    logger.info("设置为每10分钟爬取一次")
     # 设置定时任务，每10分钟执行一次
-    schedule.every(10).minute.do(run_spider)
+    schedule.every(10).minutes.do(run_spider)
     
     # 立即执行一次
     run_spider()
@@ -39,7 +67,7 @@ def main():
             schedule.run_pending()
             time.sleep(60)  # 每分钟检查一次是否有待执行的任务
     except KeyboardInterrupt:
-        print("\n程序已停止")
+        logger.info("程序已停止")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,84 +1,113 @@
+import os
 import time
+import argparse
+import threading
 import schedule
-import subprocess
-import sys
 from datetime import datetime
+from spider_logging import get_logger, setup_logging, dump_ring_buffer
 
-def run_spider():
-    """运行百度热搜榜爬虫脚本"""
-    print(f"\n开始定时爬取 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    try:
-        # 运行Selenium版本的爬虫脚本
-        result = subprocess.run([sys.executable, "baidu_hot_spider_selenium.py"], 
-                              capture_output=True, 
-                              text=True, 
-                              timeout=300)  # 设置5分钟超时
-        
-        # 输出执行结果
-        if result.stdout:
-            print(f"爬虫输出:\n{result.stdout}")
-        if result.stderr:
-            print(f"爬虫错误输出:\n{result.stderr}")
-        
-        # 检查执行状态
-        if result.returncode == 0:
-            print(f"定时爬取成功完成 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        else:
-            print(f"定时爬取失败，返回码: {result.returncode}")
-            # 记录错误日志
-            log_error(f"爬虫执行失败，返回码: {result.returncode}\n错误输出: {result.stderr}")
-            
-    except subprocess.TimeoutExpired:
-        print("爬虫执行超时，已强制终止")
-        log_error("爬虫执行超时，已强制终止")
-    except Exception as e:
-        print(f"运行爬虫时发生错误: {str(e)}")
-        log_error(f"运行爬虫时发生错误: {str(e)}")
-    
-    print(f"本次定时爬取处理完毕 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+logger = get_logger('schedule')
+
+# 单次爬取的时限（秒），超时后强制关闭浏览器；与原先子进程方式的 timeout=300 一致
+CRAWL_TIMEOUT = int(os.environ.get('BAIDU_HOT_CRAWL_TIMEOUT', '300'))
+# 强制关闭浏览器后等待爬取线程退出的时间（秒）
+ABORT_GRACE = 30
 
-def log_error(error_message):
-    """记录错误信息到日志文件"""
-    log_filename = f"schedule_error_{datetime.now().strftime('%Y%m%d')}.log"
+# 当前的爬取线程；超时后仍未退出时，下一次定时任务跳过，避免同时运行多个浏览器
+_worker = None
+
+def _crawl(result):
+    """在工作线程中运行一次爬取，结果或异常写入result"""
     try:
-        with open(log_filename, "a", encoding="utf-8") as f:
-            f.write(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {error_message}\n")
-        print(f"错误日志已写入: {log_filename}")
+        from baidu_hot_spider_selenium import main as spider_main
+        from run_profiler import profile_run
+        with profile_run('schedule'):
+            result['succeeded'] = spider_main()
     except Exception as e:
-        print(f"写入错误日志失败: {str(e)}")
+        result['error'] = e
+
+def run_spider(timeout=None):
+    """运行百度热搜榜爬虫脚本"""
+    global _worker
+    timeout = timeout or CRAWL_TIMEOUT
+    logger.info(f"开始定时爬取 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    started = time.perf_counter()
+    if _worker is not None and _worker.is_alive():
+        logger.error("上一次爬取仍未结束，跳过本次定时爬取")
+        return
+    # 在当前进程内运行Selenium版本的爬虫，模块只在第一次执行时导入，不再每次启动新的解释器；
+    # 爬取放在工作线程中，超过时限时由看门狗强制关闭浏览器，卡住的页面加载不会让定时任务停摆
+    result = {}
+    _worker = threading.Thread(target=_crawl, args=(result,), name='selenium-crawl', daemon=True)
+    _worker.start()
+    _worker.join(timeout)
+    if _worker.is_alive():
+        logger.error(f"爬取超过 {timeout} 秒仍未完成，强制关闭浏览器")
+        dump_ring_buffer('schedule')
+        from baidu_hot_spider_selenium import abort_browsers
+        abort_browsers()
+        _worker.join(ABORT_GRACE)
+        if _worker.is_alive():
+            logger.error(f"关闭浏览器 {ABORT_GRACE} 秒后爬取线程仍未退出")
+    elif 'error' in result:
+        logger.error(f"运行爬虫时发生错误: {result['error']}", exc_info=result['error'])
+        dump_ring_buffer('schedule')
+    elif result.get('succeeded'):
+        logger.info(f"定时爬取成功完成 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    else:
+        logger.error("定时爬取失败")
+
+    logger.info(f"本次定时爬取处理完毕 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+                extra={'elapsed_ms': round((time.perf_counter() - started) * 1000)})
 
 def setup_schedule(minutes_interval=30):
     """设置定时任务"""
     # 每分钟执行一次（仅用于测试）
     schedule.every(minutes_interval).minutes.do(run_spider)
-    print(f"定时任务已设置，每{minutes_interval}分钟执行一次")
-    print(f"下次执行时间: {schedule.next_run()}")
+    logger.info(f"定时任务已设置，每{minutes_interval}分钟执行一次")
+    logger.info(f"下次执行时间: {schedule.next_run()}")
 
-def main():
+def main(argv=None):
     """主函数"""
-    print("百度热搜榜定时爬虫（Selenium版本）启动中...")
-    print(f"启动时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    
-    # 设置定时任务（默认每30分钟执行一次，测试时可设为1分钟）
-    setup_schedule(minutes_interval=1)  # 测试时设置为每分钟执行
-    
-    # 立即执行一次爬虫
-    run_spider()
-    
-    print("\n定时任务已启动，按Ctrl+C停止")
+    parser = argparse.ArgumentParser(description="百度热搜榜定时爬虫（Selenium版本）")
+    parser.add_argument('--fixed', type=int, default=None, metavar='MINUTES',
+                        help="固定间隔（分钟）爬取；默认根据榜单变动自适应调整")
+    parser.add_argument('--min-interval', type=int, default=30, help="自适应模式的最短间隔（秒）")
+    parser.add_argument('--max-interval', type=int, default=1800, help="自适应模式的最长间隔（秒）")
+    parser.add_argument('--hourly-budget', type=int, default=60, help="每小时最多爬取次数")
+    parser.add_argument('--daily-budget', type=int, default=600, help="每天最多爬取次数")
+    parser.add_argument('--profile-every', type=int, default=None, metavar='N',
+                        help="每N次爬取做一次性能剖析（默认取 BAIDU_HOT_PROFILE，0表示关闭）")
+    args = parser.parse_args(argv)
+
+    setup_logging('schedule_selenium')
+    if args.profile_every is not None:
+        from run_profiler import configure
+        configure(every=args.profile_every)
+    logger.info("百度热搜榜定时爬虫（Selenium版本）启动中...")
+    logger.info(f"启动时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
-    # 主循环，保持程序运行
     try:
-        while True:
-            schedule.run_pending()
-            time.sleep(10)  # 每10秒检查一次是否有待执行的任务
+        if args.fixed is None:
+            from adaptive_schedule import AdaptiveScheduler
+            AdaptiveScheduler(run_spider, min_interval=args.min_interval, max_interval=args.max_interval,
+                              hourly_budget=args.hourly_budget, daily_budget=args.daily_budget).run_forever()
+        else:
+            setup_schedule(minutes_interval=args.fixed)
+            # 立即执行一次爬虫
+            run_spider()
+            logger.info("定时任务已启动，按Ctrl+C停止")
+            # 主循环，保持程序运行
+            while True:
+                schedule.run_pending()
+                time.sleep(10)  # 每10秒检查一次是否有待执行的任务
     except KeyboardInterrupt:
-        print("\n定时爬虫已手动停止")
+        logger.info("定时爬虫已手动停止")
     except Exception as e:
-        print(f"定时任务运行时发生错误: {str(e)}")
-        log_error(f"定时任务运行时发生错误: {str(e)}")
+        logger.exception(f"定时任务运行时发生错误: {str(e)}")
+        dump_ring_buffer('schedule')
     finally:
-        print(f"程序结束时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        logger.info(f"程序结束时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
 if __name__ == "__main__":
     main()
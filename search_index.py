@@ -0,0 +1,325 @@
+import os
+import re
+import sys
+import json
+import math
+import time
+import argparse
+import threading
+import unicodedata
+from array import array
+from collections import defaultdict
+from file_lock import file_lock
+from spider_logging import get_logger, setup_logging
+
+logger = get_logger('search')
+
+# 索引目录，可通过环境变量覆盖
+INDEX_DIR = os.environ.get('BAIDU_HOT_INDEX_DIR', 'search_index')
+# 增量日志超过这个大小时，写入钩子自动把索引压缩为全量文件并清空日志（约1000条快照）
+COMPACT_LOG_BYTES = int(os.environ.get('BAIDU_HOT_INDEX_COMPACT_BYTES', str(8 * 1024 * 1024)))
+
+# 标题命中的权重高于简介
+FIELD_WEIGHTS = (2.0, 1.0)
+HAN_RUN = re.compile(r'[一-鿿]+')
+WORD_RUN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    """分词：中文按相邻两字切分（单字词保留单字），英文和数字按整词切分"""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    terms = []
+    for run in HAN_RUN.findall(text):
+        if len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    terms.extend(WORD_RUN.findall(text))
+    return terms
+
+
+class SearchIndex:
+    """
+    标题和简介的倒排索引
+
+    - 话题（同一标题）只分词一次：词项 -> 话题ID集合，分标题、简介两个字段；
+    - 每个话题记录出现过的 (快照序号, 排名)；
+    - 持久化为 compact.json（全量）+ log.jsonl（每次写入追加一行增量）。
+      写入时只追加增量，不需要载入索引；载入时先读全量再重放增量。
+      日志超过 COMPACT_LOG_BYTES 时由写入方压缩：写入全量文件后清空日志，载入和重放的代价不随历史增长。
+    """
+
+    def __init__(self, path=None):
+        self.path = path or INDEX_DIR
+        os.makedirs(self.path, exist_ok=True)
+        self.compact_file = os.path.join(self.path, 'compact.json')
+        self.log_file = os.path.join(self.path, 'log.jsonl')
+        self.lock_file = os.path.join(self.path, '.lock')
+        self._lock = threading.Lock()
+        self.snapshots = []        # 快照序号 -> (快照ID, 爬取时间)
+        self.topics = []           # 话题ID -> [标题, 简介]
+        self.topic_ids = {}        # 标题 -> 话题ID
+        self.postings = ({}, {})   # (标题词项, 简介词项) -> {词项: set(话题ID)}
+        self.occ_snapshots = []    # 话题ID -> array('I') 快照序号
+        self.occ_ranks = []        # 话题ID -> array('B') 排名
+        self._snapshot_ids = set()
+        self._log_offset = 0
+        self._compact_mtime = None  # 载入的全量文件的修改时间，变化说明其他进程压缩过，需要重新载入
+        self._loaded = False
+
+    # ---- 构建 ----
+
+    def _index_text(self, topic_id, field, text):
+        postings = self.postings[field]
+        for term in set(tokenize(text)):
+            postings.setdefault(term, set()).add(topic_id)
+
+    def _add_item(self, seq, title, description, rank):
+        topic_id = self.topic_ids.get(title)
+        if topic_id is None:
+            topic_id = len(self.topics)
+            self.topic_ids[title] = topic_id
+            self.topics.append([title, description])
+            self.occ_snapshots.append(array('I'))
+            self.occ_ranks.append(array('B'))
+            self._index_text(topic_id, 0, title)
+            self._index_text(topic_id, 1, description)
+        elif description and description != self.topics[topic_id][1]:
+            # 同一话题的简介可能更新，新简介中的词项也加入索引
+            self.topics[topic_id][1] = description
+            self._index_text(topic_id, 1, description)
+        self.occ_snapshots[topic_id].append(seq)
+        self.occ_ranks[topic_id].append(min(int(rank), 255))
+
+    def add_snapshot(self, snapshot_id, crawl_time, items):
+        """把一条快照加入内存中的索引"""
+        seq = len(self.snapshots)
+        self.snapshots.append((snapshot_id, crawl_time))
+        self._snapshot_ids.add(snapshot_id)
+        for item in items:
+            self._add_item(seq, item['title'], item.get('description') or '', item.get('rank') or 0)
+
+    # ---- 持久化 ----
+
+    def append_log(self, snapshot, compact_bytes=None):
+        """把一条快照追加到增量日志（不需要载入索引），日志超过阈值时顺带压缩"""
+        delta = {
+            'id': snapshot['id'],
+            'time': snapshot['crawl_time'],
+            'items': [[i['title'], i.get('description') or '', i.get('rank') or 0] for i in snapshot['items']],
+        }
+        compact_bytes = COMPACT_LOG_BYTES if compact_bytes is None else compact_bytes
+        # 与压缩互斥：压缩清空日志时不能有追加写入
+        with file_lock(self.lock_file):
+            with open(self.log_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(delta, ensure_ascii=False, separators=(',', ':')) + '\n')
+                log_size = f.tell()
+            if compact_bytes and log_size >= compact_bytes:
+                self._compact_locked()
+
+    def load(self):
+        """载入全量索引并重放增量日志；之后再调用只读取新增的日志"""
+        with self._lock:
+            compact_mtime = self._mtime(self.compact_file)
+            if not self._loaded or compact_mtime != self._compact_mtime:
+                self._reset()
+                if compact_mtime is not None:
+                    self._load_compact()
+                self._compact_mtime = compact_mtime
+                self._loaded = True
+            self._replay_log()
+        return self
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _reset(self):
+        self.snapshots = []
+        self.topics = []
+        self.topic_ids = {}
+        self.postings = ({}, {})
+        self.occ_snapshots = []
+        self.occ_ranks = []
+        self._snapshot_ids = set()
+        self._log_offset = 0
+
+    def _load_compact(self):
+        with open(self.compact_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        self.snapshots = [tuple(s) for s in data['snapshots']]
+        self.topics = data['topics']
+        self.topic_ids = {topic[0]: i for i, topic in enumerate(self.topics)}
+        self.postings = tuple({term: set(ids) for term, ids in field.items()} for field in data['postings'])
+        self.occ_snapshots = [array('I', occ) for occ in data['occ_snapshots']]
+        self.occ_ranks = [array('B', occ) for occ in data['occ_ranks']]
+        self._snapshot_ids = {s[0] for s in self.snapshots}
+        self._log_offset = data.get('log_offset', 0)
+
+    def _replay_log(self):
+        if not os.path.exists(self.log_file):
+            return
+        with open(self.log_file, 'rb') as f:
+            f.seek(self._log_offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                self._log_offset += len(line)
+                delta = json.loads(line)
+                if delta['id'] in self._snapshot_ids:
+                    continue    # 压缩后、清空日志前中断时，日志中会留下全量文件已包含的快照
+                self._snapshot_ids.add(delta['id'])
+                seq = len(self.snapshots)
+                self.snapshots.append((delta['id'], delta['time']))
+                for title, description, rank in delta['items']:
+                    self._add_item(seq, title, description, rank)
+
+    def compact(self):
+        """把当前索引写成全量文件并清空增量日志"""
+        with file_lock(self.lock_file):
+            self._compact_locked()
+
+    def _compact_locked(self):
+        """调用方需持有锁文件：此时日志不会再增长，重放到末尾后写入全量文件，再清空日志"""
+        self.load()
+        with self._lock:
+            data = {
+                'snapshots': self.snapshots,
+                'topics': self.topics,
+                'postings': [{term: sorted(ids) for term, ids in field.items()} for field in self.postings],
+                'occ_snapshots': [occ.tolist() for occ in self.occ_snapshots],
+                'occ_ranks': [occ.tolist() for occ in self.occ_ranks],
+                'log_offset': 0,
+            }
+            tmp_path = self.compact_file + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, self.compact_file)
+            # 全量文件已包含日志中的全部内容；先替换全量文件再清空日志，中途中断时重放会按快照ID跳过已包含的快照
+            open(self.log_file, 'w').close()
+            self._log_offset = 0
+            self._compact_mtime = self._mtime(self.compact_file)
+        logger.info(f"索引已压缩保存: {len(self.topics)} 个话题，{len(self.snapshots)} 条快照")
+
+    # ---- 查询 ----
+
+    def search(self, query, limit=10, fuzzy=False, min_match=0.6):
+        """
+        检索话题，按相关度排序
+
+        精确模式要求查询的每个词项都命中（标题或简介）；
+        模糊模式只要求命中的词项比例不低于min_match，可容忍错字、缺字。
+        """
+        self.load()
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        total_topics = max(1, len(self.topics))
+        scores = defaultdict(float)
+        matched = defaultdict(int)
+        for term in terms:
+            term_hit = set()
+            for field, weight in enumerate(FIELD_WEIGHTS):
+                ids = self.postings[field].get(term, ())
+                if not ids:
+                    continue
+                idf = math.log(1 + total_topics / len(ids))
+                for topic_id in ids:
+                    scores[topic_id] += weight * idf
+                    term_hit.add(topic_id)
+            for topic_id in term_hit:
+                matched[topic_id] += 1
+
+        required = max(1, math.ceil(len(terms) * min_match)) if fuzzy else len(terms)
+        candidates = [t for t, count in matched.items() if count >= required]
+        # 覆盖率高的优先，其次是相关度，再次是上榜次数
+        candidates.sort(key=lambda t: (-matched[t], -scores[t], -len(self.occ_snapshots[t])))
+        return [self._describe(t, scores[t], matched[t] / len(terms)) for t in candidates[:limit]]
+
+    def _describe(self, topic_id, score, coverage):
+        seqs = self.occ_snapshots[topic_id]
+        ranks = self.occ_ranks[topic_id]
+        title, description = self.topics[topic_id]
+        return {
+            'title': title,
+            'description': description,
+            'score': round(score, 3),
+            'coverage': round(coverage, 3),
+            'appearances': len(seqs),
+            'first_seen': self.snapshots[seqs[0]][1] if seqs else None,
+            'last_seen': self.snapshots[seqs[-1]][1] if seqs else None,
+            'best_rank': min(ranks) if ranks else None,
+        }
+
+    def occurrences(self, title):
+        """话题每次上榜的 (爬取时间, 排名)"""
+        self.load()
+        topic_id = self.topic_ids.get(title)
+        if topic_id is None:
+            return []
+        return [(self.snapshots[s][1], r) for s, r in zip(self.occ_snapshots[topic_id], self.occ_ranks[topic_id])]
+
+
+_default_index = None
+
+
+def get_index():
+    global _default_index
+    if _default_index is None:
+        _default_index = SearchIndex()
+    return _default_index
+
+
+def on_snapshot(snapshot):
+    """快照写入钩子：只追加增量日志，索引在查询时增量载入"""
+    get_index().append_log(snapshot)
+
+
+def rebuild(store, index):
+    """从快照存储全量重建索引"""
+    for name in (index.compact_file, index.log_file):
+        if os.path.exists(name):
+            os.remove(name)
+    for snapshot in sorted(store.iter_snapshots(), key=lambda s: s['crawl_time']):
+        index.append_log(snapshot)
+    index.compact()
+
+
+def main(argv=None):
+    """命令行入口：query / rebuild / compact"""
+    parser = argparse.ArgumentParser(description="热搜标题和简介全文检索")
+    parser.add_argument('--index', default=None, help="索引目录")
+    sub = parser.add_subparsers(dest='command', required=True)
+    query = sub.add_parser('query', help="检索")
+    query.add_argument('text')
+    query.add_argument('--fuzzy', action='store_true', help="模糊匹配")
+    query.add_argument('--limit', type=int, default=10)
+    rebuild_cmd = sub.add_parser('rebuild', help="从快照存储重建索引")
+    rebuild_cmd.add_argument('--store', default=None, help="快照存储目录")
+    sub.add_parser('compact', help="合并增量日志")
+    args = parser.parse_args(argv)
+
+    setup_logging('search', console=args.command != 'query')
+    index = SearchIndex(args.index)
+    if args.command == 'rebuild':
+        from snapshot_store import SnapshotStore
+        rebuild(SnapshotStore(args.store), index)
+    elif args.command == 'compact':
+        index.compact()
+    else:
+        index.load()
+        started = time.perf_counter()
+        results = index.search(args.text, limit=args.limit, fuzzy=args.fuzzy)
+        elapsed = (time.perf_counter() - started) * 1000
+        for r in results:
+            print(f"[{r['score']:.2f}] {r['title']}  上榜 {r['appearances']} 次，最高第 {r['best_rank']} 名，"
+                  f"{r['first_seen']} ~ {r['last_seen']}")
+        print(f"共 {len(results)} 条结果，耗时 {elapsed:.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+import os
+import re
+import json
+import statistics
+from collections import Counter, defaultdict
+from datetime import datetime
+from bs4 import BeautifulSoup
+from spider_logging import get_logger
+
+logger = get_logger('selector')
+
+# 学习到的选择器缓存文件，可通过环境变量覆盖
+SELECTOR_CACHE = os.environ.get('BAIDU_HOT_SELECTOR_CACHE', 'selector_cache.json')
+
+# CSS Modules生成的类名形如 hot-index_1Bl1a：稳定的前缀 + 下划线 + 5位左右的哈希
+HASHED_CLASS = re.compile(r'^([A-Za-z][\w-]*?)_[A-Za-z0-9-]{4,6}$')
+HAN = re.compile(r'[一-龥]')
+DIGITS = re.compile(r'^\d{3,}$')
+
+
+def class_key(cls):
+    """把类名归一化为稳定形式：带哈希的类名只保留前缀（以下划线结尾），普通类名原样保留"""
+    match = HASHED_CLASS.match(cls)
+    return f"{match.group(1)}_" if match else cls
+
+
+def class_selector(key):
+    """由归一化的类名生成CSS选择器，带哈希的类名使用前缀匹配"""
+    if key.endswith('_'):
+        return f'[class^="{key}"], [class*=" {key}"]'
+    return f'.{key}'
+
+
+def _signature(tag):
+    classes = tag.get('class') or []
+    return tag.name + ''.join('.' + class_key(c) for c in sorted(classes))
+
+
+def _subtree_shape(tag):
+    """子树的结构特征：所有后代元素签名的集合"""
+    return frozenset(_signature(t) for t in tag.find_all(True))
+
+
+def _similarity(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _own_text(tag):
+    return ''.join(s for s in tag.find_all(string=True, recursive=False)).strip()
+
+
+def find_repeated_items(soup, expected=20, min_similarity=0.8):
+    """
+    寻找页面中重复出现的列表项：同一父元素下签名相同、结构相似的兄弟元素
+
+    返回 (签名, 元素列表)，找不到时返回 (None, [])。
+    """
+    groups = defaultdict(list)
+    for tag in soup.find_all(True):
+        if tag.get('class') and tag.parent is not None:
+            groups[(id(tag.parent), _signature(tag))].append(tag)
+
+    best = (None, [])
+    best_score = 0
+    for (_, signature), tags in groups.items():
+        if len(tags) < expected // 2:
+            continue
+        shapes = [_subtree_shape(t) for t in tags]
+        reference = Counter(shapes).most_common(1)[0][0]
+        if len(reference) < 3:
+            continue
+        similar = [t for t, shape in zip(tags, shapes) if _similarity(shape, reference) >= min_similarity]
+        # 列表项应包含中文文本；数量接近预期、结构越丰富得分越高
+        with_text = [t for t in similar if HAN.search(t.get_text())]
+        if len(with_text) < expected // 2:
+            continue
+        score = min(len(with_text), expected) * len(reference)
+        if score > best_score:
+            best_score = score
+            best = (signature, with_text)
+    return best
+
+
+def _field_candidates(items):
+    """统计列表项内每种后代签名的文本特征，用于推断标题、简介、指数对应的元素"""
+    stats = defaultdict(lambda: {'texts': [], 'keys': None})
+    for item in items:
+        seen = set()
+        for tag in item.find_all(True):
+            classes = tag.get('class') or []
+            if not classes:
+                continue
+            signature = _signature(tag)
+            if signature in seen:
+                continue
+            seen.add(signature)
+            entry = stats[signature]
+            entry['keys'] = [class_key(c) for c in classes]
+            # 只看元素自身的文本，避免外层容器因包含子元素文本而被误认为字段
+            entry['texts'].append(_own_text(tag))
+    return stats
+
+
+def derive_selectors(items):
+    """从重复的列表项中推断各字段的稳定选择器"""
+    stats = _field_candidates(items)
+    total = len(items)
+    best = {'title': (0, None), 'description': (0, None), 'hot_index': (0, None)}
+
+    for signature, entry in stats.items():
+        texts = [t for t in entry['texts'] if t]
+        if len(texts) < total * 0.8:
+            continue
+        # 优先使用带哈希前缀的类名，其次是普通类名
+        keys = sorted(entry['keys'], key=lambda k: (not k.endswith('_'), k))
+        selector = class_selector(keys[0])
+        lengths = [len(t) for t in texts]
+        median_len = statistics.median(lengths)
+        distinct = len(set(texts)) / len(texts)
+
+        if all(DIGITS.match(t.replace(',', '')) for t in texts):
+            score = len(texts)
+            if score > best['hot_index'][0]:
+                best['hot_index'] = (score, selector)
+            continue
+        if not all(HAN.search(t) for t in texts) or distinct < 0.9:
+            continue
+        if 2 <= median_len <= 40:
+            # 标题：文本较短且各不相同，取覆盖率最高、文本最短的元素
+            score = len(texts) * 100 - median_len
+            if score > best['title'][0]:
+                best['title'] = (score, selector)
+        if median_len > 20:
+            # 简介：文本最长的元素
+            if median_len > best['description'][0]:
+                best['description'] = (median_len, selector)
+
+    return {field: selector for field, (_, selector) in best.items()}
+
+
+def learn_selectors(html, expected=20):
+    """从一个页面学习热搜列表的选择器，失败时返回None"""
+    soup = BeautifulSoup(html, 'html.parser') if isinstance(html, str) else html
+    signature, items = find_repeated_items(soup, expected)
+    if not items:
+        logger.warning("未能在页面中找到重复的列表结构")
+        return None
+
+    container_classes = [class_key(c) for c in signature.split('.')[1:]]
+    container_classes.sort(key=lambda k: (not k.endswith('_'), k))
+    selectors = derive_selectors(items)
+    if not selectors['title']:
+        logger.warning("找到了列表结构，但无法确定标题元素")
+        return None
+
+    selectors['container'] = class_selector(container_classes[0])
+    logger.info(f"学习到新的选择器: 容器 {selectors['container']}，共 {len(items)} 个列表项",
+                extra={'selectors': selectors})
+    return selectors
+
+
+def extract_with_selectors(soup, selectors, limit=20):
+    """用学习到的选择器提取热搜数据"""
+    results = []
+    for container in soup.select(selectors['container']):
+        title_element = container.select_one(selectors['title'])
+        if title_element is None:
+            continue
+        title = title_element.get_text().strip()
+        description = ""
+        if selectors.get('description'):
+            desc_element = container.select_one(selectors['description'])
+            description = desc_element.get_text().strip() if desc_element else ""
+        hot_index = ""
+        if selectors.get('hot_index'):
+            hot_element = container.select_one(selectors['hot_index'])
+            hot_index = re.sub(r'[^0-9]', '', hot_element.get_text()) if hot_element else ""
+        results.append({
+            'rank': len(results) + 1,
+            'title': title[:100],
+            'description': description[:200],
+            'hot_index': hot_index
+        })
+        if len(results) >= limit:
+            break
+    return results
+
+
+def load_cached_selectors(path=None):
+    """读取缓存的选择器，不存在或损坏时返回None"""
+    path = path or SELECTOR_CACHE
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"选择器缓存读取失败: {e}")
+        return None
+
+
+def save_selectors(selectors, path=None):
+    """保存选择器并递增版本号，返回保存的内容"""
+    path = path or SELECTOR_CACHE
+    previous = load_cached_selectors(path) or {}
+    cached = dict(selectors, version=previous.get('version', 0) + 1,
+                  learned_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cached, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return cached
+
+
+def extract_self_healing(soup, expected=20):
+    """
+    先用缓存的选择器提取；结果不足时从当前页面重新学习并更新缓存
+
+    页面改版后只需一次学习，后续抓取即可继续走HTTP解析，不必启动浏览器。
+    """
+    cached = load_cached_selectors()
+    if cached:
+        results = extract_with_selectors(soup, cached, expected)
+        if len(results) >= expected // 2:
+            logger.info(f"使用缓存的选择器（版本 {cached['version']}）提取到 {len(results)} 条数据")
+            return results
+
+    learned = learn_selectors(soup, expected)
+    if not learned:
+        return []
+    results = extract_with_selectors(soup, learned, expected)
+    if len(results) >= expected // 2:
+        cached = save_selectors(learned)
+        logger.info(f"选择器缓存已更新到版本 {cached['version']}")
+    return results
@@ -0,0 +1,416 @@
+import os
+import sys
+import time
+import struct
+import hashlib
+import argparse
+import threading
+from spider_logging import get_logger
+
+logger = get_logger('shm')
+
+
+# 默认的快照存储目录（与 snapshot_store 未设置 BAIDU_HOT_STORE_DIR 时相同）
+DEFAULT_STORE_DIR = 'hot_store'
+
+
+def shm_prefix(store_path=None):
+    """
+    共享内存段名的前缀，每个数据源一个段：<前缀>_<数据源>
+
+    设置了 BAIDU_HOT_SHM_PREFIX 时直接使用；否则默认存储使用 baidu_hot，其他存储（store_path，
+    未指定时取 BAIDU_HOT_STORE_DIR）的前缀带上存储路径的哈希，不同存储的缓存互不干扰。
+    每次创建或连接缓存时计算，--store 参数或代码中传入的存储都对应各自的段。
+    """
+    explicit = os.environ.get('BAIDU_HOT_SHM_PREFIX')
+    if explicit:
+        return explicit
+    store_path = store_path or os.environ.get('BAIDU_HOT_STORE_DIR')
+    if not store_path or os.path.abspath(store_path) == os.path.abspath(DEFAULT_STORE_DIR):
+        return 'baidu_hot'
+    return f"baidu_hot_{hashlib.sha1(os.path.abspath(store_path).encode('utf-8')).hexdigest()[:8]}"
+
+# 保留最近的快照数和每个快照槽的字节数（50条热搜最长约45KB）
+SLOTS = int(os.environ.get('BAIDU_HOT_SHM_SLOTS', '16'))
+SLOT_SIZE = int(os.environ.get('BAIDU_HOT_SHM_SLOT_SIZE', str(64 * 1024)))
+
+MAGIC = b'BHSM'
+LAYOUT_VERSION = 1
+
+# 段头：魔数、布局版本、槽数、槽大小、已发布的快照数（最新快照的序号）
+HEADER = struct.Struct('<4sHHI4xQ')
+HEADER_SIZE = 64
+COUNT_OFFSET = 16
+
+# 槽头：顺序锁计数（写入中为奇数）、快照序号、条目数、保留、爬取时间、数据源、快照ID
+SLOT_HEADER = struct.Struct('<QQHH20s16s48s')
+# 槽头之后依次为：热搜指数 int64[n]、字符串偏移 uint32[2n+1]、排名 int16[n]、UTF-8字符串区（标题与简介交替）
+MISSING_HOT = -1
+
+# 读取时遇到正在写入的槽最多重试的次数
+READ_RETRIES = 1000
+
+
+def segment_name(source='baidu', store_path=None):
+    return f"{shm_prefix(store_path)}_{source}"
+
+
+def _lock_path(name):
+    """写入方之间互斥用的锁文件"""
+    return os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else '/tmp', f'{name}.lock')
+
+
+def _untrack(shm):
+    """
+    Python 3.13之前，创建或连接共享内存的进程退出时，resource_tracker会删除该段；
+    缓存需要在写入进程（例如cron启动的单次爬取）和读取进程退出后继续存在，因此取消跟踪
+    """
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+
+
+def _load_word(buf, offset):
+    """读取对齐的8字节计数（单次加载，不会读到写了一半的值）；临时视图立即释放，不妨碍关闭共享内存段"""
+    with buf[offset:offset + 8].cast('Q') as word:
+        return word[0]
+
+
+def _store_word(buf, offset, value):
+    with buf[offset:offset + 8].cast('Q') as word:
+        word[0] = value
+
+
+def _to_int(value, default=MISSING_HOT):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _fixed(text, size):
+    """定长字段：按UTF-8截断到size字节（不截断在多字节字符中间）"""
+    return str(text or '').encode('utf-8')[:size].decode('utf-8', 'ignore').encode('utf-8')
+
+
+def encode_slot(snapshot, number, slot_size=SLOT_SIZE):
+    """把快照编码为槽的内容（顺序锁计数由写入方设置），放不下的尾部条目被丢弃，返回 (字节, 写入的条目数)"""
+    items = snapshot['items']
+    count = len(items)
+    strings = []
+    for item in items:
+        strings.append(str(item.get('title') or '').encode('utf-8'))
+        strings.append(str(item.get('description') or '').encode('utf-8'))
+    # 固定部分每条 8(热度)+8(两个偏移)+2(排名) 字节，再加一个结尾偏移
+    while count and SLOT_HEADER.size + 18 * count + 4 + sum(len(s) for s in strings[:2 * count]) > slot_size:
+        count -= 1
+    if count < len(items):
+        logger.warning(f"快照 {snapshot.get('id')} 超出共享内存槽大小，只缓存前 {count} 条")
+    offsets, position = [0], 0
+    for data in strings[:2 * count]:
+        position += len(data)
+        offsets.append(position)
+    head = SLOT_HEADER.pack(0, number, count, 0, _fixed(snapshot.get('crawl_time'), 20),
+                            _fixed(snapshot.get('source', 'baidu'), 16), _fixed(snapshot.get('id'), 48))
+    body = b''.join((
+        struct.pack(f'<{count}q', *(_to_int(item.get('hot_index')) for item in items[:count])),
+        struct.pack(f'<{2 * count + 1}I', *offsets),
+        struct.pack(f'<{count}h', *(_to_int(item.get('rank'), 0) for item in items[:count])),
+    ))
+    return head + body + b''.join(strings[:2 * count]), count
+
+
+class SlotView:
+    """
+    一个槽的零拷贝视图：hot、ranks 是直接指向共享内存的memoryview，标题和简介按需解码
+
+    写入方可能随时覆盖这个槽（在发布了“槽数”个新快照之后），读取结束后调用 stable() 确认期间没有被覆盖，
+    否则结果需要丢弃重读；一般通过 SnapshotCache.read() 使用，它会自动重试。
+    """
+
+    def __init__(self, buf, offset):
+        self._buf = buf
+        self._offset = offset
+        (self.seq, self.number, self.count, _, crawl_time, source,
+         snapshot_id) = SLOT_HEADER.unpack_from(buf, offset)
+        self.crawl_time = crawl_time.rstrip(b'\0').decode('utf-8', 'ignore')
+        self.source = source.rstrip(b'\0').decode('utf-8', 'ignore')
+        self.id = snapshot_id.rstrip(b'\0').decode('utf-8', 'ignore')
+        n = self.count
+        if SLOT_HEADER.size + 18 * n + 4 > len(buf) - offset:
+            n = self.count = 0  # 读到了写入中的槽头，stable() 会返回False
+        start = offset + SLOT_HEADER.size
+        self.hot = buf[start:start + 8 * n].cast('q')
+        start += 8 * n
+        self._offsets = buf[start:start + 4 * (2 * n + 1)].cast('I')
+        start += 4 * (2 * n + 1)
+        self.ranks = buf[start:start + 2 * n].cast('h')
+        self._strings = start + 2 * n
+
+    def stable(self):
+        """读取期间槽没有被写入（顺序锁计数不变且为偶数）"""
+        return self.seq % 2 == 0 and _load_word(self._buf, self._offset) == self.seq
+
+    def _string(self, index):
+        start, end = self._offsets[index], self._offsets[index + 1]
+        if end < start or self._strings + end > len(self._buf):
+            return ''
+        return bytes(self._buf[self._strings + start:self._strings + end]).decode('utf-8', 'replace')
+
+    def title(self, i):
+        return self._string(2 * i)
+
+    def description(self, i):
+        return self._string(2 * i + 1)
+
+    def items(self):
+        """解码为与爬虫输出相同的字典列表"""
+        return [{'rank': self.ranks[i], 'title': self.title(i), 'description': self.description(i),
+                 'hot_index': '' if self.hot[i] == MISSING_HOT else str(self.hot[i])}
+                for i in range(self.count)]
+
+    def snapshot(self):
+        return {'id': self.id, 'source': self.source, 'crawl_time': self.crawl_time, 'items': self.items()}
+
+    def release(self):
+        """释放指向共享内存的memoryview（共享内存段关闭前必须释放）"""
+        for view in (self.hot, self._offsets, self.ranks):
+            view.release()
+
+
+class SnapshotCache:
+    """
+    共享内存中的最近快照缓存：写入钩子把新快照发布到环形的定长槽中，同一主机上的其他进程
+    （看板、告警、导出等）直接读取，不需要各自读取存储文件和解析JSON
+
+    每个槽有自己的顺序锁计数：写入方先把计数加一（变为奇数），写入内容后再加一；读取方读取前后计数相同且为偶数时，
+    读到的内容是完整的，否则重读。读取方不加锁，也不会阻塞写入方。写入方之间用文件锁互斥（同一主机可能有多个爬虫进程）。
+    """
+
+    def __init__(self, shm, writer=False):
+        self.shm = shm
+        self.writer = writer
+        self.buf = shm.buf
+        magic, version, self.slots, self.slot_size, _ = HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC or version != LAYOUT_VERSION:
+            raise ValueError(f"共享内存段 {shm.name} 不是快照缓存或布局版本不兼容")
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, source='baidu', slots=SLOTS, slot_size=SLOT_SIZE, store_path=None):
+        """写入方：打开已有的段（布局相同时），否则创建新段；store_path 为快照所属的存储目录"""
+        from multiprocessing import shared_memory
+        name = segment_name(source, store_path)
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+            _untrack(shm)
+            cache = cls(shm, writer=True)
+            if cache.slots == slots and cache.slot_size == slot_size:
+                return cache
+            logger.info(f"共享内存段 {name} 的布局已改变，重新创建")
+            cache.close(unlink=True)
+        except (FileNotFoundError, ValueError):
+            pass
+        shm = shared_memory.SharedMemory(name=name, create=True, size=HEADER_SIZE + slots * slot_size)
+        _untrack(shm)
+        HEADER.pack_into(shm.buf, 0, MAGIC, LAYOUT_VERSION, slots, slot_size, 0)
+        return cls(shm, writer=True)
+
+    @classmethod
+    def attach(cls, source='baidu', store_path=None):
+        """读取方：连接已有的段，段不存在时抛出FileNotFoundError"""
+        from multiprocessing import shared_memory
+        shm = shared_memory.SharedMemory(name=segment_name(source, store_path))
+        _untrack(shm)
+        return cls(shm)
+
+    @property
+    def count(self):
+        """已发布的快照数，也是最新快照的序号"""
+        return _load_word(self.buf, COUNT_OFFSET)
+
+    def _slot_offset(self, number):
+        return HEADER_SIZE + ((number - 1) % self.slots) * self.slot_size
+
+    def publish(self, snapshot):
+        """发布一个快照到下一个槽（覆盖最旧的快照）"""
+        try:
+            import fcntl
+        except ImportError:
+            fcntl = None    # Windows：只在进程内互斥
+        with self._lock, open(_lock_path(self.shm.name), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            number = self.count + 1
+            data, _ = encode_slot(snapshot, number, self.slot_size)
+            offset = self._slot_offset(number)
+            seq = _load_word(self.buf, offset)
+            _store_word(self.buf, offset, seq + 1)      # 奇数：写入中
+            self.buf[offset + 8:offset + len(data)] = data[8:]
+            _store_word(self.buf, offset, seq + 2)      # 偶数：写入完成
+            _store_word(self.buf, COUNT_OFFSET, number)
+        return number
+
+    def read(self, func, age=0):
+        """
+        在第age新的快照上执行 func(SlotView)，保证func看到的是一致的内容，返回其结果
+
+        func 在共享内存上直接读取，不应长期持有视图中的memoryview。快照不存在时返回None。
+        """
+        for _ in range(READ_RETRIES):
+            number = self.count - age
+            if number <= 0 or age >= self.slots:
+                return None
+            view = SlotView(self.buf, self._slot_offset(number))
+            try:
+                if view.seq % 2 == 0 and view.number == number:
+                    result = func(view)
+                    if view.stable():
+                        return result
+                elif view.seq % 2 == 0 and view.stable():
+                    continue    # 读取序号后槽已被覆盖为更新的快照，按新的序号重读
+            except (ValueError, IndexError, UnicodeDecodeError):
+                pass            # 读到了写入中的内容，重读
+            finally:
+                view.release()
+            time.sleep(0)
+        raise TimeoutError("共享内存槽持续在写入中")
+
+    def latest(self):
+        """最新的快照（字典，结构与存储中的快照相同），没有时返回None"""
+        return self.read(SlotView.snapshot)
+
+    def recent(self, n=None):
+        """最近的n个快照，最新的在前"""
+        snapshots = []
+        for age in range(min(n or self.slots, self.slots)):
+            snapshot = self.read(SlotView.snapshot, age)
+            if snapshot is None:
+                break
+            snapshots.append(snapshot)
+        return snapshots
+
+    def warm(self, store, source='baidu'):
+        """用存储中最近的快照填充缓存（按时间顺序发布），返回发布的快照数"""
+        snapshots = sorted(store.iter_snapshots(source), key=lambda s: s['crawl_time'])[-self.slots:]
+        for snapshot in snapshots:
+            self.publish(snapshot)
+        return len(snapshots)
+
+    def close(self, unlink=False):
+        self.buf = None
+        self.shm.close()
+        if unlink:
+            # 创建和连接时取消了跟踪，unlink()会再取消一次，先重新登记以免resource_tracker报错
+            try:
+                from multiprocessing import resource_tracker
+                resource_tracker.register(self.shm._name, 'shared_memory')
+            except Exception:
+                pass
+            self.shm.unlink()
+
+
+_writers = {}   # 段名 -> 写入方
+
+
+def get_writer(source='baidu', store_path=None):
+    name = segment_name(source, store_path)
+    cache = _writers.get(name)
+    if cache is None:
+        cache = _writers[name] = SnapshotCache.create(source, store_path=store_path)
+    return cache
+
+
+def on_snapshot(snapshot):
+    """快照写入钩子：把新快照发布到它所属存储的共享内存段"""
+    from snapshot_store import ingest_store
+    store = ingest_store()
+    get_writer(snapshot.get('source', 'baidu'), store.path if store is not None else None).publish(snapshot)
+
+
+def unlink(source='baidu', store_path=None):
+    """删除一个数据源的共享内存段和锁文件，返回段是否存在"""
+    name = segment_name(source, store_path)
+    writer = _writers.pop(name, None)
+    try:
+        if writer is not None:
+            writer.close(unlink=True)
+        else:
+            SnapshotCache.attach(source, store_path).close(unlink=True)
+        existed = True
+    except FileNotFoundError:
+        existed = False
+    try:
+        os.remove(_lock_path(name))
+    except OSError:
+        pass
+    return existed
+
+
+def _bench(source, store, rounds):
+    """比较从共享内存读取最新快照与从存储读取并解析的耗时"""
+    cache = SnapshotCache.attach(source, store)
+    timings = {}
+    started = time.perf_counter()
+    for _ in range(rounds):
+        cache.latest()
+    timings['共享内存 latest()'] = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(rounds):
+        cache.read(lambda view: max(view.hot, default=None))
+    timings['共享内存 零拷贝读取热度'] = time.perf_counter() - started
+    from snapshot_store import SnapshotStore
+    started = time.perf_counter()
+    for _ in range(max(1, rounds // 100)):
+        SnapshotStore(store).latest(source)
+    timings['打开存储并读取最新快照'] = (time.perf_counter() - started) * rounds / max(1, rounds // 100)
+    for name, seconds in timings.items():
+        print(f"{name:<20} {seconds / rounds * 1e6:10.1f} us/次")
+    cache.close()
+
+
+def main(argv=None):
+    """命令行入口：填充、查看、清除共享内存快照缓存"""
+    parser = argparse.ArgumentParser(description="共享内存快照缓存")
+    parser.add_argument('command', choices=['warm', 'show', 'bench', 'unlink'])
+    parser.add_argument('--source', default='baidu')
+    parser.add_argument('--store', default=None, help="快照存储目录")
+    parser.add_argument('--history', type=int, default=1, help="show: 显示最近的快照数")
+    parser.add_argument('--rounds', type=int, default=10000, help="bench: 读取次数")
+    args = parser.parse_args(argv)
+
+    if args.command == 'warm':
+        from snapshot_store import SnapshotStore
+        cache = SnapshotCache.create(args.source, store_path=args.store)
+        count = cache.warm(SnapshotStore(args.store), args.source)
+        print(f"已发布 {count} 个快照到共享内存段 {segment_name(args.source, args.store)}")
+        cache.close()
+        return 0
+    if args.command == 'unlink':
+        name = segment_name(args.source, args.store)
+        if not unlink(args.source, args.store):
+            print(f"共享内存段 {name} 不存在")
+            return 1
+        print(f"已删除共享内存段 {name}")
+        return 0
+    try:
+        if args.command == 'bench':
+            _bench(args.source, args.store, args.rounds)
+            return 0
+        cache = SnapshotCache.attach(args.source, args.store)
+    except FileNotFoundError:
+        print(f"共享内存段 {segment_name(args.source, args.store)} 不存在（爬取一次或运行 warm 创建）")
+        return 1
+    print(f"共享内存段 {segment_name(args.source, args.store)}: {cache.slots} 个槽，已发布 {cache.count} 个快照")
+    for snapshot in cache.recent(args.history):
+        print(f"\n{snapshot['id']}  {snapshot['crawl_time']}  {len(snapshot['items'])} 条")
+        for item in snapshot['items'][:10]:
+            print(f"  {item['rank']:>3}. {item['title']}  {item['hot_index']}")
+    cache.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+import os
+import sys
+import json
+import argparse
+from datetime import datetime
+from spider_logging import get_logger, setup_logging
+
+logger = get_logger('quality')
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 低于该分数的快照被隔离，不写入存储（可通过环境变量调整）
+MIN_SCORE = float(os.environ.get('BAIDU_HOT_MIN_QUALITY', '0.6'))
+
+# 实时榜默认取前20条，少于MIN_ITEMS条直接拒绝
+EXPECTED_ITEMS = 20
+MIN_ITEMS = 5
+
+# 与上一次快照的标题重合度达到该值即视为正常；相隔超过SIMILARITY_WINDOW秒的快照不做比较
+EXPECTED_OVERLAP = 0.3
+SIMILARITY_WINDOW = 6 * 3600
+
+WEIGHTS = {
+    'count': 0.25,
+    'junk': 0.25,
+    'hot_index': 0.2,
+    'description': 0.1,
+    'similarity': 0.1,
+    'duplicates': 0.1,
+}
+
+
+class QualityReport:
+    """快照质量评估结果：各项得分（0~1）、加权总分、直接拒绝的原因"""
+
+    __slots__ = ('checks', 'score', 'rejections')
+
+    def __init__(self, checks, rejections):
+        self.checks = checks
+        self.rejections = rejections
+        self.score = 0.0 if rejections else round(sum(WEIGHTS[name] * value for name, value in checks.items()), 3)
+
+    @property
+    def accepted(self):
+        return not self.rejections and self.score >= MIN_SCORE
+
+    def to_dict(self):
+        return {'score': self.score, 'checks': self.checks, 'rejections': self.rejections}
+
+    def __str__(self):
+        details = ", ".join(f"{name}={value:.2f}" for name, value in self.checks.items())
+        reasons = f"；拒绝原因: {'; '.join(self.rejections)}" if self.rejections else ""
+        return f"质量分 {self.score:.2f}（{details}）{reasons}"
+
+
+def _hot_values(items):
+    values = []
+    for item in items:
+        try:
+            values.append(int(item.get('hot_index')))
+        except (TypeError, ValueError):
+            values.append(None)
+    return values
+
+
+def _hot_index_score(items):
+    """热搜指数应为数字，且按排名单调不增（允许个别置顶条目例外）"""
+    values = _hot_values(items)
+    numeric = [v for v in values if v is not None]
+    if not numeric:
+        return 0.0
+    pairs = list(zip(numeric, numeric[1:]))
+    violations = sum(1 for a, b in pairs if b > a)
+    monotonic = 1.0 if violations <= 1 else 1 - violations / len(pairs)
+    return len(numeric) / len(values) * monotonic
+
+
+def _overlap(previous, items):
+    prev_titles = {item['title'] for item in previous}
+    titles = {item['title'] for item in items}
+    return len(prev_titles & titles) / len(prev_titles | titles) if titles or prev_titles else 1.0
+
+
+def assess(items, previous=None, crawl_time=None):
+    """
+    在写入存储之前给一次爬取结果打分
+
+    previous 为同一数据源上一次写入的快照（记录字典），用于检查标题重合度。
+    """
+    from hot_parser import is_junk_item
+
+    rejections = []
+    count = len(items)
+    if any(item.get('mock') for item in items):
+        rejections.append("包含模拟数据")
+    if count < MIN_ITEMS:
+        rejections.append(f"条目过少（{count} 条）")
+
+    junk = sum(1 for item in items if is_junk_item(item))
+    if count and junk / count > 0.5:
+        rejections.append(f"兜底策略产生的垃圾条目过多（{junk}/{count}）")
+
+    checks = {
+        'count': min(1.0, count / EXPECTED_ITEMS),
+        'junk': 1 - junk / count if count else 0.0,
+        'hot_index': _hot_index_score(items) if count else 0.0,
+        'description': sum(1 for item in items if item.get('description')) / count if count else 0.0,
+        'similarity': 1.0,
+        'duplicates': len({item.get('title') for item in items}) / count if count else 0.0,
+    }
+    if previous and previous.get('items') and count:
+        elapsed = None
+        if crawl_time and previous.get('crawl_time'):
+            elapsed = (datetime.strptime(crawl_time, TIME_FORMAT)
+                       - datetime.strptime(previous['crawl_time'], TIME_FORMAT)).total_seconds()
+        if elapsed is None or abs(elapsed) <= SIMILARITY_WINDOW:
+            checks['similarity'] = min(1.0, _overlap(previous['items'], items) / EXPECTED_OVERLAP)
+    checks = {name: round(value, 3) for name, value in checks.items()}
+    return QualityReport(checks, rejections)
+
+
+def quarantine(store, items, report, crawl_time=None, source='baidu'):
+    """把被拒绝的快照写入存储目录下的 quarantine.jsonl，便于事后检查"""
+    record = {
+        'quarantined_at': datetime.now().strftime(TIME_FORMAT),
+        'crawl_time': crawl_time,
+        'source': source,
+        'quality': report.to_dict(),
+        'items': items,
+    }
+    with open(os.path.join(store.path, 'quarantine.jsonl'), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+    logger.warning(f"快照未通过质量检查，已隔离: {report}")
+
+
+def check_before_save(store, items, crawl_time=None, source='baidu'):
+    """save_snapshot 调用的质量关卡：通过时返回True，否则隔离并返回False"""
+    report = assess(items, store.latest(source), crawl_time or datetime.now().strftime(TIME_FORMAT))
+    if report.accepted:
+        logger.info(str(report), extra={'quality': report.score})
+        return True
+    quarantine(store, items, report, crawl_time, source)
+    return False
+
+
+def main(argv=None):
+    """命令行入口：给存储中已有的快照打分，列出低质量快照"""
+    parser = argparse.ArgumentParser(description="快照质量审计")
+    parser.add_argument('--store', default=None, help="快照存储目录")
+    parser.add_argument('--source', default='baidu')
+    args = parser.parse_args(argv)
+
+    setup_logging('quality', console=False)
+    from snapshot_store import SnapshotStore
+    previous = None
+    total = rejected = 0
+    for snapshot in sorted(SnapshotStore(args.store).iter_snapshots(args.source), key=lambda s: s['crawl_time']):
+        report = assess(snapshot['items'], previous, snapshot['crawl_time'])
+        total += 1
+        if not report.accepted:
+            rejected += 1
+            print(f"{snapshot['crawl_time']}  {snapshot['id']}  {report}")
+        else:
+            previous = snapshot
+    print(f"共 {total} 条快照，{rejected} 条低于质量阈值 {MIN_SCORE}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
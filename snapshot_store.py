@@ -0,0 +1,257 @@
+import os
+import sys
+import json
+import hashlib
+import threading
+from datetime import datetime
+from spider_logging import get_logger
+from run_profiler import profiled
+from file_lock import file_lock
+
+logger = get_logger('store')
+
+# 快照存储目录，可通过环境变量覆盖
+STORE_DIR = os.environ.get('BAIDU_HOT_STORE_DIR', 'hot_store')
+
+# 是否继续同时追加到旧的Excel历史文件（设置 BAIDU_HOT_EXCEL=0 关闭）
+LEGACY_EXCEL = os.environ.get('BAIDU_HOT_EXCEL', '1') != '0'
+
+
+def content_hash(items):
+    """计算热搜列表内容的哈希（与字典键顺序无关）"""
+    canonical = json.dumps(items, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+
+def make_snapshot_id(crawl_time, source='baidu'):
+    """快照ID只由数据源和爬取时间决定，同一时刻的快照重复写入时ID相同"""
+    return hashlib.sha1(f"{source}|{crawl_time}".encode('utf-8')).hexdigest()[:16]
+
+
+class SnapshotStore:
+    """
+    追加写入的快照存储（JSON Lines）
+
+    每行一条快照：{"id", "hash", "source", "crawl_time", "items"}。
+    同一ID的后写记录覆盖先写记录，因此修正历史数据时只需追加，不需要改写文件。
+    多个进程（多节点、调度器与回填）可以共享同一存储，追加时用 snapshots.jsonl.lock 互斥。
+    """
+
+    def __init__(self, path=None):
+        self.path = path or STORE_DIR
+        os.makedirs(self.path, exist_ok=True)
+        self.filename = os.path.join(self.path, 'snapshots.jsonl')
+        self.lock_file = self.filename + '.lock'
+        self._lock = threading.Lock()
+        self._index = None  # id -> (文件偏移, 内容哈希)
+        self._indexed_size = 0
+        self._latest = {}   # source -> 最后写入的快照偏移
+
+    def _load_index(self):
+        """载入索引；文件被其他进程追加后只读取新增的部分（多节点共享同一存储时）"""
+        try:
+            size = os.path.getsize(self.filename)
+        except OSError:
+            size = 0
+        if self._index is not None and size <= self._indexed_size:
+            return self._index
+        index = self._index if self._index is not None else {}
+        if size:
+            with open(self.filename, 'rb') as f:
+                f.seek(self._indexed_size)
+                offset = self._indexed_size
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break  # 其他进程尚未写完的行，下次再读
+                    try:
+                        record = json.loads(line)
+                        index[record['id']] = (offset, record['hash'])
+                        self._latest[record.get('source', 'baidu')] = offset
+                    except (ValueError, KeyError):
+                        logger.warning(f"跳过损坏的快照记录，偏移: {offset}")
+                    offset += len(line)
+                self._indexed_size = offset
+        self._index = index
+        return index
+
+    def __contains__(self, snapshot_id):
+        return snapshot_id in self._load_index()
+
+    def __len__(self):
+        return len(self._load_index())
+
+    def append(self, items, crawl_time=None, source='baidu', snapshot_id=None, replace=False):
+        """
+        追加一条快照，返回写入的记录；ID已存在且内容相同（或replace=False）时返回None
+
+        replace=True 用于回填修正：同一ID内容不同时追加新版本覆盖旧版本。
+        """
+        crawl_time = crawl_time or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        snapshot_id = snapshot_id or make_snapshot_id(crawl_time, source)
+        digest = content_hash(items)
+
+        # 检查ID、追加和更新索引偏移必须在跨进程锁内完成，否则并发的写入方都会认为ID不存在而重复追加同一快照
+        with self._lock, file_lock(self.lock_file):
+            index = self._load_index()
+            existing = index.get(snapshot_id)
+            if existing and (not replace or existing[1] == digest):
+                return None
+
+            record = {
+                'id': snapshot_id,
+                'hash': digest,
+                'source': source,
+                'crawl_time': crawl_time,
+                'items': items,
+            }
+            line = (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+            with open(self.filename, 'ab') as f:
+                offset = f.tell()
+                f.write(line)
+            index[snapshot_id] = (offset, digest)
+            self._latest[source] = offset
+            if offset == self._indexed_size:
+                self._indexed_size += len(line)
+        return record
+
+    def get(self, snapshot_id):
+        """按ID读取快照的最新版本"""
+        entry = self._load_index().get(snapshot_id)
+        if not entry:
+            return None
+        with open(self.filename, 'rb') as f:
+            f.seek(entry[0])
+            return json.loads(f.readline())
+
+    def content_hash_of(self, snapshot_id):
+        """快照最新版本的内容哈希（只查索引，不读取记录），不存在时返回None"""
+        entry = self._load_index().get(snapshot_id)
+        return entry[1] if entry else None
+
+    def latest(self, source='baidu'):
+        """读取该数据源最后写入的快照"""
+        self._load_index()
+        offset = self._latest.get(source)
+        if offset is None:
+            return None
+        with open(self.filename, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def sources(self):
+        """存储中出现过的数据源"""
+        self._load_index()
+        return list(self._latest)
+
+    def iter_snapshots(self, source=None):
+        """按写入顺序逐条产出快照（被覆盖的旧版本自动跳过），不会一次性载入整个文件"""
+        index = self._load_index()
+        if not os.path.exists(self.filename):
+            return
+        with open(self.filename, 'rb') as f:
+            offset = 0
+            for line in f:
+                line_offset = offset
+                offset += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if index.get(record.get('id'), (None,))[0] != line_offset:
+                    continue
+                if source and record.get('source') != source:
+                    continue
+                yield record
+
+
+# 快照写入后依次调用的钩子（"模块:函数"形式，首次使用时才导入，避免拖慢爬虫启动）
+INGEST_HOOKS = [
+    'hot_views:on_snapshot',
+    'search_index:on_snapshot',
+    'topic_cluster:on_snapshot',
+    'rank_matrix:on_snapshot',
+    'hot_rollups:on_snapshot',
+    'rank_events:on_snapshot',
+    'shm_cache:on_snapshot',
+]
+
+# 绕过写入钩子批量写入（迁移、回填、重新解析）之后需要重建的索引
+REBUILD_NOTICE = ("写入没有经过写入钩子，请重建各索引，例如: python search_index.py rebuild、"
+                  "python rank_matrix.py rebuild、python hot_rollups.py rebuild、python topic_cluster.py rebuild")
+
+_store = None
+_hooks = None
+# 正在执行写入钩子的存储（按线程），钩子用它找到与快照所属存储对应的资源，例如共享内存段
+_ingest = threading.local()
+
+
+def get_store():
+    """默认的快照存储实例"""
+    global _store
+    if _store is None:
+        _store = SnapshotStore()
+    return _store
+
+
+def _load_hooks():
+    global _hooks
+    if _hooks is None:
+        import importlib
+        _hooks = []
+        for spec in INGEST_HOOKS:
+            module_name, func_name = spec.split(':')
+            try:
+                _hooks.append(getattr(importlib.import_module(module_name), func_name))
+            except Exception as e:
+                logger.warning(f"加载写入钩子 {spec} 失败: {e}")
+    return _hooks
+
+
+def ingest_store():
+    """在写入钩子中调用：返回正在写入的存储；不在写入钩子中时返回None"""
+    return getattr(_ingest, 'store', None)
+
+
+def register_ingest_hook(hook):
+    """注册额外的写入钩子，hook(snapshot) 在每条新快照写入后被调用"""
+    _load_hooks().append(hook)
+
+
+@profiled('store')
+def save_snapshot(data, crawl_time=None, source='baidu', store=None, snapshot_id=None, validate=True):
+    """
+    保存一次爬取结果（替代每次载入整个工作簿的save_to_excel）
+
+    写入前先做质量检查（见 snapshot_quality），模拟数据、垃圾条目过多等低质量结果被隔离而不写入。
+    快照追加写入存储后，依次通知各写入钩子做增量更新；钩子失败只记录日志，不影响保存。
+    snapshot_id 默认由数据源和爬取时间生成；多节点模式下按调度周期生成，保证同一周期只写入一次。
+    返回写入的快照，重复或被隔离的快照返回None。
+    """
+    store = store if store is not None else get_store()
+    # 本线程刚归档的原始页面（见 page_archive.archive_page）：写入后记录它对应的快照，重新解析时覆盖的是这条快照
+    archive = sys.modules.get('page_archive')
+    fetch_id = archive.take_pending() if archive is not None else None
+    if validate:
+        from snapshot_quality import check_before_save
+        if not check_before_save(store, data, crawl_time, source):
+            return None
+    snapshot = store.append(data, crawl_time=crawl_time, source=source, snapshot_id=snapshot_id)
+    if snapshot is None:
+        logger.info("快照已存在，跳过写入")
+        return None
+    logger.info(f"快照已保存: {snapshot['id']}（{len(data)} 条）")
+    if fetch_id is not None:
+        try:
+            archive.link_snapshot(fetch_id, snapshot)
+        except OSError as e:
+            logger.warning(f"记录归档页面对应的快照失败: {e}")
+    _ingest.store = store
+    try:
+        for hook in _load_hooks():
+            try:
+                hook(snapshot)
+            except Exception as e:
+                logger.exception(f"写入钩子 {getattr(hook, '__module__', hook)} 执行失败: {e}")
+    finally:
+        _ingest.store = None
+    return snapshot
@@ -0,0 +1,182 @@
+import sys
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from spider_logging import get_logger, setup_logging
+
+logger = get_logger('engine')
+
+# 所有数据源共用的连接数上限和单次请求超时（秒）
+POOL_SIZE = 8
+TIMEOUT = 15
+RETRIES = 2
+
+
+class HttpClient:
+    """
+    所有数据源共用的HTTP客户端和连接池
+
+    安装了aiohttp时直接在事件循环中请求；否则使用一个共享连接池的requests.Session，
+    在有界线程池中执行（不会阻塞事件循环）。解析等CPU工作通过 run() 放到同一个线程池。
+    """
+
+    def __init__(self, pool_size=POOL_SIZE, timeout=TIMEOUT):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._session = None
+        self._aiohttp = None
+        self._executor = None
+
+    async def __aenter__(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix='engine')
+        try:
+            import aiohttp
+        except ImportError:
+            aiohttp = None
+        if aiohttp is not None:
+            self._aiohttp = aiohttp
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(total=self.timeout))
+        else:
+            import requests
+            from requests.adapters import HTTPAdapter
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            self._session.mount('http://', adapter)
+            self._session.mount('https://', adapter)
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._aiohttp is not None:
+            await self._session.close()
+        else:
+            self._session.close()
+        self._executor.shutdown(wait=False)
+        return False
+
+    async def run(self, func, *args):
+        """在线程池中执行阻塞或CPU密集的函数"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _get_blocking(self, url, headers):
+        response = self._session.get(url, headers=headers, timeout=self.timeout)
+        response.raise_for_status()
+        if not response.encoding or response.encoding.lower() == 'iso-8859-1':
+            response.encoding = response.apparent_encoding or 'utf-8'
+        return response.text
+
+    async def get_text(self, url, headers=None, retries=None):
+        """GET请求返回文本，失败时退避重试（等待期间不占用事件循环）"""
+        retries = RETRIES if retries is None else retries
+        for attempt in range(retries + 1):
+            try:
+                if self._aiohttp is not None:
+                    async with self._session.get(url, headers=headers) as response:
+                        response.raise_for_status()
+                        return await response.text()
+                return await self.run(self._get_blocking, url, headers)
+            except Exception as e:
+                if attempt == retries:
+                    raise
+                logger.warning(f"请求 {url} 失败（第 {attempt + 1} 次）: {e}")
+                await asyncio.sleep(1 + attempt)
+
+
+class SourceEngine:
+    """
+    多数据源并发爬取引擎：在一个事件循环中同时运行所有适配器，共用一个连接池，
+    结果按数据源写入同一个快照存储（快照的 source 字段）。
+
+    一个周期的耗时约等于最慢的数据源，而不是所有数据源之和；单个数据源失败或超时不影响其他数据源。
+    """
+
+    def __init__(self, adapters, store=None, pool_size=POOL_SIZE, timeout=TIMEOUT):
+        self.adapters = list(adapters)
+        self.store = store
+        self.pool_size = pool_size
+        self.timeout = timeout
+
+    async def _crawl_one(self, client, adapter, crawl_time, write_lock):
+        from snapshot_store import save_snapshot
+        started = time.perf_counter()
+        try:
+            # 请求重试也计入超时，避免单个数据源拖长整个周期
+            records = await asyncio.wait_for(adapter.fetch(client), self.timeout * (RETRIES + 1))
+        except Exception as e:
+            logger.error(f"数据源 {adapter.name} 爬取失败: {e}", extra={'source': adapter.name,
+                                                                     'error_type': type(e).__name__})
+            return {'source': adapter.name, 'ok': False, 'items': 0, 'error': str(e) or type(e).__name__,
+                    'ms': round((time.perf_counter() - started) * 1000)}
+        snapshot = None
+        if records:
+            # 写入存储和写入钩子是阻塞的文件操作，放到线程池中执行；
+            # 各写入钩子的索引不是线程安全的，写入按顺序进行（只有请求和解析是并发的）
+            async with write_lock:
+                snapshot = await client.run(lambda: save_snapshot(records, crawl_time=crawl_time,
+                                                                  source=adapter.name, store=self.store))
+        elapsed = round((time.perf_counter() - started) * 1000)
+        logger.info(f"数据源 {adapter.name}: {len(records)} 条，{'已写入' if snapshot else '未写入'}，{elapsed}ms",
+                    extra={'source': adapter.name, 'items': len(records), 'ms': elapsed})
+        return {'source': adapter.name, 'ok': bool(records), 'items': len(records),
+                'saved': snapshot is not None, 'ms': elapsed}
+
+    async def run_once(self, crawl_time=None):
+        """并发爬取所有数据源一次，返回每个数据源的结果"""
+        from datetime import datetime
+        # 同一周期的各数据源使用相同的爬取时间，便于按时间对齐比较
+        crawl_time = crawl_time or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        write_lock = asyncio.Lock()
+        async with HttpClient(self.pool_size, self.timeout) as client:
+            return await asyncio.gather(*(self._crawl_one(client, adapter, crawl_time, write_lock)
+                                          for adapter in self.adapters))
+
+    def crawl(self):
+        """同步入口：可直接作为调度器的爬取函数，全部数据源都失败时返回False"""
+        results = asyncio.run(self.run_once())
+        return any(result['ok'] for result in results)
+
+    async def run_forever(self, interval):
+        """每隔interval秒并发爬取一次（按周期起点对齐，爬取耗时不会累积到间隔上）"""
+        logger.info(f"多数据源爬取已启动: {', '.join(a.name for a in self.adapters)}，间隔 {interval} 秒")
+        while True:
+            started = time.monotonic()
+            await self.run_once()
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+
+def main(argv=None):
+    """命令行入口：并发爬取多个榜单"""
+    from board_sources import ADAPTERS, DEFAULT_SOURCES, load_adapters
+    parser = argparse.ArgumentParser(description="多数据源并发爬取")
+    parser.add_argument('--sources', default=DEFAULT_SOURCES,
+                        help=f"逗号分隔的数据源（内置: {', '.join(ADAPTERS)}；也可以是 模块:类名）")
+    parser.add_argument('--interval', type=int, default=0, help="循环爬取的间隔（秒），0表示只爬取一次")
+    parser.add_argument('--pool-size', type=int, default=POOL_SIZE, help="共用连接池的大小")
+    parser.add_argument('--store', default=None, help="快照存储目录")
+    args = parser.parse_args(argv)
+
+    setup_logging('engine')
+    store = None
+    if args.store:
+        from snapshot_store import SnapshotStore
+        store = SnapshotStore(args.store)
+    engine = SourceEngine(load_adapters(args.sources), store=store, pool_size=args.pool_size)
+    if args.interval:
+        try:
+            asyncio.run(engine.run_forever(args.interval))
+        except KeyboardInterrupt:
+            logger.info("多数据源爬取已停止")
+        return 0
+    started = time.perf_counter()
+    results = asyncio.run(engine.run_once())
+    for result in results:
+        status = '成功' if result['ok'] else f"失败: {result.get('error', '没有数据')}"
+        print(f"{result['source']:<10} {result['items']:>4} 条  {result['ms']:>6} ms  {status}")
+    print(f"共耗时 {(time.perf_counter() - started) * 1000:.0f} ms")
+    return 0 if any(result['ok'] for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
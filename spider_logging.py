@@ -0,0 +1,211 @@
+import os
+import sys
+import copy
+import json
+import time
+import queue
+import atexit
+import logging
+import logging.handlers
+import threading
+import collections
+from datetime import datetime
+
+# 日志目录，可通过环境变量覆盖
+LOG_DIR = os.environ.get('BAIDU_HOT_LOG_DIR', 'logs')
+
+# LogRecord自带的属性，格式化JSON时不作为额外字段输出
+_STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+_exc_formatter = logging.Formatter()
+
+_setup_lock = threading.Lock()
+_listener = None
+_ring_buffer = None
+_queue_handler = None
+
+
+def get_logger(name):
+    """获取项目统一命名空间下的logger（不做任何配置，配置由setup_logging完成）"""
+    return logging.getLogger(f'baidu_hot.{name}')
+
+
+class JsonFormatter(logging.Formatter):
+    """将日志记录格式化为单行JSON，extra中的字段会原样写入"""
+
+    def format(self, record):
+        event = {
+            'ts': datetime.fromtimestamp(record.created).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3],
+            'level': record.levelname,
+            'logger': record.name,
+            'pid': record.process,
+            'msg': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith('_'):
+                event[key] = value
+        if record.exc_info:
+            event['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            event['exc'] = record.exc_text  # 经过队列的记录，异常已在业务线程中渲染为文本
+        return json.dumps(event, ensure_ascii=False, default=str)
+
+
+class RingBufferHandler(logging.Handler):
+    """在内存中保留最近的N条日志事件，崩溃时可整体导出"""
+
+    def __init__(self, capacity=1000):
+        super().__init__()
+        self.buffer = collections.deque(maxlen=capacity)
+        self.setFormatter(JsonFormatter())
+
+    def emit(self, record):
+        # 只保存引用，真正的格式化推迟到导出时，避免拖慢热路径
+        self.buffer.append(record)
+
+    def dump(self, path):
+        """将缓冲区内容写入文件，返回写入的事件数"""
+        records = list(self.buffer)
+        with open(path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(self.format(record) + '\n')
+        return len(records)
+
+
+class SizeTimeRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """同时按文件大小和时间间隔滚动的日志文件处理器"""
+
+    def __init__(self, filename, max_bytes=10 * 1024 * 1024, interval=24 * 3600, backup_count=7, encoding='utf-8'):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding=encoding, delay=True)
+        self.interval = interval
+        self.rollover_at = self._next_rollover(time.time())
+
+    def _next_rollover(self, now):
+        return now + self.interval if self.interval else float('inf')
+
+    def shouldRollover(self, record):
+        if self.interval and record.created >= self.rollover_at:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self.rollover_at = self._next_rollover(time.time())
+
+
+class SamplingFilter(logging.Filter):
+    """对带有sample标记的高频日志（如"已爬取第 N 条"）按1/N采样，首条始终保留"""
+
+    def __init__(self, every=5):
+        super().__init__()
+        self.every = max(1, every)
+        self.counters = collections.Counter()
+
+    def filter(self, record):
+        key = getattr(record, 'sample', None)
+        if key is None:
+            return True
+        self.counters[key] += 1
+        return (self.counters[key] - 1) % self.every == 0
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """队列满时直接丢弃并计数，保证业务线程永远不会因日志而阻塞"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        """
+        父类的prepare会把异常堆栈拼进消息并清空exc_info，JSON中就没有exc字段；
+        这里把堆栈渲染到exc_text（traceback对象不能跨线程安全保留），消息本身保持不变
+        """
+        record = copy.copy(record)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _exc_formatter.formatException(record.exc_info)
+        record.msg = record.getMessage()
+        record.message = record.msg
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(name='spider', log_dir=None, level=logging.INFO, console=True,
+                  max_bytes=10 * 1024 * 1024, rotate_interval=24 * 3600, backup_count=7,
+                  ring_size=1000, sample_every=5, queue_size=10000):
+    """
+    初始化结构化日志子系统（重复调用无副作用）
+
+    业务线程只把记录放入内存队列，JSON文件写入和控制台输出由后台监听线程完成；
+    同时在内存中保留最近ring_size条事件，用于崩溃时导出。
+    """
+    global _listener, _ring_buffer, _queue_handler
+    with _setup_lock:
+        if _listener is not None:
+            return logging.getLogger('baidu_hot')
+
+        log_dir = log_dir or LOG_DIR
+        os.makedirs(log_dir, exist_ok=True)
+
+        handlers = []
+        file_handler = SizeTimeRotatingFileHandler(
+            os.path.join(log_dir, f'{name}.jsonl'),
+            max_bytes=max_bytes, interval=rotate_interval, backup_count=backup_count
+        )
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+
+        if console:
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s', '%H:%M:%S'))
+            handlers.append(console_handler)
+
+        log_queue = queue.Queue(maxsize=queue_size)
+        _queue_handler = NonBlockingQueueHandler(log_queue)
+        _queue_handler.addFilter(SamplingFilter(sample_every))
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+
+        # 环形缓冲不经过采样，崩溃现场保留完整细节
+        _ring_buffer = RingBufferHandler(ring_size)
+
+        root = logging.getLogger('baidu_hot')
+        root.setLevel(level)
+        root.propagate = False
+        root.addHandler(_queue_handler)
+        root.addHandler(_ring_buffer)
+
+        atexit.register(shutdown_logging)
+        return root
+
+
+def dump_ring_buffer(reason='crash', log_dir=None):
+    """将最近的日志事件导出到 crash_<reason>_<时间>.jsonl，返回文件路径（未初始化时返回None）"""
+    if _ring_buffer is None:
+        return None
+    log_dir = log_dir or LOG_DIR
+    os.makedirs(log_dir, exist_ok=True)
+    path = os.path.join(log_dir, f"crash_{reason}_{datetime.now().strftime('%Y%m%d%H%M%S')}.jsonl")
+    _ring_buffer.dump(path)
+    return path
+
+
+def shutdown_logging():
+    """停止后台监听线程并刷新剩余日志"""
+    global _listener
+    with _setup_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        _listener = None
+        logging.getLogger('baidu_hot').removeHandler(_queue_handler)
+        if _queue_handler.dropped:
+            # 监听线程已停止，直接写到标准错误
+            sys.stderr.write(f"日志队列已满，共丢弃 {_queue_handler.dropped} 条日志\n")
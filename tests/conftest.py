@@ -0,0 +1,26 @@
+import os
+import sys
+import glob
+
+import pytest
+
+# 项目模块都在仓库根目录下（没有包结构），测试直接按模块名导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 写入钩子会发布到共享内存，测试使用独立的段名，不影响本机正在使用的缓存（创建或连接缓存时读取）
+SHM_PREFIX = f'baidu_hot_test{os.getpid()}'
+os.environ['BAIDU_HOT_SHM_PREFIX'] = SHM_PREFIX
+
+
+@pytest.fixture(autouse=True)
+def isolated_cwd(tmp_path, monkeypatch):
+    """各模块的默认目录（索引、矩阵、统计等）都是相对路径，测试在临时目录中运行，写入钩子不会写到仓库里"""
+    monkeypatch.chdir(tmp_path)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    for path in glob.glob(f'/dev/shm/{SHM_PREFIX}*'):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,76 @@
+import pytest
+
+from adaptive_schedule import AdaptiveScheduler, churn
+
+
+def _board(titles):
+    return [{'rank': r, 'title': t} for r, t in enumerate(titles, 1)]
+
+
+def test_churn_identical_board_is_zero():
+    board = _board('甲乙丙丁')
+    assert churn(board, board) == 0.0
+
+
+def test_churn_all_new_topics_is_at_least_new_entry_weight():
+    assert churn(_board('甲乙丙丁'), _board('戊己庚辛')) == pytest.approx(0.6 + 0.4)
+
+
+def test_churn_combines_new_entries_and_displacement():
+    # 1个新话题（1/4）；3个共同话题各移动1位，平均位移按榜单长度归一化为 3/3/4
+    value = churn(_board('甲乙丙丁'), _board('乙甲丁戊'))
+    assert value == pytest.approx(0.6 * 1 / 4 + 0.4 * (1 + 1 + 1) / 3 / 4)
+
+
+def test_churn_without_previous_board_is_maximal():
+    assert churn(None, _board('甲')) == 1.0
+
+
+def _scheduler(now, **kwargs):
+    return AdaptiveScheduler(lambda: None, clock=lambda: now[0], sleep=None, **kwargs)
+
+
+def test_budget_delay_waits_for_oldest_crawl_in_window_to_expire():
+    now = [100000.0]
+    scheduler = _scheduler(now, hourly_budget=3, daily_budget=0)
+    for t in (0, 600, 1200):
+        scheduler._history.append(now[0] + t)
+    assert scheduler.budget_delay(now[0] + 1800) == pytest.approx(3600 - 1800)
+    assert scheduler.budget_delay(now[0] + 3600) == 0.0
+
+    scheduler._history.append(now[0] + 1800)
+    # 窗口内4次、预算3次：要等到第二早的一次也过期
+    assert scheduler.budget_delay(now[0] + 1900) == pytest.approx(600 + 3600 - 1900)
+
+
+def test_budget_delay_uses_the_tighter_window():
+    now = [100000.0]
+    scheduler = _scheduler(now, hourly_budget=100, daily_budget=2)
+    scheduler._history.extend([now[0], now[0] + 60])
+    assert scheduler.budget_delay(now[0] + 120) == pytest.approx(86400 - 120)
+
+
+def test_interval_follows_churn_and_backs_off_on_failure():
+    now = [0.0]
+    scheduler = _scheduler(now, initial_interval=600, min_interval=30, max_interval=1800)
+    scheduler.smoothed_churn = 0.5
+    scheduler._adjust(True)
+    assert scheduler.interval == 300
+    scheduler.smoothed_churn = 0.01
+    scheduler._adjust(True)
+    assert scheduler.interval == 450
+    scheduler._adjust(False)
+    assert scheduler.interval == 900
+    for _ in range(5):
+        scheduler._adjust(False)
+    assert scheduler.interval == 1800
+
+
+def test_observe_compares_with_the_compact_previous_board():
+    now = [0.0]
+    scheduler = _scheduler(now)
+    scheduler.observe({'items': _board('甲乙丙丁')})
+    assert scheduler.smoothed_churn is None
+    scheduler.observe({'items': _board('乙甲丙戊')})
+    assert scheduler.smoothed_churn == pytest.approx(churn(_board('甲乙丙丁'), _board('乙甲丙戊')))
+    assert len(scheduler._boards) == 1
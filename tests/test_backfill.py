@@ -0,0 +1,32 @@
+import os
+
+from backfill import iter_archive_tasks, run_backfill
+from hot_parser import parse_hot_page, normalize_items
+from page_archive import PageArchive
+from snapshot_store import SnapshotStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_archive_backfill_corrects_the_original_snapshot_and_is_idempotent(tmp_path):
+    with open(os.path.join(ROOT, 'backup_page.html'), encoding='utf-8') as f:
+        page = f.read()
+    archive = PageArchive(str(tmp_path / 'archive'))
+    store = SnapshotStore(str(tmp_path / 'store'))
+    archive.put(page, 'http://board', fetched_at='2025-11-01 08:00:00', fetch_id='f1')
+    # 当时的解析器产生了垃圾条目，快照在抓取几秒后写入
+    original = store.append([{'rank': 1, 'title': '无标题1', 'description': '', 'hot_index': ''}],
+                            crawl_time='2025-11-01 08:00:09')
+    archive.link('f1', original)
+
+    def backfill():
+        return run_backfill(iter_archive_tasks(archive, store), store, 'job', archive_path=archive.path, workers=1)
+
+    first = backfill()
+    assert (first['written'], first['unchanged']) == (1, 0)
+    assert len(store) == 1
+    assert store.get(original['id'])['items'] == normalize_items(parse_hot_page(page))
+
+    second = backfill()
+    assert (second['written'], second['unchanged']) == (0, 1)
+    assert len(store) == 1
@@ -0,0 +1,33 @@
+from compact_snapshot import SnapshotHistory
+
+
+def _record(n, titles, ranks=None):
+    return {'id': f's{n}', 'source': 'baidu', 'crawl_time': f'2025-11-01 08:{n:02d}:00',
+            'items': [{'rank': rank, 'title': title, 'description': f'{title}的简介',
+                       'hot_index': '' if i == 1 else str(1000 - i)}
+                      for i, (rank, title) in enumerate(zip(ranks or range(1, len(titles) + 1), titles))]}
+
+
+def test_round_trip_matches_crawler_output():
+    record = _record(1, ['甲', '乙', '丙'])
+    snapshot = SnapshotHistory().append(record)
+    assert snapshot.to_items() == record['items']
+    assert snapshot.ranks is None  # 连续排名不单独保存
+    assert snapshot.hot_indices().tolist() == [1000, -1, 998]
+
+
+def test_titles_are_shared_across_snapshots():
+    history = SnapshotHistory()
+    first = history.append(_record(1, ['甲', '乙', '丙']))
+    second = history.append(_record(2, ['丙', '甲', '丁']))
+    assert len(history.tables[0]) == 4
+    assert second.title_id_view()[1] == first.title_id_view()[0]
+
+
+def test_gapped_ranks_are_kept_and_history_is_bounded():
+    history = SnapshotHistory(maxlen=2)
+    gapped = history.append(_record(1, ['甲', '乙'], ranks=[1, 3]))
+    assert [item.rank for item in gapped] == [1, 3]
+    history.append(_record(2, ['甲']))
+    history.append(_record(3, ['乙']))
+    assert [s.id for s in history] == ['s2', 's3']
@@ -0,0 +1,111 @@
+import os
+import threading
+
+import pytest
+
+import page_archive
+from crawl_pipeline import Pipeline, fetch_chunks, collect_sink, store_sink
+from snapshot_store import SnapshotStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeResponse:
+    def __init__(self, body, chunk_size, gate=None, fail_at=None):
+        self.body = body
+        self.chunk_size = chunk_size
+        self.gate = gate          # 读到页面后半部分时等待，模拟慢速下载
+        self.fail_at = fail_at    # 读到该位置时连接中断
+        self.sent = 0
+        self.closed = False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), self.chunk_size):
+            if self.gate is not None and start >= len(self.body) // 2:
+                self.gate.wait(5)
+            if self.fail_at is not None and start >= self.fail_at:
+                raise ConnectionError('连接被重置')
+            self.sent = start + self.chunk_size
+            yield self.body[start:start + self.chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    def __init__(self, body, chunk_size=4096, **kwargs):
+        self.response = FakeResponse(body, chunk_size, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.response
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    archive = page_archive.PageArchive(str(tmp_path / 'archive'))
+    monkeypatch.setattr(page_archive, '_default_archive', archive)
+    return archive
+
+
+@pytest.fixture
+def board_body():
+    with open(os.path.join(ROOT, 'backup_page.html'), 'rb') as f:
+        return f.read()
+
+
+def _wait_for_drains():
+    for thread in threading.enumerate():
+        if thread.name == 'pipeline-drain':
+            thread.join(5)
+
+
+def test_early_stop_archives_the_complete_page_in_the_background(archive, board_body):
+    gate = threading.Event()
+    session = FakeSession(board_body, gate=gate)
+    pipeline = Pipeline(sink=collect_sink).replace('fetch', lambda: fetch_chunks('http://board', session=session))
+    items, _ = pipeline.run()
+
+    # 取满20条后立即返回，不等待剩余内容，也还没有归档被截断的前缀
+    assert len(items) == 20
+    assert session.response.sent < len(board_body)
+    assert archive.object_count() == 0
+
+    gate.set()
+    _wait_for_drains()
+    assert session.response.closed
+    assert archive.load(archive.recent_digests(1)[0]) == board_body.decode('utf-8')
+
+
+def test_archived_page_does_not_depend_on_chunk_boundaries(archive, board_body):
+    for chunk_size in (1024, 4096, 7777):
+        session = FakeSession(board_body, chunk_size=chunk_size)
+        Pipeline(sink=collect_sink).replace('fetch', lambda: fetch_chunks('http://board', session=session)).run()
+        _wait_for_drains()
+    assert archive.object_count() == 1
+
+
+def test_interrupted_download_is_not_archived(archive, board_body):
+    session = FakeSession(board_body, fail_at=len(board_body) // 2)
+    Pipeline(sink=collect_sink).replace('fetch', lambda: fetch_chunks('http://board', session=session)).run()
+    _wait_for_drains()
+    assert session.response.closed
+    assert archive.object_count() == 0
+
+
+def test_streamed_fetch_is_linked_to_its_snapshot(archive, board_body, tmp_path):
+    store = SnapshotStore(str(tmp_path / 'store'))
+    session = FakeSession(board_body)
+    pipeline = Pipeline(sink=lambda items: store_sink(items, store=store))
+    snapshot, _ = pipeline.replace('fetch', lambda: fetch_chunks('http://board', session=session)).run()
+    _wait_for_drains()
+    [(entry, snapshot_id, crawl_time, _)] = list(archive.iter_fetches(store))
+    assert (snapshot_id, crawl_time) == (snapshot['id'], snapshot['crawl_time'])
+
+
+def test_archive_can_be_disabled(archive):
+    session = FakeSession('<html>没有热搜</html>'.encode('utf-8'))
+    list(fetch_chunks('http://board', session=session, archive=False))
+    assert archive.object_count() == 0
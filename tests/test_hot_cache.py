@@ -0,0 +1,56 @@
+import os
+import time
+
+from hot_cache import HotCache
+
+
+def _cache(tmp_path, fetcher, **kwargs):
+    return HotCache(fetcher, cache_dir=str(tmp_path), **kwargs)
+
+
+def test_fresh_local_hit_does_not_fetch(tmp_path):
+    calls = []
+    cache = _cache(tmp_path, lambda: calls.append(1) or [{'title': 'a'}])
+    assert cache.get() == [{'title': 'a'}]
+    assert cache.get() == [{'title': 'a'}]
+    assert len(calls) == 1
+    assert cache.metrics()['hits'] == 1
+
+
+def test_stale_local_entry_yields_to_fresher_disk_entry(tmp_path):
+    first = _cache(tmp_path, lambda: [{'title': 'old'}], ttl=60)
+    assert first.get() == [{'title': 'old'}]
+    # 本进程的结果已过期（在stale窗口内）
+    first._entry = (time.time() - 120, first._entry[1])
+
+    # 另一个进程刚写入了更新的结果
+    other = _cache(tmp_path, lambda: [{'title': 'new'}], ttl=60)
+    other.invalidate()
+    other._refresh(other._start_refresh(background=False)[0])
+    os.utime(other.disk_path, (time.time() + 1, time.time() + 1))
+
+    assert first.get() == [{'title': 'new'}]
+    assert first.metrics()['disk_hits'] == 1
+    assert first.metrics()['refreshes'] == 1  # 没有再发起上游抓取
+
+
+def test_unchanged_disk_file_is_not_reloaded(tmp_path, monkeypatch):
+    cache = _cache(tmp_path, lambda: [{'title': 'a'}], ttl=60)
+    cache.get()
+    loads = []
+    original = cache._load_disk
+    monkeypatch.setattr(cache, '_load_disk', lambda: loads.append(1) or original())
+    cache._entry = (time.time() - 120, cache._entry[1])
+    cache._inflight = object()  # 挡住后台刷新，只观察磁盘读取
+    cache.get()
+    cache.get()
+    assert loads == []
+
+
+def test_invalidated_cache_falls_back_to_disk(tmp_path):
+    calls = []
+    cache = _cache(tmp_path, lambda: calls.append(1) or [{'title': 'a'}])
+    cache.get()
+    cache.invalidate()
+    assert cache.get() == [{'title': 'a'}]
+    assert len(calls) == 1
@@ -0,0 +1,94 @@
+import os
+import random
+from datetime import datetime, timedelta
+
+import hot_rollups
+from hot_rollups import CountMinSketch, Rollups, SNAPSHOTS
+
+
+def _snapshots(count, start=datetime(2025, 11, 1, 8, 0, 0)):
+    rng = random.Random(7)
+    pool = [f"话题{i}" for i in range(60)]
+    snapshots = []
+    for n in range(count):
+        titles = rng.sample(pool, 20)
+        snapshots.append({
+            'id': f's{n}',
+            'crawl_time': (start + timedelta(minutes=10 * n)).strftime("%Y-%m-%d %H:%M:%S"),
+            'items': [{'rank': r, 'title': t, 'description': '', 'hot_index': str(1000 * (21 - r))}
+                      for r, t in enumerate(titles, 1)],
+        })
+    return snapshots
+
+
+def _report(rollups):
+    return (rollups.hours, rollups.days, rollups.hour_of_day, rollups.dwell, rollups.heavy, rollups.last,
+            rollups.sketch.counters.tobytes())
+
+
+class FakeStore:
+    def __init__(self, snapshots):
+        self.snapshots = snapshots
+
+    def iter_snapshots(self, source=None):
+        return iter(self.snapshots)
+
+
+def test_count_min_sketch_never_underestimates():
+    sketch = CountMinSketch(depth=3, width=64)
+    rng = random.Random(1)
+    truth = {}
+    for _ in range(2000):
+        key = f"k{int(rng.paretovariate(1.2)) % 300}"
+        truth[key] = truth.get(key, 0) + 1
+        sketch.add(key)
+    assert all(sketch.estimate(key) >= count for key, count in truth.items())
+    # 高频键的估计误差远小于总数
+    top = max(truth, key=truth.get)
+    assert sketch.estimate(top) - truth[top] < 2000 * 0.1
+
+
+def test_ingest_appends_without_rewriting_state(tmp_path):
+    rollups = Rollups(str(tmp_path))
+    for snapshot in _snapshots(30):
+        rollups.ingest(snapshot)
+    assert not os.path.exists(rollups.filename)  # 没有达到合并阈值，只追加日志
+    assert rollups.days['2025-11-01'][SNAPSHOTS] == 30
+
+    # 新实例（例如查询命令）载入时重放日志，结果与写入方相同
+    assert _report(Rollups(str(tmp_path))) == _report(rollups)
+
+
+def test_ingest_matches_rebuild_across_compactions(tmp_path):
+    snapshots = _snapshots(50)
+    rollups = Rollups(str(tmp_path / 'live'))
+    for snapshot in snapshots:
+        rollups.ingest(snapshot, compact_bytes=8 * 1024)
+    assert rollups.generation > 1
+    assert os.path.getsize(rollups.log_file) < 8 * 1024
+
+    hot_rollups.rebuild(FakeStore(snapshots), str(tmp_path / 'rebuilt'))
+    expected = _report(Rollups(str(tmp_path / 'rebuilt')))
+    assert _report(Rollups(str(tmp_path / 'live'))) == expected
+    assert rollups.top_dwell('2025-11-01')
+
+
+def test_writers_in_other_processes_are_not_lost(tmp_path):
+    snapshots = _snapshots(10)
+    first, second = Rollups(str(tmp_path)), Rollups(str(tmp_path))
+    for i, snapshot in enumerate(snapshots):
+        (first if i % 2 else second).ingest(snapshot, compact_bytes=4 * 1024)
+    assert Rollups(str(tmp_path)).days['2025-11-01'][SNAPSHOTS] == 10
+
+
+def test_interrupted_compaction_does_not_double_count(tmp_path):
+    rollups = Rollups(str(tmp_path))
+    for snapshot in _snapshots(5):
+        rollups.ingest(snapshot)
+    with open(rollups.log_file, 'rb') as f:
+        log = f.read()
+    rollups.compact()
+    # 模拟写入新状态文件后、清空日志前中断
+    with open(rollups.log_file, 'wb') as f:
+        f.write(log)
+    assert Rollups(str(tmp_path)).days['2025-11-01'][SNAPSHOTS] == 5
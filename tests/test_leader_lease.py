@@ -0,0 +1,140 @@
+import os
+import time
+import threading
+
+from leader_lease import ClusterNode, FileLeaseBackend, MemoryLeaseBackend
+from snapshot_store import SnapshotStore
+
+
+class FakeClock:
+    def __init__(self, now=1_800_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _good_board():
+    return [{'rank': i, 'title': f'正常话题{i}', 'description': f'简介{i}', 'hot_index': str(5_000_000 - i * 1000)}
+            for i in range(1, 21)]
+
+
+def _junk_board():
+    # 条目太少且没有热度和简介：会被质量检查隔离，周期内不会有快照
+    return [{'rank': 1, 'title': '登录', 'description': '', 'hot_index': ''}]
+
+
+def _counting(fetch, calls):
+    def wrapper():
+        calls.append(1)
+        return fetch()
+    return wrapper
+
+
+def _node(backend, store, fetch, clock, node_id='a'):
+    return ClusterNode(backend, {'baidu': fetch}, node_id=node_id, tick=600, heartbeat=30, store=store, clock=clock)
+
+
+def test_quarantined_tick_is_not_recrawled_on_every_heartbeat(tmp_path):
+    clock = FakeClock()
+    store = SnapshotStore(str(tmp_path / 'store'))
+    calls = []
+    node = _node(MemoryLeaseBackend(clock), store, _counting(_junk_board, calls), clock)
+    for _ in range(10):
+        node.step()
+        clock.now += 30
+    assert len(calls) == 1
+    assert os.path.exists(os.path.join(store.path, 'quarantine.jsonl'))
+    assert len(store) == 0
+
+
+def test_next_tick_is_crawled_again(tmp_path):
+    clock = FakeClock(1_800_000_000.0 - 1_800_000_000.0 % 600)
+    store = SnapshotStore(str(tmp_path / 'store'))
+    calls = []
+    node = _node(MemoryLeaseBackend(clock), store, _counting(_good_board, calls), clock)
+    assert node.step() == ['baidu']
+    clock.now += 300
+    assert node.step() == []
+    clock.now += 300
+    assert node.step() == ['baidu']
+    assert len(calls) == 2
+
+
+def test_takeover_does_not_repeat_an_attempted_tick(tmp_path):
+    clock = FakeClock(1_800_000_000.0 - 1_800_000_000.0 % 600)
+    store = SnapshotStore(str(tmp_path / 'store'))
+    backend = FileLeaseBackend(str(tmp_path / 'leases'), clock=clock)
+    calls = []
+    first = _node(backend, store, _counting(_junk_board, calls), clock, 'a')
+    second = _node(backend, store, _counting(_junk_board, calls), clock, 'b')
+    first.step()
+    assert second.step() == []          # 租约仍由a持有
+    clock.now += 120                    # a失联，租约过期，仍在同一周期
+    assert second.step() == []
+    assert second.leases['baidu'].is_leader
+    assert len(calls) == 1
+
+
+def test_lease_is_renewed_while_a_slow_fetch_runs(tmp_path):
+    clock = FakeClock(1_800_000_000.0 - 1_800_000_000.0 % 600)
+    store = SnapshotStore(str(tmp_path / 'store'))
+    backend = MemoryLeaseBackend(clock)
+    other = ClusterNode(backend, {'baidu': _good_board}, node_id='b', tick=600, heartbeat=0.01, store=store, clock=clock)
+
+    def slow_fetch():
+        # 爬取期间时间累计走过了三个多租约时长（0.03秒），其他节点也在尝试接管
+        for _ in range(5):
+            clock.now += 0.02
+            time.sleep(0.05)
+            assert other.step() == []
+        return _good_board()
+
+    node = ClusterNode(backend, {'baidu': slow_fetch}, node_id='a', tick=600, heartbeat=0.01, store=store, clock=clock)
+    assert node.step() == ['baidu']
+    assert len(store) == 1
+
+
+def test_result_is_dropped_when_the_lease_changed_hands_during_the_fetch(tmp_path):
+    clock = FakeClock(1_800_000_000.0 - 1_800_000_000.0 % 600)
+    store = SnapshotStore(str(tmp_path / 'store'))
+    backend = MemoryLeaseBackend(clock)
+
+    def fetch_while_partitioned():
+        # 续约失败期间租约被b接管又释放，a随后以新令牌重新拿回
+        backend.release('crawl-baidu', 'a')
+        assert backend.acquire('crawl-baidu', 'b', 90) is not None
+        backend.release('crawl-baidu', 'b')
+        return _good_board()
+
+    node = _node(backend, store, fetch_while_partitioned, clock)
+    assert node.step() == []
+    assert len(store) == 0
+
+
+def test_concurrent_appends_of_the_same_tick_write_once(tmp_path, monkeypatch):
+    load_index = SnapshotStore._load_index
+
+    def slow_load_index(self):
+        # 拉大检查ID和追加之间的窗口，让并发写入必然交错
+        index = load_index(self)
+        time.sleep(0.005)
+        return index
+
+    monkeypatch.setattr(SnapshotStore, '_load_index', slow_load_index)
+    path = str(tmp_path / 'store')
+    stores = [SnapshotStore(path) for _ in range(4)]
+    board = _good_board()
+
+    def write(store):
+        for slot in range(10):
+            store.append(board, crawl_time='2025-11-01 08:00:00', snapshot_id=f'tick{slot}')
+
+    threads = [threading.Thread(target=write, args=(store,)) for store in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with open(os.path.join(path, 'snapshots.jsonl'), 'rb') as f:
+        assert sum(1 for _ in f) == 10
+    assert len(SnapshotStore(path)) == 10
@@ -0,0 +1,29 @@
+import os
+import sys
+import subprocess
+
+import load_test
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_percentile_nearest_rank():
+    values = [0.1 * i for i in range(1, 11)]
+    assert load_test.percentile(values, 50) == values[4]
+    assert load_test.percentile(values, 99) == values[-1]
+    assert load_test.percentile([], 95) == 0.0
+
+
+def test_concurrent_crawl_keeps_hook_outputs_consistent(tmp_path):
+    # 压测会设置环境变量并导入爬虫模块，在子进程中运行，避免影响其他测试；不传入测试的共享内存前缀，由压测自己隔离
+    env = {k: v for k, v in os.environ.items() if k != 'BAIDU_HOT_SHM_PREFIX'}
+    shm_before = set(os.listdir('/dev/shm'))
+    completed = subprocess.run(
+        [sys.executable, 'load_test.py', '--requests', '40', '--concurrency', '8', '--latency', '0.01',
+         '--jitter', '0.01', '--workdir', str(tmp_path)],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=300)
+    assert completed.returncode == 0, completed.stdout + completed.stderr
+    assert '排名矩阵行数: 40（存储中 40 个快照，一致）' in completed.stdout
+    assert '不一致' not in completed.stdout
+    # 压测使用本次运行独有的共享内存段，结束后删除，不会写入正式的缓存
+    assert set(os.listdir('/dev/shm')) <= shm_before
@@ -0,0 +1,38 @@
+import json
+import os
+
+from migrate_history import Migration
+from snapshot_store import SnapshotStore, make_snapshot_id
+
+
+def _write_backup(directory, stamp, items):
+    path = os.path.join(directory, f'baidu_hot_backup_{stamp}.txt')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(items, f, ensure_ascii=False)
+    return path
+
+
+def _good_board():
+    return [{'rank': i, 'title': f'正常话题{i}', 'description': f'简介{i}', 'hot_index': str(5_000_000 - i * 1000)}
+            for i in range(1, 21)]
+
+
+def test_rows_failing_the_quality_checks_are_not_migrated(tmp_path):
+    test_rows = [{'rank': i, 'title': f'测试热搜标题{i}', 'description': '', 'hot_index': ''} for i in range(1, 4)]
+    paths = [
+        _write_backup(str(tmp_path), '20251108211300', test_rows),
+        _write_backup(str(tmp_path), '20251108211700', test_rows),
+        _write_backup(str(tmp_path), '20251108212000', _good_board()),
+    ]
+    store = SnapshotStore(str(tmp_path / 'store'))
+    migration = Migration(store, workers=1)
+    stats = migration.run(paths)
+
+    assert (stats['written'], stats['rejected']) == (1, 2)
+    assert len(store) == 1
+    assert make_snapshot_id('2025-11-08 21:20:00') in store
+    verified, mismatched = migration.verify()
+    assert (verified, mismatched) == (1, [])
+    with open(os.path.join(store.path, 'quarantine.jsonl'), encoding='utf-8') as f:
+        assert sorted(json.loads(line)['crawl_time'] for line in f) == ['2025-11-08 21:13:00', '2025-11-08 21:17:00']
+    assert '未通过质量检查 2 行' in migration.report(verified, mismatched)
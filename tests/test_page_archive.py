@@ -0,0 +1,151 @@
+import os
+
+import pytest
+
+from page_archive import PageArchive
+
+
+def _page(i):
+    return f"<html><body>热搜页面 {i} " + "内容 " * 50 + "</body></html>"
+
+
+def test_object_count_does_not_walk_archive(tmp_path, monkeypatch):
+    archive = PageArchive(str(tmp_path))
+    for i in range(5):
+        archive.put(_page(i), 'http://example')
+    archive.put(_page(0), 'http://example')  # 重复页面不增加对象数
+
+    def no_listdir(path):
+        raise AssertionError("object_count不应遍历目录")
+
+    monkeypatch.setattr(os, 'listdir', no_listdir)
+    assert archive.object_count() == 5
+
+
+def test_recent_digests_follow_archive_order(tmp_path):
+    archive = PageArchive(str(tmp_path))
+    digests = [archive.put(_page(i), 'http://example')[0] for i in range(30)]
+    assert archive.recent_digests(10) == digests[-10:]
+    assert archive.recent_digests(100) == digests
+
+
+def test_manifest_rebuilt_by_mtime_for_old_archives(tmp_path):
+    archive = PageArchive(str(tmp_path))
+    digests = [archive.put(_page(i), 'http://example')[0] for i in range(6)]
+    # 模拟没有清单的旧归档：对象的修改时间与哈希顺序无关
+    for age, digest in enumerate(reversed(digests)):
+        mtime = 1_700_000_000 - age * 60
+        os.utime(archive._object_path(digest), (mtime, mtime))
+    os.remove(archive.manifest_file)
+    reopened = PageArchive(str(tmp_path))
+    assert reopened.object_count() == 6
+    assert reopened.recent_digests(3) == digests[-3:]
+
+
+def test_dictionary_trained_on_most_recent_pages(tmp_path, monkeypatch):
+    pytest.importorskip('zstandard')
+    archive = PageArchive(str(tmp_path))
+    digests = [archive.put(_page(i), 'http://example')[0] for i in range(12)]
+    loaded = []
+    original_load = archive.load
+    monkeypatch.setattr(archive, 'load', lambda d: loaded.append(d) or original_load(d))
+    try:
+        archive.train_dictionary(max_samples=4)
+    except Exception:
+        pass  # 样本太少时zstd可能训练失败，这里只关心挑选的样本
+    assert loaded == digests[-4:]
+
+
+def test_concurrent_writers_keep_one_manifest_line_per_object(tmp_path, monkeypatch):
+    import time
+    import threading
+    compress = PageArchive._compress
+
+    def slow_compress(self, raw):
+        time.sleep(0.005)  # 放大“判断对象不存在”到“追加清单”之间的窗口
+        return compress(self, raw)
+
+    monkeypatch.setattr(PageArchive, '_compress', slow_compress)
+    # 每个实例代表一个写入进程（实例之间不共享进程内的锁）
+    archives = [PageArchive(str(tmp_path)) for _ in range(4)]
+
+    def worker(archive):
+        for i in range(20):
+            archive.put(_page(i), 'http://example')
+
+    threads = [threading.Thread(target=worker, args=(a,)) for a in archives]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    digests = archives[0].recent_digests(100)
+    assert len(digests) == len(set(digests)) == 20
+    assert archives[0].object_count() == 20
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def board_page():
+    with open(os.path.join(ROOT, 'backup_page.html'), encoding='utf-8') as f:
+        return f.read()
+
+
+@pytest.fixture
+def default_archive(tmp_path, monkeypatch):
+    import page_archive
+    archive = PageArchive(str(tmp_path / 'archive'))
+    monkeypatch.setattr(page_archive, '_default_archive', archive)
+    return archive
+
+
+def test_reparse_replaces_the_snapshot_saved_for_the_fetch(tmp_path, board_page, default_archive):
+    from page_archive import archive_page, reparse_archive
+    from hot_parser import parse_hot_page, normalize_items
+    from snapshot_store import SnapshotStore, save_snapshot
+
+    store = SnapshotStore(str(tmp_path / 'store'))
+    # 抓取时间与写入快照的爬取时间不同（爬虫先归档页面，稍后才保存）
+    archive_page(board_page, 'http://board', fetched_at='2025-11-01 08:00:00')
+    parsed = normalize_items(parse_hot_page(board_page))
+    saved = save_snapshot(parsed[:15], crawl_time='2025-11-01 08:00:07', store=store, validate=False)
+
+    result = reparse_archive(default_archive, store, workers=1)
+    assert result['written'] == 1
+    assert len(store) == 1
+    assert store.get(saved['id'])['items'] == parsed
+    assert store.get(saved['id'])['crawl_time'] == '2025-11-01 08:00:07'
+    # 重复运行不再写入
+    assert reparse_archive(default_archive, store, workers=1)['written'] == 0
+
+
+def test_error_pages_and_stale_fetches_are_not_linked(tmp_path, board_page, default_archive, monkeypatch):
+    import page_archive
+    from snapshot_store import SnapshotStore, save_snapshot
+
+    store = SnapshotStore(str(tmp_path / 'store'))
+    items = [{'rank': 1, 'title': '话题', 'description': '', 'hot_index': '1'}]
+    page_archive.archive_page('<html>出错页面</html>', 'http://board', link=False)
+    save_snapshot(items, crawl_time='2025-11-01 08:00:00', store=store, validate=False)
+
+    page_archive.archive_page(board_page, 'http://board')
+    monkeypatch.setattr(page_archive, 'LINK_WINDOW', -1)
+    save_snapshot(items, crawl_time='2025-11-01 09:00:00', store=store, validate=False)
+    assert default_archive.links() == {}
+
+
+def test_legacy_fetches_match_the_next_snapshot(tmp_path, board_page):
+    from page_archive import reparse_archive
+    from snapshot_store import SnapshotStore
+
+    archive = PageArchive(str(tmp_path / 'archive'))
+    store = SnapshotStore(str(tmp_path / 'store'))
+    archive.put(board_page, 'http://board', fetched_at='2025-11-01 08:00:00')    # 没有抓取ID的旧记录
+    store.append([{'rank': 1, 'title': '旧解析结果', 'description': '', 'hot_index': ''}],
+                 crawl_time='2025-11-01 08:00:20')
+    archive.put(board_page, 'http://board', fetched_at='2025-11-01 12:00:00')    # 附近没有快照：写入新快照
+
+    reparse_archive(archive, store, workers=1)
+    assert sorted(s['crawl_time'] for s in store.iter_snapshots()) == ['2025-11-01 08:00:20', '2025-11-01 12:00:00']
+    assert all(s['items'][0]['title'] != '旧解析结果' for s in store.iter_snapshots())
@@ -0,0 +1,56 @@
+import asyncio
+
+import rank_events
+from rank_events import EventFilter, Subscriber, diff_snapshots
+
+
+def _snapshot(titles, crawl_time='2025-11-01 08:00:00'):
+    return {'id': crawl_time, 'source': 'baidu', 'crawl_time': crawl_time,
+            'items': [{'rank': r, 'title': t, 'hot_index': str(1000 * (10 - r))} for r, t in enumerate(titles, 1)]}
+
+
+def test_diff_reports_entered_exited_and_moved():
+    events = diff_snapshots(_snapshot(['甲', '乙', '丙']), _snapshot(['乙', '甲', '丁'], '2025-11-01 08:10:00'))
+    kinds = {(e['type'], e['title']) for e in events}
+    assert ('entered', '丁') in kinds
+    assert ('exited', '丙') in kinds
+    assert ('moved', '甲') in kinds and ('moved', '乙') in kinds
+
+
+def test_engine_keeps_compact_previous_boards_and_diffs_the_same():
+    first = _snapshot(['甲', '乙', '丙'])
+    second = _snapshot(['乙', '甲', '丁'], '2025-11-01 08:10:00')
+    second['items'][1]['hot_index'] = '9000000'
+    engine = rank_events.EventEngine()
+    engine.seed(first)
+    assert isinstance(engine._previous['baidu'], rank_events.Snapshot)
+
+    def key(event):
+        return event['type'], event['title']
+
+    assert sorted(engine.process(second), key=key) == sorted(diff_snapshots(first, second), key=key)
+    assert engine.process(first) == []  # 早于已处理的快照
+
+
+def test_drop_limit_counts_only_drops_since_last_catch_up(monkeypatch):
+    monkeypatch.setattr(rank_events, 'MAX_DROPPED', 5)
+
+    async def scenario():
+        subscriber = Subscriber(EventFilter(), buffer_size=2)
+        # 多次短暂落后：每次丢弃4条（低于上限），随后读到lagged通知并追上
+        for _ in range(10):
+            for n in range(6):
+                subscriber.offer({'type': 'entered', 'title': str(n)})
+            lagged = await subscriber.next()
+            assert lagged == {'type': 'lagged', 'dropped': 4}
+            await subscriber.next()
+            await subscriber.next()
+        assert subscriber.dropped == 40
+        assert not subscriber.closed
+
+        # 一次落后太多仍会被断开
+        for n in range(8):
+            subscriber.offer({'type': 'entered', 'title': str(n)})
+        assert subscriber.closed
+
+    asyncio.run(scenario())
@@ -0,0 +1,87 @@
+import json
+import threading
+import multiprocessing
+
+from rank_matrix import RankMatrix, TopicTable, rebuild
+from snapshot_store import SnapshotStore
+
+
+def _snapshot(minute, titles, source='baidu'):
+    return {'id': f'{source}-{minute}', 'source': source, 'crawl_time': f'2026-10-19 10:{minute:02d}:00',
+            'items': [{'rank': r, 'title': t, 'hot_index': str(1000 - r)} for r, t in enumerate(titles, 1)]}
+
+
+def _table_lines(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_topic_series_round_trip(tmp_path):
+    matrix = RankMatrix(str(tmp_path))
+    matrix.append(_snapshot(0, ['甲', '乙']))
+    matrix.append(_snapshot(10, ['乙', '甲']))
+    assert matrix.topic_series('甲') == [('2026-10-19 10:00:00', 1, 999), ('2026-10-19 10:10:00', 2, 998)]
+    assert matrix.window('2026-10-19 10:05:00', '2026-10-19 10:10:00')[1] == 1
+
+
+def test_rebuilding_one_source_keeps_other_sources_valid(tmp_path):
+    store = SnapshotStore(str(tmp_path / 'store'))
+    path = str(tmp_path / 'matrix')
+    weibo = RankMatrix(path, 'weibo')
+    weibo.append(_snapshot(0, ['微博话题', '共同话题'], 'weibo'))
+    baidu = RankMatrix(path, 'baidu')
+    baidu.append(_snapshot(0, ['百度话题', '共同话题']))
+    store.append(_snapshot(0, ['百度话题', '共同话题'])['items'], crawl_time='2026-10-19 10:00:00')
+
+    rebuild(store, path, 'baidu')
+
+    reopened = RankMatrix(path, 'weibo')
+    assert reopened.topic_series('微博话题') == [('2026-10-19 10:00:00', 1, 999)]
+    assert reopened.topic_series('共同话题') == [('2026-10-19 10:00:00', 2, 998)]
+    assert RankMatrix(path, 'baidu').topic_series('百度话题') == [('2026-10-19 10:00:00', 1, 999)]
+
+
+def test_concurrent_threads_get_consistent_topic_ids(tmp_path):
+    filename = str(tmp_path / 'topics.jsonl')
+    tables = [TopicTable(filename) for _ in range(4)]
+    results = [{} for _ in tables]
+
+    def work(table, result):
+        for i in range(200):
+            title = f'话题{i % 150}'
+            result[title] = table.intern(title)
+
+    threads = [threading.Thread(target=work, args=(t, r)) for t, r in zip(tables, results)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    lines = _table_lines(filename)
+    assert len(lines) == len(set(lines)) == 150
+    for result in results:
+        for title, topic_id in result.items():
+            assert lines[topic_id] == title
+
+
+def _intern_in_process(filename, start, queue):
+    table = TopicTable(filename)
+    queue.put({f'话题{i}': table.intern(f'话题{i}') for i in range(start, start + 100)})
+
+
+def test_concurrent_processes_get_consistent_topic_ids(tmp_path):
+    filename = str(tmp_path / 'topics.jsonl')
+    queue = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_intern_in_process, args=(filename, start, queue))
+                 for start in (0, 50, 100)]
+    for process in processes:
+        process.start()
+    assigned = [queue.get(timeout=30) for _ in processes]
+    for process in processes:
+        process.join()
+
+    lines = _table_lines(filename)
+    assert len(lines) == len(set(lines)) == 200
+    for result in assigned:
+        for title, topic_id in result.items():
+            assert lines[topic_id] == title
@@ -0,0 +1,42 @@
+import threading
+
+import baidu_hot_spider_selenium
+import schedule_spider_selenium
+
+
+def test_watchdog_aborts_a_hung_crawl(monkeypatch):
+    aborted = threading.Event()
+
+    def hung_crawl():
+        # 模拟卡住的页面加载：只有浏览器被强制关闭后才返回
+        aborted.wait(5)
+        raise RuntimeError('浏览器已被关闭')
+
+    def abort_browsers():
+        aborted.set()
+        return 1
+
+    monkeypatch.setattr(baidu_hot_spider_selenium, 'main', hung_crawl)
+    monkeypatch.setattr(baidu_hot_spider_selenium, 'abort_browsers', abort_browsers)
+    schedule_spider_selenium.run_spider(timeout=0.05)
+    assert aborted.is_set()
+    assert not schedule_spider_selenium._worker.is_alive()
+
+
+def test_next_run_is_skipped_while_the_previous_crawl_is_still_running(monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def stuck_crawl():
+        calls.append(1)
+        release.wait(5)
+        return True
+
+    monkeypatch.setattr(baidu_hot_spider_selenium, 'main', stuck_crawl)
+    monkeypatch.setattr(baidu_hot_spider_selenium, 'abort_browsers', lambda: 0)
+    monkeypatch.setattr(schedule_spider_selenium, 'ABORT_GRACE', 0.01)
+    schedule_spider_selenium.run_spider(timeout=0.01)
+    schedule_spider_selenium.run_spider(timeout=0.01)
+    release.set()
+    schedule_spider_selenium._worker.join(5)
+    assert len(calls) == 1
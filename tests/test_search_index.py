@@ -0,0 +1,51 @@
+import os
+
+from search_index import SearchIndex, tokenize
+
+
+def _snapshot(i, titles):
+    return {'id': f'baidu-{i}', 'crawl_time': f'2026-10-19 10:{i:02d}:00',
+            'items': [{'rank': r, 'title': t, 'description': ''} for r, t in enumerate(titles, 1)]}
+
+
+def test_tokenize_bigrams_and_words():
+    assert tokenize('北京暴雨 iPhone17') == ['北京', '京暴', '暴雨', 'iphone17']
+
+
+def test_log_compacts_automatically_past_threshold(tmp_path):
+    writer = SearchIndex(str(tmp_path))
+    for i in range(40):
+        writer.append_log(_snapshot(i, [f'话题{i}', '北京暴雨']), compact_bytes=1024)
+    # 日志被压缩清空过，不会无限增长
+    assert os.path.getsize(writer.log_file) < 1024
+    assert os.path.exists(writer.compact_file)
+
+    reader = SearchIndex(str(tmp_path)).load()
+    assert len(reader.snapshots) == 40
+    assert reader.occurrences('北京暴雨')[-1] == ('2026-10-19 10:39:00', 2)
+    assert len(reader.occurrences('北京暴雨')) == 40
+
+
+def test_reader_follows_compaction_by_another_writer(tmp_path):
+    writer = SearchIndex(str(tmp_path))
+    reader = SearchIndex(str(tmp_path))
+    writer.append_log(_snapshot(0, ['甲']))
+    reader.load()
+    writer.compact()
+    writer.append_log(_snapshot(1, ['乙']))
+    reader.load()
+    assert [s[0] for s in reader.snapshots] == ['baidu-0', 'baidu-1']
+    assert reader.search('乙')[0]['title'] == '乙'
+
+
+def test_interrupted_compaction_does_not_duplicate(tmp_path):
+    index = SearchIndex(str(tmp_path))
+    index.append_log(_snapshot(0, ['甲']))
+    log = open(index.log_file, 'rb').read()
+    index.compact()
+    # 模拟写入全量文件后、清空日志前中断
+    with open(index.log_file, 'wb') as f:
+        f.write(log)
+    reloaded = SearchIndex(str(tmp_path)).load()
+    assert len(reloaded.snapshots) == 1
+    assert len(reloaded.occurrences('甲')) == 1
@@ -0,0 +1,120 @@
+import os
+import threading
+
+import pytest
+
+import shm_cache
+from shm_cache import SnapshotCache, _load_word, _store_word
+
+
+def _snapshot(n):
+    return {'id': f's{n}', 'source': 'baidu', 'crawl_time': f'2025-11-01 08:{n:02d}:00',
+            'items': [{'rank': r, 'title': f'话题{n}-{r}', 'description': '简介', 'hot_index': str(100 * r)}
+                      for r in range(1, 21)]}
+
+
+@pytest.fixture
+def prefix(monkeypatch):
+    """每个测试使用自己的段名前缀，结束后删除创建的段"""
+    used = []
+
+    def use(name):
+        monkeypatch.setenv('BAIDU_HOT_SHM_PREFIX', f'{name}{os.getpid()}')
+        used.append(shm_cache.shm_prefix())
+
+    yield use
+    for name in used:
+        monkeypatch.setenv('BAIDU_HOT_SHM_PREFIX', name)
+        shm_cache.unlink('baidu')
+
+
+def test_prefix_follows_store_dir(monkeypatch):
+    monkeypatch.delenv('BAIDU_HOT_SHM_PREFIX')
+    monkeypatch.delenv('BAIDU_HOT_STORE_DIR', raising=False)
+    assert shm_cache.shm_prefix() == shm_cache.shm_prefix('hot_store') == 'baidu_hot'
+    monkeypatch.setenv('BAIDU_HOT_STORE_DIR', '/tmp/store-a')
+    first = shm_cache.shm_prefix()
+    monkeypatch.setenv('BAIDU_HOT_STORE_DIR', '/tmp/store-b')
+    assert first != shm_cache.shm_prefix()
+    assert first.startswith('baidu_hot_')
+    # 创建缓存时传入的存储优先于环境变量
+    assert shm_cache.shm_prefix('/tmp/store-a') == first
+
+
+def test_hook_publishes_to_the_segment_of_the_store_being_written(monkeypatch, tmp_path):
+    from snapshot_store import SnapshotStore, save_snapshot
+    monkeypatch.delenv('BAIDU_HOT_SHM_PREFIX')
+    monkeypatch.delenv('BAIDU_HOT_STORE_DIR', raising=False)
+    store = SnapshotStore(str(tmp_path / f'store{os.getpid()}'))
+    assert shm_cache.segment_name('baidu', store.path) != shm_cache.segment_name('baidu')
+    board = _snapshot(1)['items']
+    for item in board:
+        item['hot_index'] = str(5_000_000 - 1000 * item['rank'])
+    try:
+        snapshot = save_snapshot(board, crawl_time='2025-11-01 08:00:00', store=store)
+        reader = SnapshotCache.attach('baidu', store.path)
+        assert reader.latest()['id'] == snapshot['id']
+        reader.close()
+    finally:
+        shm_cache.unlink('baidu', store.path)
+
+
+def test_readers_only_see_segments_with_their_prefix(prefix):
+    prefix('baidu_hot_test_a')
+    writer = SnapshotCache.create(slots=4, slot_size=8192)
+    writer.publish(_snapshot(1))
+
+    prefix('baidu_hot_test_b')
+    with pytest.raises(FileNotFoundError):
+        SnapshotCache.attach()
+    other = SnapshotCache.create(slots=4, slot_size=8192)
+    other.publish(_snapshot(2))
+
+    prefix('baidu_hot_test_a')
+    reader = SnapshotCache.attach()
+    assert reader.latest()['id'] == 's1'
+    assert reader.count == 1
+    reader.close()
+    writer.close()
+    other.close()
+
+
+def test_ring_keeps_most_recent_snapshots(prefix):
+    prefix('baidu_hot_test_ring')
+    cache = SnapshotCache.create(slots=4, slot_size=8192)
+    for n in range(1, 11):
+        cache.publish(_snapshot(n))
+    assert [s['id'] for s in cache.recent()] == ['s10', 's9', 's8', 's7']
+    assert cache.latest()['items'][0] == {'rank': 1, 'title': '话题10-1', 'description': '简介', 'hot_index': '100'}
+    cache.close()
+
+
+def test_reader_waits_for_slot_being_written(prefix, monkeypatch):
+    monkeypatch.setattr(shm_cache, 'READ_RETRIES', 10 ** 7)  # 重试次数不受机器快慢影响
+    prefix('baidu_hot_test_seq')
+    cache = SnapshotCache.create(slots=2, slot_size=8192)
+    cache.publish(_snapshot(1))
+    offset = cache._slot_offset(1)
+    seq = _load_word(cache.buf, offset)
+    original = bytes(cache.buf[offset + 8:offset + 4096])
+
+    # 模拟写入方写到一半：计数为奇数，内容是垃圾
+    _store_word(cache.buf, offset, seq + 1)
+    cache.buf[offset + 16:offset + 4096] = b'\xff' * (4096 - 16)
+
+    def finish():
+        cache.buf[offset + 8:offset + 4096] = original
+        _store_word(cache.buf, offset, seq + 2)
+
+    timer = threading.Timer(0.05, finish)
+    timer.start()
+    reads = []
+
+    def title(view):
+        reads.append(view.seq)
+        return view.title(0)
+
+    assert cache.read(title) == '话题1-1'
+    assert reads == [seq + 2]  # 写入中的槽不会交给读取方
+    timer.join()
+    cache.close()
@@ -0,0 +1,48 @@
+import json
+import os
+
+from snapshot_quality import assess, check_before_save
+from snapshot_store import SnapshotStore
+
+
+def _items(titles, hot=True):
+    return [{'rank': r, 'title': t, 'description': f'{t}的详细报道',
+             'hot_index': str(5000000 - 1000 * r) if hot else ''} for r, t in enumerate(titles, 1)]
+
+
+def _titles(prefix, count=20):
+    return [f'{prefix}新闻标题第{i}条' for i in range(count)]
+
+
+def test_good_board_is_accepted():
+    report = assess(_items(_titles('正常')))
+    assert report.accepted
+    assert report.score == 1.0
+
+
+def test_mock_and_short_boards_are_rejected():
+    mock = _items(_titles('模拟'))
+    mock[0]['mock'] = True
+    assert not assess(mock).accepted
+    short = assess(_items(_titles('很短', 3)))
+    assert not short.accepted and short.rejections
+
+
+def test_unrelated_board_scores_lower_than_a_similar_one():
+    previous = {'crawl_time': '2025-11-01 08:00:00', 'items': _items(_titles('旧'))}
+    similar = assess(_items(_titles('旧')[:15] + _titles('新', 5)), previous, '2025-11-01 08:10:00')
+    unrelated = assess(_items(_titles('新')), previous, '2025-11-01 08:10:00')
+    assert similar.checks['similarity'] == 1.0
+    assert unrelated.checks['similarity'] == 0.0
+    # 间隔超过比较窗口时不检查重合度
+    assert assess(_items(_titles('新')), previous, '2025-11-02 08:10:00').checks['similarity'] == 1.0
+
+
+def test_rejected_board_is_quarantined(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    assert not check_before_save(store, _items(_titles('很短', 2)), '2025-11-01 08:00:00')
+    with open(os.path.join(store.path, 'quarantine.jsonl'), encoding='utf-8') as f:
+        record = json.loads(f.readline())
+    assert record['crawl_time'] == '2025-11-01 08:00:00'
+    assert record['quality']['rejections']
+    assert len(store) == 0
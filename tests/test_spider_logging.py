@@ -0,0 +1,47 @@
+import json
+import queue
+import logging
+
+from spider_logging import JsonFormatter, NonBlockingQueueHandler
+
+
+def _log_through_queue(log):
+    log_queue = queue.Queue()
+    logger = logging.getLogger('baidu_hot.test_queue')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = NonBlockingQueueHandler(log_queue)
+    logger.addHandler(handler)
+    try:
+        log(logger)
+    finally:
+        logger.removeHandler(handler)
+    return json.loads(JsonFormatter().format(log_queue.get_nowait()))
+
+
+def test_exception_traceback_reaches_json_output():
+    def log(logger):
+        try:
+            raise ValueError('坏数据')
+        except ValueError:
+            logger.exception("解析失败: %s", 'page')
+
+    event = _log_through_queue(log)
+    assert event['msg'] == "解析失败: page"
+    assert 'Traceback' in event['exc']
+    assert "ValueError: 坏数据" in event['exc']
+
+
+def test_extra_fields_survive_queue():
+    event = _log_through_queue(lambda logger: logger.info("已保存", extra={'items': 20}))
+    assert event['msg'] == "已保存"
+    assert event['items'] == 20
+    assert 'exc' not in event
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    record = logging.LogRecord('x', logging.INFO, __file__, 1, "m", None, None)
+    handler.handle(record)
+    handler.handle(record)
+    assert handler.dropped == 1
@@ -0,0 +1,62 @@
+import pytest
+
+from topic_cluster import NearDuplicateFilter, TopicClusters, estimate_similarity, minhash, shingles
+
+# 共享人名、地名或大部分字词，但是不同的话题
+NEAR_MISSES = [
+    ('王楚钦晋级男单决赛', '王楚钦无缘男单决赛'),
+    ('北京今日暴雨红色预警', '北京今日暴雪蓝色预警'),
+    ('杭州亚运会开幕式', '杭州亚运会闭幕式'),
+    ('特朗普宣布对华加征关税', '特朗普宣布暂停加征关税'),
+    ('多地迎来降温', '多地迎来大幅降温'),
+]
+
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b)
+
+
+def test_minhash_estimates_jaccard():
+    for first, second in NEAR_MISSES:
+        a, b = shingles(first), shingles(second)
+        assert estimate_similarity(minhash(a), minhash(b)) == pytest.approx(_jaccard(a, b), abs=0.15)
+
+
+def test_minhash_is_stable_across_calls():
+    assert minhash(shingles('保洁阿姨手撮银杏叶')) == minhash(shingles('保洁阿姨手撮银杏叶'))
+
+
+@pytest.mark.parametrize('first, second', NEAR_MISSES)
+def test_board_dedupe_keeps_distinct_near_miss_headlines(first, second):
+    board = NearDuplicateFilter()
+    assert board.add({'title': first})
+    assert board.add({'title': second})
+
+
+def test_board_dedupe_drops_formatting_variants():
+    board = NearDuplicateFilter()
+    assert board.add({'title': '保洁阿姨手撮银杏叶'})
+    assert not board.add({'title': '保洁阿姨手撮银杏叶！'})
+    assert not board.add({'title': '保洁阿姨手撮银杏叶'})
+
+
+def test_clustering_still_groups_loose_variants(tmp_path):
+    clusters = TopicClusters(str(tmp_path))
+    first = clusters.assign('特朗普宣布对华加征关税')
+    assert clusters.assign('特朗普宣布对华加征关税！') == first
+    assert clusters.assign('中国女排夺得世界杯冠军') != first
+
+
+def test_writers_sharing_a_log_do_not_hand_out_duplicate_story_ids(tmp_path):
+    # 两个进程各自持有实例，互相看不到对方刚写入的分配
+    first = TopicClusters(str(tmp_path)).load()
+    second = TopicClusters(str(tmp_path)).load()
+    a = first.assign('中国女排夺得世界杯冠军')
+    b = second.assign('嫦娥六号完成月背采样')
+    c = first.assign('全国铁路迎来返程高峰')
+    assert len({a, b, c}) == 3
+    assert second.assign('中国女排夺得世界杯冠军') == a
+
+    replayed = TopicClusters(str(tmp_path)).load()
+    assert {title: replayed.story_of[title] for title in first.story_of} == first.story_of
+    assert len(replayed.members) == 3
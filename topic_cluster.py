@@ -0,0 +1,232 @@
+import os
+import sys
+import json
+import zlib
+import argparse
+import threading
+from collections import defaultdict
+from spider_logging import get_logger, setup_logging
+from search_index import tokenize
+from file_lock import file_lock
+
+logger = get_logger('cluster')
+
+# 聚类状态目录，可通过环境变量覆盖
+CLUSTER_DIR = os.environ.get('BAIDU_HOT_CLUSTER_DIR', 'topic_clusters')
+
+# 128个哈希函数分成32个band、每个band 4行：相似度0.6的两条标题落入同一个桶的概率约99%，0.3时约36%
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+# 聚类阈值较宽松：归入同一故事只影响统计，不会删除条目
+SIMILARITY_THRESHOLD = 0.5
+# 单次爬取内去重会直接丢弃条目，阈值必须严格：短标题共享人名、地名时相似度常在0.5~0.6，
+# 例如“王楚钦晋级男单决赛”与“王楚钦无缘男单决赛”；只有标点、空格、全半角不同的变体才应被合并
+DEDUPE_THRESHOLD = 0.9
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _permutations(seed=20251108):
+    """生成固定的哈希参数，保证不同进程、不同时间计算出的签名一致"""
+    state = seed
+    params = []
+    for _ in range(NUM_PERM):
+        state = (state * 6364136223846793005 + 1442695040888963407) % (1 << 64)
+        a = (state >> 3) % _PRIME or 1
+        state = (state * 6364136223846793005 + 1442695040888963407) % (1 << 64)
+        b = (state >> 3) % _PRIME
+        params.append((a, b))
+    return params
+
+
+_PERMS = _permutations()
+
+
+def shingles(title, description=''):
+    """标题和简介的相邻两字集合；简介的词项加前缀区分，且最多取与标题相当的数量，避免简介主导相似度"""
+    title_terms = tokenize(title)
+    result = set(title_terms)
+    result.update('#' + term for term in tokenize(description)[:max(4, len(title_terms))])
+    return result
+
+
+def minhash(shingle_set):
+    """计算MinHash签名"""
+    if not shingle_set:
+        return [_MAX_HASH] * NUM_PERM
+    bases = [zlib.crc32(s.encode('utf-8')) for s in shingle_set]
+    return [min(((a * x + b) % _PRIME) & _MAX_HASH for x in bases) for a, b in _PERMS]
+
+
+def band_keys(signature):
+    """把签名切成band，每个band的哈希作为LSH桶的键"""
+    return [f"{band}:{hash(tuple(signature[band * ROWS:(band + 1) * ROWS])) & 0xffffffff:x}" for band in range(BANDS)]
+
+
+def estimate_similarity(sig_a, sig_b):
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / NUM_PERM
+
+
+class TopicClusters:
+    """
+    基于MinHash + LSH的近似重复话题聚类
+
+    每个不同的标题只计算一次签名：先查精确标题，再从LSH桶里找候选并用签名估计相似度，
+    达到阈值则归入已有的故事，否则新建故事。每个新标题的分配结果追加写入 clusters.jsonl，
+    载入时重放即可恢复LSH表，新快照因此只做增量分配，不需要两两比较。
+
+    分配新标题时持有锁文件：先追读其他进程写入的分配，再分配故事ID并追加，多个写入进程不会分出重复的ID。
+    """
+
+    def __init__(self, path=None, threshold=SIMILARITY_THRESHOLD):
+        self.path = path or CLUSTER_DIR
+        os.makedirs(self.path, exist_ok=True)
+        self.log_file = os.path.join(self.path, 'clusters.jsonl')
+        self.lock_file = self.log_file + '.lock'
+        self.threshold = threshold
+        self._lock = threading.RLock()
+        self.story_of = {}                 # 标题 -> 故事ID
+        self.signatures = {}               # 标题 -> 签名
+        self.members = defaultdict(list)   # 故事ID -> [标题]
+        self.buckets = defaultdict(set)    # band键 -> {标题}
+        self._offset = 0
+
+    def load(self):
+        """重放分配日志中尚未载入的部分"""
+        with self._lock:
+            return self._load()
+
+    def _load(self):
+        if not os.path.exists(self.log_file):
+            return self
+        with open(self.log_file, 'rb') as f:
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                self._offset += len(line)
+                record = json.loads(line)
+                self._register(record['title'], record['story'], record['sig'])
+        return self
+
+    def _register(self, title, story_id, signature):
+        self.story_of[title] = story_id
+        self.signatures[title] = signature
+        self.members[story_id].append(title)
+        for key in band_keys(signature):
+            self.buckets[key].add(title)
+
+    def find_similar(self, signature):
+        """在LSH候选中找最相似的标题，返回 (标题, 相似度)"""
+        candidates = set()
+        for key in band_keys(signature):
+            candidates.update(self.buckets.get(key, ()))
+        best_title, best_score = None, 0.0
+        for candidate in candidates:
+            score = estimate_similarity(signature, self.signatures[candidate])
+            if score > best_score:
+                best_title, best_score = candidate, score
+        return best_title, best_score
+
+    def assign(self, title, description=''):
+        """返回标题所属的故事ID，新标题会被分配并追加到日志"""
+        story_id = self.story_of.get(title)
+        if story_id is not None:
+            return story_id
+        signature = minhash(shingles(title, description))
+        with self._lock, file_lock(self.lock_file):
+            self._load()  # 其他进程可能已经分配了新故事，甚至分配了这个标题
+            story_id = self.story_of.get(title)
+            if story_id is not None:
+                return story_id
+            match, score = self.find_similar(signature)
+            if match is not None and score >= self.threshold:
+                story_id = self.story_of[match]
+                logger.info(f"近似重复: '{title}' 归入 '{match}' 所在故事（相似度 {score:.2f}）")
+            else:
+                story_id = len(self.members) + 1
+            self._register(title, story_id, signature)
+            record = {'title': title, 'story': story_id, 'sig': signature}
+            line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+            with open(self.log_file, 'ab') as f:
+                f.write(line)
+            self._offset += len(line)
+        return story_id
+
+    def assign_snapshot(self, items):
+        """为一次快照中的每条热搜分配故事ID，返回 [故事ID]"""
+        self.load()
+        return [self.assign(item['title'], item.get('description') or '') for item in items]
+
+    def story(self, story_id):
+        """故事的所有标题变体"""
+        return list(self.members.get(story_id, []))
+
+
+class NearDuplicateFilter:
+    """单次爬取内的近似去重：用于合并多个爬取策略的结果，代替按标题精确比较"""
+
+    def __init__(self, threshold=DEDUPE_THRESHOLD):
+        self.threshold = threshold
+        self.titles = set()
+        self.signatures = []
+
+    def add(self, item):
+        """条目与已有条目都不近似时加入并返回True，否则返回False"""
+        title = item['title']
+        if title in self.titles:
+            return False
+        signature = minhash(shingles(title, item.get('description') or ''))
+        if any(estimate_similarity(signature, other) >= self.threshold for other in self.signatures):
+            return False
+        self.titles.add(title)
+        self.signatures.append(signature)
+        return True
+
+
+_default_clusters = None
+
+
+def get_clusters():
+    global _default_clusters
+    if _default_clusters is None:
+        _default_clusters = TopicClusters()
+    return _default_clusters
+
+
+def on_snapshot(snapshot):
+    """快照写入钩子：为新标题增量分配故事"""
+    get_clusters().assign_snapshot(snapshot['items'])
+
+
+def main(argv=None):
+    """命令行入口：rebuild / show"""
+    parser = argparse.ArgumentParser(description="近似重复话题聚类")
+    parser.add_argument('--path', default=None, help="聚类状态目录")
+    sub = parser.add_subparsers(dest='command', required=True)
+    rebuild = sub.add_parser('rebuild', help="从快照存储重建聚类")
+    rebuild.add_argument('--store', default=None, help="快照存储目录")
+    sub.add_parser('show', help="列出包含多个标题变体的故事")
+    args = parser.parse_args(argv)
+
+    setup_logging('cluster')
+    clusters = TopicClusters(args.path)
+    if args.command == 'rebuild':
+        from snapshot_store import SnapshotStore
+        if os.path.exists(clusters.log_file):
+            os.remove(clusters.log_file)
+        for snapshot in sorted(SnapshotStore(args.store).iter_snapshots(), key=lambda s: s['crawl_time']):
+            clusters.assign_snapshot(snapshot['items'])
+        print(f"共 {len(clusters.story_of)} 个标题，归为 {len(clusters.members)} 个故事")
+    else:
+        clusters.load()
+        for story_id, titles in clusters.members.items():
+            if len(titles) > 1:
+                print(f"故事 {story_id}: " + " | ".join(titles))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())